@@ -1,153 +1,290 @@
 # app/analytics.py
-import math
-from collections import defaultdict
+import asyncio
+import os
+from datetime import date, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 from psycopg import OperationalError
 
 from .db import pool
-from .utils import naive_category, ZUZU_CATEGORIES
+from .rollups import (
+    ANALYTICS_DISTINCT_USERS,
+    fetch_distinct_users,
+    fetch_exact_distinct_users,
+    fetch_rollup_aggregates,
+    fetch_time_series,
+)
+from .consistency import fetch_consistency_scores
+from .config_registry import current
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Read totals / categories / by_day from the rollup tables (see rollups.py)
+# instead of scanning the raw event tables on every dashboard load.
+ANALYTICS_USE_ROLLUPS = os.getenv("ANALYTICS_USE_ROLLUPS", "true").lower() == "true"
+
+# Upper bound on points in one /api/analytics time series.
+ANALYTICS_MAX_BUCKETS = int(os.getenv("ANALYTICS_MAX_BUCKETS", "1000"))
+
+
 # ===================================================================
 # 🔹 FETCH BASIC NUMBERS (totals, categories, weekly usage)
 # ===================================================================
 
-def _fetch_basic_aggregates(device_id: Optional[str]) -> Dict[str, Any]:
+def _fetch_basic_aggregates(
+    device_id: Optional[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Dict[str, Any]:
     """
-    Basic aggregates for analytics:
-      - totals: { totalUsers, totalQuestions, totalPiiEvents }
-      - top_categories: [ { category, count }, ... ]
-      - by_day: [ { date: "YYYY-MM-DD", count }, ... ]
-      - chat_ids: [ ... ] used for consistency scoring
+    Rollup-backed aggregates, falling back to the raw queries if the rollup
+    tables are disabled or unavailable. totalUsers covers [start, end]
+    (see _fetch_total_users).
     """
-    where = ""
-    params: List[Any] = []
-
-    if device_id is not None:
-        where = " AND device_id = %s"
-        params.append(device_id)
-
+    basics = None
+    if ANALYTICS_USE_ROLLUPS:
+        try:
+            basics = fetch_rollup_aggregates(device_id)
+        except Exception as e:
+            logger.exception(
+                "Rollup analytics failed, falling back to raw aggregates: %s", e
+            )
+    if basics is None:
+        basics = _fetch_raw_aggregates(device_id)
+
+    basics["totals"]["totalUsers"] = _fetch_total_users(start, end)
+    return basics
+
+
+def _fetch_total_users(start: Optional[date], end: Optional[date]) -> int:
+    """
+    totalUsers: distinct devices that asked at least one question between
+    `start` and `end` (inclusive; all time when no window is requested).
+    It is system-wide, also in a device's own view. Approximate (merged
+    HyperLogLog sketches) with ANALYTICS_DISTINCT_USERS=hll, else exact,
+    from the rollups or, failing those, from message_events.
+    """
+    if ANALYTICS_DISTINCT_USERS == "hll":
+        try:
+            return fetch_distinct_users(start, end)
+        except Exception as e:
+            logger.exception("HLL distinct users failed: %s", e)
+    if ANALYTICS_USE_ROLLUPS:
+        try:
+            return fetch_exact_distinct_users(start, end)
+        except Exception as e:
+            logger.exception("Rollup distinct users failed: %s", e)
     try:
         with pool.connection() as conn:
-            # ---- Total distinct users (devices) ----
-            row = conn.execute(
-                "SELECT COUNT(DISTINCT device_id) FROM chats"
-            ).fetchone()
-            total_users = int(row[0]) if row is not None else 0
-
-            # ---- Total questions (user messages) ----
             row = conn.execute(
-                f"""
-                SELECT COUNT(*)
+                """
+                SELECT COUNT(DISTINCT device_id)
                 FROM message_events
                 WHERE role = 'user'
-                {where}
+                  AND (%s::date IS NULL OR created_at >= %s::date)
+                  AND (%s::date IS NULL OR created_at < %s::date + 1)
                 """,
-                params,
+                (start, start, end, end),
             ).fetchone()
-            total_questions = int(row[0]) if row is not None else 0
-
-            # ---- PII events (global count) ----
-            row = conn.execute(
-                "SELECT COUNT(*) FROM pii_events"
-            ).fetchone()
-            pii_events = int(row[0]) if row is not None else 0
-
-            # ---- Usage by day (last 7 days, only user messages) ----
-            by_day_rows = conn.execute(
-                f"""
-                SELECT DATE(created_at) AS day, COUNT(*) AS count
-                FROM message_events
-                WHERE role = 'user'
-                  AND created_at >= NOW() - INTERVAL '7 days'
-                  {where}
-                GROUP BY DATE(created_at)
-                ORDER BY day
-                """,
-                params,
-            ).fetchall()
-
-            by_day = [
-                {"date": row[0].isoformat(), "count": int(row[1])}
-                for row in by_day_rows
-            ]
-
-            # ---- Top categories ----
-            cat_rows = conn.execute(
-                f"""
-                SELECT category, COUNT(*)
-                FROM message_events
-                WHERE role = 'user'
-                {where}
-                GROUP BY category
-                ORDER BY COUNT(*) DESC
-                """,
-                params,
-            ).fetchall()
-
-            top_categories: List[Dict[str, Any]] = []
-            for cat, cnt in cat_rows:
-                name = cat or "Other Inquiries"
-                top_categories.append({"category": name, "count": int(cnt)})
-
-            # ---- Chat IDs used for consistency calculations ----
-            chat_rows = conn.execute(
-                f"""
-                SELECT DISTINCT chat_id
-                FROM message_events
-                WHERE role = 'user'
-                {where}
-                """,
-                params,
-            ).fetchall()
-
-            chat_ids = [r[0] for r in chat_rows]
-
-    except OperationalError as e:
-        logger.exception("Analytics DB error: %s", e)
-        return {
-            "chat_ids": [],
-            "totals": {
-                "totalUsers": 0,
-                "totalQuestions": 0,
-                "totalPiiEvents": 0,
-            },
-            "top_categories": [],
-            "by_day": [],
-        }
     except Exception as e:
-        logger.exception(
-            "Unexpected error in _fetch_basic_aggregates: %s", e
-        )
-        return {
-            "chat_ids": [],
-            "totals": {
-                "totalUsers": 0,
-                "totalQuestions": 0,
-                "totalPiiEvents": 0,
-            },
-            "top_categories": [],
-            "by_day": [],
-        }
-
-    logger.info("Analytics by_day rows: %d", len(by_day))
+        logger.exception("Raw distinct users failed: %s", e)
+        return 0
+    return int(row[0]) if row is not None else 0
+
+
+# One round trip, one scan of message_events: GROUPING SETS yield the
+# total, the per-category counts and the per-day counts (events older than
+# 7 days fall into a NULL day bucket that is discarded).
+_RAW_AGGREGATES_SQL = """
+WITH ev AS (
+    SELECT
+        CASE WHEN created_at >= NOW() - INTERVAL '7 days'
+             THEN created_at::date END AS day,
+        category
+    FROM message_events
+    WHERE role = 'user'
+    {where}
+)
+SELECT 'events', GROUPING(day), GROUPING(category), day, category, COUNT(*)
+FROM ev
+GROUP BY GROUPING SETS ((), (category), (day))
+UNION ALL
+SELECT 'pii', 1, 1, NULL, NULL, (SELECT COUNT(*) FROM pii_events)
+UNION ALL
+SELECT 'pii_type', 1, 1, NULL, t.pii_type, COUNT(*)
+FROM pii_events,
+     unnest(string_to_array(COALESCE(pii_type, 'generic'), ',')) AS t(pii_type)
+WHERE TRUE {where}
+GROUP BY t.pii_type
+"""
+
+
+def _raw_aggregates(conn, device_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Run the single-statement aggregate query on `conn` and shape it.
+    totalUsers is left at 0 (see _fetch_total_users).
+    """
+    where = ""
+    params: List[Any] = []
+    if device_id is not None:
+        where = " AND device_id = %s"
+        params.extend([device_id, device_id])
+
+    rows = conn.execute(_RAW_AGGREGATES_SQL.format(where=where), params).fetchall()
+
+    total_questions = 0
+    pii_events = 0
+    by_day: List[Dict[str, Any]] = []
+    top_categories: List[Dict[str, Any]] = []
+    pii_by_type: Dict[str, int] = {}
+
+    for kind, g_day, g_cat, day, cat, cnt in rows:
+        cnt = int(cnt or 0)
+        if kind == "pii":
+            pii_events = cnt
+        elif kind == "pii_type":
+            pii_by_type[cat] = cnt
+        elif g_day and g_cat:
+            total_questions = cnt
+        elif g_day:
+            top_categories.append({"category": cat or "Other Inquiries", "count": cnt})
+        elif day is not None:
+            by_day.append({"date": day.isoformat(), "count": cnt})
+
+    top_categories.sort(key=lambda c: c["count"], reverse=True)
+    by_day.sort(key=lambda d: d["date"])
 
     return {
-        "chat_ids": chat_ids,
         "totals": {
-            "totalUsers": total_users,
+            "totalUsers": 0,
             "totalQuestions": total_questions,
             "totalPiiEvents": pii_events,
         },
         "top_categories": top_categories,
         "by_day": by_day,
+        "pii_by_type": pii_by_type,
+    }
+
+
+def _fetch_raw_aggregates(device_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Basic aggregates for analytics, computed from the raw tables:
+      - totals: { totalUsers, totalQuestions, totalPiiEvents }
+      - top_categories: [ { category, count }, ... ]
+      - by_day: [ { date: "YYYY-MM-DD", count }, ... ]
+      - pii_by_type: { "email": count, ... }
+    """
+    empty = {
+        "totals": {
+            "totalUsers": 0,
+            "totalQuestions": 0,
+            "totalPiiEvents": 0,
+        },
+        "top_categories": [],
+        "by_day": [],
+        "pii_by_type": {},
     }
 
+    try:
+        with pool.connection() as conn:
+            basics = _raw_aggregates(conn, device_id)
+    except OperationalError as e:
+        logger.exception("Analytics DB error: %s", e)
+        return empty
+    except Exception as e:
+        logger.exception(
+            "Unexpected error in _fetch_raw_aggregates: %s", e
+        )
+        return empty
+
+    logger.info("Analytics by_day rows: %d", len(basics["by_day"]))
+    return basics
+
+
+# ===================================================================
+# 🔹 TIME SERIES (configurable window / bucket)
+# ===================================================================
+
+BUCKETS = ("hour", "day", "week")
+_BUCKET_SPAN = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+
+def resolve_window(
+    start: Optional[date],
+    end: Optional[date],
+    bucket: Optional[str],
+) -> Tuple[date, date, str]:
+    """
+    Fill in defaults (the last 7 days, daily) and validate a requested
+    window. Raises ValueError for an unknown bucket, start > end, or more
+    than ANALYTICS_MAX_BUCKETS buckets.
+    """
+    bucket = (bucket or "day").lower()
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    end = end or date.today()
+    start = start or end - timedelta(days=7)
+    if start > end:
+        raise ValueError("start must not be after end")
+    n_buckets = (end - start + timedelta(days=1)) / _BUCKET_SPAN[bucket]
+    if n_buckets > ANALYTICS_MAX_BUCKETS:
+        raise ValueError(
+            f"window too large for {bucket} buckets (max {ANALYTICS_MAX_BUCKETS})"
+        )
+    return start, end, bucket
+
+
+def _raw_time_series(
+    device_id: Optional[str], start: date, end: date, bucket: str
+) -> List[Dict[str, Any]]:
+    """Fallback when rollups are off: bucket the raw events in the window."""
+    where = ""
+    params: List[Any] = [bucket, start, end]
+    if device_id is not None:
+        where = " AND device_id = %s"
+        params.append(device_id)
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT date_trunc(%s, created_at) AS bucket, COUNT(*)
+            FROM message_events
+            WHERE role = 'user'
+              AND created_at >= %s::date
+              AND created_at < %s::date + 1
+              {where}
+            GROUP BY 1
+            ORDER BY 1
+            """,
+            params,
+        ).fetchall()
+
+    out = []
+    for b, n in rows:
+        label = b.isoformat() if bucket == "hour" else b.date().isoformat()
+        out.append({"date": label, "count": int(n)})
+    return out
+
+
+def _fetch_time_series(
+    device_id: Optional[str], start: date, end: date, bucket: str
+) -> List[Dict[str, Any]]:
+    if ANALYTICS_USE_ROLLUPS:
+        try:
+            return fetch_time_series(device_id, start, end, bucket)
+        except Exception as e:
+            logger.exception(
+                "Rollup time series failed, falling back to raw events: %s", e
+            )
+    try:
+        return _raw_time_series(device_id, start, end, bucket)
+    except Exception as e:
+        logger.exception("Unexpected error in _raw_time_series: %s", e)
+        return []
+
 # def _fetch_basic_aggregates(device_id: Optional[str]) -> Dict[str, Any]:
 #     """
 #     Basic aggregates for analytics:
@@ -388,52 +525,57 @@ def _fetch_basic_aggregates(device_id: Optional[str]) -> Dict[str, Any]:
 
 # app/analytics.py
 
-async def _compute_consistency(chat_ids: List[str]) -> Tuple[float, Dict[str, float]]:
+async def _compute_consistency(device_id: Optional[str]) -> Tuple[float, Dict[str, float]]:
     """
-    TEMP: Safe, cheap consistency calculator that never calls OpenAI
-    and never touches the DB, so analytics can’t crash the app.
+    Read the scores persisted by the background consistency job
+    (consistency.py). Never embeds anything in the request path; on any
+    error, reports full consistency so analytics can’t crash the app.
     """
-    global_score = 100.0
-    per_cat_scores = {cat: 100.0 for cat in ZUZU_CATEGORIES}
-    return global_score, per_cat_scores
-
-
-
-def _normalize_question(q: str) -> str:
-    return " ".join(q.lower().strip().split())
-
-
-def _cosine(u: List[float], v: List[float]) -> Optional[float]:
-    if not u or not v or len(u) != len(v):
-        return None
-    dot = 0.0
-    nu = 0.0
-    nv = 0.0
-    for a, b in zip(u, v):
-        dot += a * b
-        nu += a * a
-        nv += b * b
-    if nu == 0.0 or nv == 0.0:
-        return None
-    return dot / math.sqrt(nu * nv)
+    try:
+        return await asyncio.to_thread(fetch_consistency_scores, device_id)
+    except Exception as e:
+        logger.exception("Reading consistency scores failed: %s", e)
+        return 100.0, {cat: 100.0 for cat in current().categories}
 
 
 # ===================================================================
 # 🔹 PUBLIC ENTRY POINT
 # ===================================================================
 
-async def get_analytics(device_id: Optional[str]) -> Dict[str, Any]:
-    basics = _fetch_basic_aggregates(device_id)
-    global_score, per_cat_scores = await _compute_consistency(
-        basics["chat_ids"]
-    )
+async def get_analytics(
+    device_id: Optional[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = "day",
+) -> Dict[str, Any]:
+    """
+    Dashboard payload. `by_day` covers [start, end] in `bucket` steps
+    (see resolve_window); without a window it is the last 7 days, daily.
+    totals.totalUsers counts the devices that asked a question in the
+    window, or ever without one (see _fetch_total_users).
+    """
+    windowed = start is not None or end is not None or bucket != "day"
+    if windowed:
+        start, end, bucket = resolve_window(start, end, bucket)
+
+    # The aggregate queries are blocking; keep them off the event loop.
+    basics = await asyncio.to_thread(_fetch_basic_aggregates, device_id, start, end)
+    global_score, per_cat_scores = await _compute_consistency(device_id)
+
+    by_day = basics["by_day"]
+    if windowed:
+        by_day = await asyncio.to_thread(
+            _fetch_time_series, device_id, start, end, bucket
+        )
 
     return {
         "totals": basics["totals"],
         "top_categories": basics["top_categories"],
-        "by_day": basics["by_day"],
+        "by_day": by_day,
+        "bucket": bucket,
         "consistencyScore": global_score,
         "consistencyByCategory": per_cat_scores,
+        "piiByType": basics.get("pii_by_type", {}),
     }
 
 
@@ -0,0 +1,179 @@
+# app/analytics_bench.py
+"""
+Benchmark for the raw (non-rollup) analytics aggregation.
+
+Seeds a scratch schema with synthetic chats / message_events / pii_events
+and compares the old five-query version of `_fetch_raw_aggregates` with
+the single GROUPING SETS statement now in analytics.py.
+
+  python -m app.analytics_bench                      # 1M events, 5 runs
+  python -m app.analytics_bench --events 5000000 --runs 10 --keep
+
+Point DB_CONNECTION_STRING at a local database, not production. The
+scratch schema is dropped afterwards unless --keep is given.
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, List, Optional
+
+import psycopg
+
+from .analytics import _raw_aggregates
+from .db import db_url
+from .utils import ZUZU_CATEGORIES
+
+SCRATCH_SCHEMA = "analytics_bench"
+
+_SCHEMA_SQL = """
+CREATE TABLE chats (
+    chat_id TEXT PRIMARY KEY,
+    device_id TEXT
+);
+CREATE TABLE message_events (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id TEXT,
+    device_id TEXT,
+    role TEXT,
+    category TEXT,
+    created_at TIMESTAMPTZ
+);
+CREATE TABLE pii_events (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id TEXT,
+    device_id TEXT,
+    pii_type TEXT,
+    created_at TIMESTAMPTZ
+);
+"""
+
+# Parameterised statements have to be sent one at a time.
+_SEED_STATEMENTS = [
+    """
+    INSERT INTO chats (chat_id, device_id)
+    SELECT 'c' || g, 'd' || (g %% %(devices)s)
+    FROM generate_series(0, %(chats)s - 1) g
+    """,
+    """
+    INSERT INTO message_events (chat_id, device_id, role, category, created_at)
+    SELECT
+        'c' || (g %% %(chats)s),
+        'd' || ((g %% %(chats)s) %% %(devices)s),
+        CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END,
+        (%(categories)s::text[])[1 + g %% cardinality(%(categories)s::text[])],
+        now() - (random() * interval '90 days')
+    FROM generate_series(1, %(events)s) g
+    """,
+    """
+    INSERT INTO pii_events (chat_id, device_id, pii_type, created_at)
+    SELECT 'c' || (g %% %(chats)s), 'd' || (g %% %(devices)s), 'generic',
+           now() - (random() * interval '90 days')
+    FROM generate_series(1, %(events)s / 200) g
+    """,
+    "CREATE INDEX ON message_events (role, device_id, created_at)",
+    "ANALYZE",
+]
+
+
+def _legacy_aggregates(conn, device_id: Optional[str]) -> None:
+    """
+    The previous implementation: five aggregate queries plus the chat_id
+    list, minus the distinct-user count that both now leave to
+    analytics._fetch_total_users.
+    """
+    where = ""
+    params: List[Any] = []
+    if device_id is not None:
+        where = " AND device_id = %s"
+        params.append(device_id)
+
+    conn.execute(
+        f"SELECT COUNT(*) FROM message_events WHERE role = 'user' {where}",
+        params,
+    ).fetchone()
+    conn.execute("SELECT COUNT(*) FROM pii_events").fetchone()
+    conn.execute(
+        f"""
+        SELECT DATE(created_at) AS day, COUNT(*) AS count
+        FROM message_events
+        WHERE role = 'user'
+          AND created_at >= NOW() - INTERVAL '7 days'
+          {where}
+        GROUP BY DATE(created_at)
+        ORDER BY day
+        """,
+        params,
+    ).fetchall()
+    conn.execute(
+        f"""
+        SELECT category, COUNT(*)
+        FROM message_events
+        WHERE role = 'user'
+        {where}
+        GROUP BY category
+        ORDER BY COUNT(*) DESC
+        """,
+        params,
+    ).fetchall()
+    conn.execute(
+        f"SELECT DISTINCT chat_id FROM message_events WHERE role = 'user' {where}",
+        params,
+    ).fetchall()
+
+
+def _time(fn: Callable[[], Any], runs: int) -> List[float]:
+    fn()  # warm the cache
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def run(events: int, runs: int, keep: bool) -> None:
+    chats = max(events // 20, 1)
+    devices = max(chats // 5, 1)
+
+    with psycopg.connect(db_url, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE")
+        conn.execute(f"CREATE SCHEMA {SCRATCH_SCHEMA}")
+        conn.execute(f"SET search_path TO {SCRATCH_SCHEMA}")
+        try:
+            t0 = time.perf_counter()
+            conn.execute(_SCHEMA_SQL)
+            params = {
+                "events": events,
+                "chats": chats,
+                "devices": devices,
+                "categories": ZUZU_CATEGORIES,
+            }
+            for stmt in _SEED_STATEMENTS:
+                conn.execute(stmt, params if "%(" in stmt else None)
+            print(f"seeded {events:,} events in {time.perf_counter() - t0:.1f}s")
+
+            for label, device_id in (("global", None), ("device", "d1")):
+                legacy = _time(lambda: _legacy_aggregates(conn, device_id), runs)
+                single = _time(lambda: _raw_aggregates(conn, device_id), runs)
+                lp50, sp50 = statistics.median(legacy), statistics.median(single)
+                print(
+                    f"{label:<7} legacy p50 {lp50:8.1f} ms   "
+                    f"single p50 {sp50:8.1f} ms   "
+                    f"speedup x{lp50 / sp50 if sp50 else 0:.2f}"
+                )
+        finally:
+            if not keep:
+                conn.execute(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Raw analytics aggregation benchmark")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args(argv)
+    run(args.events, args.runs, args.keep)
+
+
+if __name__ == "__main__":
+    main()
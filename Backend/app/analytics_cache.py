@@ -0,0 +1,155 @@
+# app/analytics_cache.py
+"""
+Stale-while-revalidate cache for `get_analytics` responses.
+
+Admins reload the dashboard a lot, and each load used to recompute every
+aggregate. Responses are now cached per device scope ("*" for the
+system-wide admin view, otherwise the device_id) and time window:
+
+  - younger than ANALYTICS_CACHE_FRESH_SECS   -> served as is
+  - older, up to ANALYTICS_CACHE_MAX_STALE_SECS -> served immediately while
+    a single background task recomputes it
+  - older than that, or missing               -> computed inline
+
+`force=True` (admin "Refresh" button) always recomputes inline. Concurrent
+requests for the same scope and window share one computation. The config
+version (config_registry) is part of the key, so publishing new categories
+never serves a response computed for the old ones.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .config_registry import config_version
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_CACHE_ENABLED = os.getenv("ANALYTICS_CACHE_ENABLED", "true").lower() == "true"
+ANALYTICS_CACHE_FRESH_SECS = float(os.getenv("ANALYTICS_CACHE_FRESH_SECS", "60"))
+ANALYTICS_CACHE_MAX_STALE_SECS = float(os.getenv("ANALYTICS_CACHE_MAX_STALE_SECS", "3600"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "500"))
+
+GLOBAL_SCOPE = "*"
+
+
+class AnalyticsCache:
+    """Per-scope response cache with single-flight background refresh."""
+
+    def __init__(self, fresh_secs: float, max_stale_secs: float, max_entries: int):
+        self.fresh_secs = fresh_secs
+        self.max_stale_secs = max_stale_secs
+        self.max_entries = max_entries
+        # (scope, start, end, bucket) -> (computed_at monotonic, wall clock, response)
+        self._data: Dict[Hashable, Tuple[float, float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Hashable, "asyncio.Task[Dict[str, Any]]"] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @staticmethod
+    def scope_for(device_id: Optional[str]) -> str:
+        return GLOBAL_SCOPE if device_id is None else device_id
+
+    def _compute(
+        self, key: Hashable, device_id: Optional[str], window: Tuple
+    ) -> "asyncio.Task[Dict[str, Any]]":
+        """Start (or join) the computation for this key."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, device_id, window))
+            self._inflight[key] = task
+        return task
+
+    async def _run(
+        self, key: Hashable, device_id: Optional[str], window: Tuple
+    ) -> Dict[str, Any]:
+        from .analytics import get_analytics
+
+        try:
+            self.refreshes += 1
+            response = await get_analytics(device_id, *window)
+            self._data[key] = (time.monotonic(), time.time(), response)
+            if len(self._data) > self.max_entries:
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                self._data.pop(oldest, None)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get(
+        self,
+        device_id: Optional[str],
+        force: bool = False,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        bucket: str = "day",
+    ) -> Dict[str, Any]:
+        """Return the analytics response for `device_id`, cached when possible."""
+        window = (start, end, bucket)
+        key = (config_version(), self.scope_for(device_id), *window)
+        entry = self._data.get(key)
+
+        if entry is not None and not force:
+            age = time.monotonic() - entry[0]
+            if age <= self.fresh_secs:
+                self.hits += 1
+                return self._with_meta(entry, stale=False)
+            if age <= self.fresh_secs + self.max_stale_secs:
+                self.stale_hits += 1
+                task = self._compute(key, device_id, window)
+                task.add_done_callback(_log_refresh_error)
+                return self._with_meta(entry, stale=True)
+
+        self.misses += 1
+        await self._compute(key, device_id, window)
+        return self._with_meta(self._data[key], stale=False)
+
+    @staticmethod
+    def _with_meta(entry: Tuple[float, float, Dict[str, Any]], stale: bool) -> Dict[str, Any]:
+        _, computed_at, response = entry
+        return {**response, "generatedAt": computed_at, "stale": stale}
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": ANALYTICS_CACHE_ENABLED,
+            "entries": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "inflight": len(self._inflight),
+        }
+
+
+def _log_refresh_error(task: "asyncio.Task[Any]") -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background analytics refresh failed: %s", task.exception())
+
+
+analytics_cache = AnalyticsCache(
+    fresh_secs=ANALYTICS_CACHE_FRESH_SECS,
+    max_stale_secs=ANALYTICS_CACHE_MAX_STALE_SECS,
+    max_entries=ANALYTICS_CACHE_MAX_ENTRIES,
+)
+
+
+async def get_cached_analytics(
+    device_id: Optional[str],
+    force: bool = False,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = "day",
+) -> Dict[str, Any]:
+    """`get_analytics` behind the SWR cache (bypassed if disabled)."""
+    if not ANALYTICS_CACHE_ENABLED:
+        from .analytics import get_analytics
+
+        return await get_analytics(device_id, start, end, bucket)
+    return await analytics_cache.get(device_id, force, start, end, bucket)
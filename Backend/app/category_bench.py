@@ -0,0 +1,159 @@
+# app/category_bench.py
+"""
+Micro-benchmark for `naive_category`.
+
+Compares, on synthetic assistant-length replies:
+
+  - legacy: the old if-chain of `any(kw in t for kw in [...])`, which
+            rebuilt every keyword list and generator on each call;
+  - trie:   all keywords compiled into one prefix-trie regex, scanning the
+            text once (kept here for reference);
+  - table:  the current implementation in utils.py.
+
+and checks that all three pick the same category for every text. The
+scored multi-label classifier (classifier.classify) is timed as well; its
+answers differ by design, so it isn't compared.
+
+  python -m app.category_bench                        # 2000 texts, 5 runs
+  python -m app.category_bench --words 1500 --keyword-rate 0.01
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from .classifier import classify
+from .config_registry import current
+from .utils import _DEFAULT_CATEGORY, _naive_keywords, naive_category
+
+# The uncompiled keyword lists naive_category is built from.
+_CATEGORY_KEYWORDS = _naive_keywords(current())
+
+# Filler that contains no keywords, so the scans only stop at the keywords
+# that are sprinkled in (--keyword-rate).
+_FILLER = (
+    "the you your to of and a in is it that for can on with this be are as at "
+    "if or we will help kindly check office hours more details about "
+    "question answer usually also before after during each week day time "
+    "students international university staff email link page see below "
+    "here there which what when where how should need make sure"
+).split()
+
+
+def _legacy_naive_category(text: str) -> str:
+    """The old implementation, one keyword list per category per call."""
+    if not text:
+        return _DEFAULT_CATEGORY
+    t = text.lower()
+    for category, keywords in _CATEGORY_KEYWORDS:
+        if any(kw in t for kw in list(keywords)):
+            return category
+    return _DEFAULT_CATEGORY
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Alternation factored into a prefix trie: "a(?:pply|irport)"."""
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + emit(sub) for ch, sub in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+_RANK: Dict[str, int] = {}
+for _i, (_cat, _kws) in enumerate(_CATEGORY_KEYWORDS):
+    for _kw in _kws:
+        _RANK.setdefault(_kw, _i)
+# The trie reports the longest keyword at a position; fold in the ranks of
+# the shorter keywords that are prefixes of it.
+_MATCH_RANK = {kw: min(r for o, r in _RANK.items() if kw.startswith(o)) for kw in _RANK}
+_TRIE_RE = re.compile(_trie_pattern(list(_RANK)))
+
+
+def _trie_naive_category(text: str) -> str:
+    if not text:
+        return _DEFAULT_CATEGORY
+    t = text.lower()
+    best = len(_CATEGORY_KEYWORDS)
+    m = _TRIE_RE.search(t)
+    while m is not None:
+        best = min(best, _MATCH_RANK[m.group()])
+        if best == 0:
+            break
+        m = _TRIE_RE.search(t, m.start() + 1)  # overlapping matches too
+    return _CATEGORY_KEYWORDS[best][0] if best < len(_CATEGORY_KEYWORDS) else _DEFAULT_CATEGORY
+
+
+def make_texts(n: int, words: int, keyword_rate: float, seed: int = 7) -> List[str]:
+    """`n` texts of up to `words` words with a few keywords sprinkled in."""
+    rng = random.Random(seed)
+    keywords = [kw for _, kws in _CATEGORY_KEYWORDS for kw in kws]
+    texts = []
+    for _ in range(n):
+        ws = [rng.choice(_FILLER) for _ in range(rng.randint(words // 2, words))]
+        for _ in range(int(len(ws) * keyword_rate)):
+            ws.insert(rng.randrange(len(ws) + 1), rng.choice(keywords))
+        if rng.random() < 0.5:
+            ws[0] = ws[0].capitalize()
+        texts.append(" ".join(ws))
+    return texts
+
+
+def _time(fn: Callable[[str], str], texts: List[str], runs: int) -> List[float]:
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark naive_category")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400, help="max words per text")
+    parser.add_argument(
+        "--keyword-rate", type=float, default=0.002, help="keywords per filler word"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    variants = {
+        "legacy": _legacy_naive_category,
+        "trie": _trie_naive_category,
+        "table": naive_category,
+    }
+    texts = make_texts(args.texts, args.words, args.keyword_rate)
+    mismatches = sum(
+        len({fn(t) for fn in variants.values()}) > 1 for t in texts
+    )
+    avg_len = statistics.mean(len(t) for t in texts)
+    print(f"{len(texts)} texts, avg {avg_len:,.0f} chars, {mismatches} mismatches")
+
+    base = None
+    for name, fn in variants.items():
+        per_text = [s / len(texts) * 1e6 for s in _time(fn, texts, args.runs)]
+        med = statistics.median(per_text)
+        base = base or med
+        print(f"{name:<8} median {med:7.1f} µs/text  (min {min(per_text):6.1f})  {base / med:.2f}x")
+    per_text = [s / len(texts) * 1e6 for s in _time(classify, texts, args.runs)]
+    print(f"{'scored':<8} median {statistics.median(per_text):7.1f} µs/text  (timing only)")
+    if mismatches:
+        raise SystemExit("❌ implementations disagree")
+
+
+if __name__ == "__main__":
+    main()
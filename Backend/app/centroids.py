@@ -0,0 +1,264 @@
+# app/centroids.py
+"""
+Embedding-centroid classifier for user messages.
+
+`chat_api` already embeds every user message for retrieval
+(search_docs_with_vector). Instead of only matching keywords, that vector
+can be compared with the mean doc embedding of every category and
+subcategory: one (n_centroids x 1536) @ (1536,) product, no extra API call.
+
+Centroids are precomputed from the tagged `docs` table (doc_tagging.py)
+into `category_centroids`; run this after re-tagging or re-ingesting docs:
+
+  python -m app.centroids rebuild
+  python -m app.centroids report --sample 500   # agreement with doc tags
+
+Config (env):
+  CATEGORY_CLASSIFIER = keyword | centroid   (default: keyword)
+
+With "centroid", a message is labelled by its nearest category centroid and
+the nearest subcategory centroid inside that category. The keyword
+classifier (classifier.py) is still used for UI breadcrumbs, for assistant
+replies (no embedding), and whenever the centroid answer is weak: best
+similarity below CENTROID_MIN_SIMILARITY, or less than CENTROID_MIN_MARGIN
+ahead of the runner-up.
+
+NumPy is imported on first use, so the API doesn't pay for it at startup
+while CATEGORY_CLASSIFIER=keyword.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from .classifier import CLASSIFIER_TOP_K, Classification, classify
+from .utils import parse_breadcrumb
+
+if TYPE_CHECKING:  # annotations only; the real import is deferred
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIERS = ("keyword", "centroid")
+CATEGORY_CLASSIFIER = os.getenv("CATEGORY_CLASSIFIER", "keyword").strip().lower()
+if CATEGORY_CLASSIFIER not in CLASSIFIERS:
+    raise RuntimeError(f"CATEGORY_CLASSIFIER must be one of {CLASSIFIERS}")
+
+CENTROID_MIN_DOCS = int(os.getenv("CENTROID_MIN_DOCS", "3"))
+CENTROID_MIN_SIMILARITY = float(os.getenv("CENTROID_MIN_SIMILARITY", "0.25"))
+CENTROID_MIN_MARGIN = float(os.getenv("CENTROID_MIN_MARGIN", "0.01"))
+# Softmax temperature turning cosine similarities into label confidences.
+# Embedding similarities are bunched together, so this needs to be small.
+CENTROID_TEMPERATURE = float(os.getenv("CENTROID_TEMPERATURE", "0.02"))
+CENTROID_REFRESH_SECS = float(os.getenv("CENTROID_REFRESH_SECS", "3600"))
+
+_REBUILD_SQL = """
+INSERT INTO category_centroids (category, subcategory, centroid, n_docs)
+SELECT category, subcategory, AVG(embedding), COUNT(*)
+FROM docs
+WHERE category IS NOT NULL AND embedding IS NOT NULL
+GROUP BY GROUPING SETS ((category), (category, subcategory))
+HAVING COUNT(*) >= %s
+   AND (GROUPING(subcategory) = 1 OR subcategory IS NOT NULL)
+"""
+
+
+# -------------------------------------------------------------------
+# Build
+# -------------------------------------------------------------------
+def rebuild(min_docs: int = CENTROID_MIN_DOCS) -> int:
+    """Recompute every centroid in one transaction. Returns the row count."""
+    from .db import pool
+
+    with pool.connection() as conn:
+        with conn.transaction():
+            conn.execute("DELETE FROM category_centroids")
+            cur = conn.execute(_REBUILD_SQL, (min_docs,))
+            n = cur.rowcount
+    centroid_index.invalidate()
+    return n
+
+
+# -------------------------------------------------------------------
+# In-memory index
+# -------------------------------------------------------------------
+class CentroidIndex:
+    """
+    Unit-normalised centroids stacked in one float32 matrix: category rows
+    first, then subcategory rows. Loaded lazily and reloaded every
+    `refresh_secs`.
+    """
+
+    def __init__(self, refresh_secs: float):
+        self.refresh_secs = refresh_secs
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._categories: List[str] = []
+        # category -> (row indices, subcategory labels)
+        self._subs: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self) -> None:
+        import numpy as np
+
+        from .db import pool
+        from .rerank import parse_vector
+
+        with pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT category, subcategory, centroid::text
+                FROM category_centroids
+                ORDER BY subcategory IS NOT NULL, category, subcategory
+                """
+            ).fetchall()
+
+        if not rows:
+            self._matrix, self._categories, self._subs = None, [], {}
+            return
+        matrix = np.array([parse_vector(r[2]) for r in rows], dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+
+        categories = [cat for cat, sub, _ in rows if sub is None]
+        subs: Dict[str, Tuple[List[int], List[str]]] = {}
+        for i, (cat, sub, _) in enumerate(rows):
+            if sub is not None:
+                idx, labels = subs.setdefault(cat, ([], []))
+                idx.append(i)
+                labels.append(sub)
+        self._matrix = matrix
+        self._categories = categories
+        self._subs = {c: (np.array(idx), labels) for c, (idx, labels) in subs.items()}
+        logger.info(
+            "✅ loaded %d category / %d subcategory centroids",
+            len(categories),
+            len(rows) - len(categories),
+        )
+
+    def _ensure_loaded(self) -> None:
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_secs:
+            return
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.refresh_secs:
+                return
+            try:
+                self._load()
+            except Exception as e:
+                # Missing table / DB hiccup: keep what we had (maybe nothing)
+                # and let callers fall back to keywords until the next refresh.
+                logger.warning("⚠️ centroid load failed: %s", e)
+            self._loaded_at = now
+
+    def classify(
+        self, vector: Sequence[float], top_k: int = CLASSIFIER_TOP_K
+    ) -> Optional[Classification]:
+        """Nearest-centroid labels for `vector`, or None if not confident."""
+        import numpy as np
+
+        self._ensure_loaded()
+        matrix, categories = self._matrix, self._categories
+        if matrix is None or len(categories) < 2 or len(vector) != matrix.shape[1]:
+            return None
+
+        v = np.asarray(vector, dtype=np.float32)
+        sims = matrix @ (v / (np.linalg.norm(v) + 1e-12))
+
+        cat_sims = sims[: len(categories)]
+        order = np.argsort(-cat_sims)
+        best, second = cat_sims[order[0]], cat_sims[order[1]]
+        if best < CENTROID_MIN_SIMILARITY or best - second < CENTROID_MIN_MARGIN:
+            return None
+
+        probs = np.exp((cat_sims - best) / CENTROID_TEMPERATURE)
+        probs /= probs.sum()
+        labels = [(categories[i], round(float(probs[i]), 3)) for i in order[:top_k]]
+        category = labels[0][0]
+
+        subcategory = None
+        if category in self._subs:
+            idx, sub_labels = self._subs[category]
+            subcategory = sub_labels[int(np.argmax(sims[idx]))]
+        return Classification(category, subcategory, labels[0][1], labels)
+
+
+centroid_index = CentroidIndex(refresh_secs=CENTROID_REFRESH_SECS)
+
+
+def classify_message(
+    text: str, vector: Optional[Sequence[float]] = None, top_k: int = CLASSIFIER_TOP_K
+) -> Classification:
+    """
+    Classify a user message, reusing its query embedding when
+    CATEGORY_CLASSIFIER=centroid; keyword classifier otherwise.
+    """
+    if CATEGORY_CLASSIFIER == "centroid" and vector and not parse_breadcrumb(text)[0]:
+        c = centroid_index.classify(vector, top_k)
+        if c is not None:
+            return c
+    return classify(text, top_k)
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def report(sample: int = 500) -> None:
+    """
+    How often the centroid label matches the doc's own tag, on a random
+    sample of tagged docs. Docs are part of their own centroid, so this is
+    an upper bound; use it to compare thresholds, not as accuracy.
+    """
+    from .db import pool
+    from .rerank import parse_vector
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT category, embedding::text
+            FROM docs
+            WHERE category IS NOT NULL AND embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT %s
+            """,
+            (sample,),
+        ).fetchall()
+
+    agree = fallback = 0
+    for category, emb in rows:
+        c = centroid_index.classify(parse_vector(emb))
+        if c is None:
+            fallback += 1
+        elif c.category == category:
+            agree += 1
+    decided = len(rows) - fallback
+    print(f"{len(rows)} docs, {fallback} below threshold (keyword fallback)")
+    if decided:
+        print(f"agreement with doc tags: {agree}/{decided} ({agree / decided:.1%})")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Category centroid classifier")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("rebuild", help="recompute centroids from tagged docs")
+    b.add_argument("--min-docs", type=int, default=CENTROID_MIN_DOCS)
+
+    r = sub.add_parser("report", help="agreement with doc tags")
+    r.add_argument("--sample", type=int, default=500)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "rebuild":
+        n = rebuild(args.min_docs)
+        print(f"✅ stored {n} centroids")
+    else:
+        report(args.sample)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# app/classifier.py
+"""
+Weighted keyword classifier for chat messages.
+
+`naive_category` (utils.py) returns the first keyword group that matches
+anywhere in the text, so a generic word ("hall", "status", "form", or "lease"
+inside "please") decides the category. This classifier instead:
+
+  - matches whole words and phrases only (plural "s" included);
+  - scores every category: each keyword has a weight (3 = unambiguous,
+    2 = typical, 1 = generic), repeats add with diminishing returns;
+  - keeps generic-only evidence below CLASSIFIER_MIN_SCORE in
+    "Other Inquiries";
+  - picks a ZUZU_SUBCATEGORIES label inside the winning category.
+
+    classify("How do I open a bank account and get a debit card?")
+    -> Classification(category="Money and Banking",
+                      subcategory="Bank accounts and cards", confidence=1.0, ...)
+
+Keyword tables are compiled into a first-word index once per config
+version (config_registry.build; the tables below are the defaults and can
+be overridden by a published snapshot); a message is split into words once
+and only words that start a keyword are looked at (well under 0.1 ms for a
+2 KB reply).
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .config_registry import current
+from .utils import parse_breadcrumb
+
+CLASSIFIER_MIN_SCORE = float(os.getenv("CLASSIFIER_MIN_SCORE", "2"))
+CLASSIFIER_TOP_K = int(os.getenv("CLASSIFIER_TOP_K", "3"))
+
+OTHER = "Other Inquiries"
+
+# category -> {keyword or phrase: weight}
+CATEGORY_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "Housing": {
+        "housing": 3, "dorm": 3, "residence hall": 3, "apartment": 3,
+        "roommate": 3, "room mate": 3, "move in": 2, "move out": 2,
+        "lease": 2, "hall": 1, "contract": 1, "room": 1, "rent": 1,
+    },
+    "Admissions": {
+        "admission": 3, "admitted": 3, "application": 2, "apply": 2,
+        "deadline": 2, "gpa": 2, "transcript": 2, "offer letter": 3,
+        "program requirements": 3, "toefl": 3, "ielts": 3, "gre": 2,
+    },
+    "Visa and Immigration": {
+        "visa": 3, "i 20": 3, "i20": 3, "sevis": 3, "ds 2019": 3,
+        "immigration": 3, "consulate": 3, "f 1": 3, "f1": 3, "embassy": 3,
+        "status": 1, "passport": 2,
+    },
+    "Travel and Arrival": {
+        "flight": 3, "airport": 3, "arrival": 2, "arrive": 2, "travel": 2,
+        "pickup": 2, "pick up": 2, "hotel": 2, "temporary housing": 3,
+        "luggage": 3, "pack": 1,
+    },
+    "Forms and Documentation": {
+        "form": 1, "document": 1, "paperwork": 2, "pdf upload": 3,
+        "immunization": 3, "vaccination": 3, "proof of funding": 3,
+        "financial statement": 3,
+    },
+    "Money and Banking": {
+        "tuition": 3, "fee": 2, "bank": 3, "bank account": 3, "debit card": 3,
+        "credit card": 3, "loan": 2, "scholarship": 3, "assistantship": 3,
+        "budget": 2, "money": 2, "cost": 1, "pay": 1, "payment": 2,
+        "account": 1, "card": 1,
+    },
+    "Campus Life and Academics": {
+        "class": 2, "course": 2, "registration": 2, "register": 2,
+        "enroll": 2, "enrol": 2, "advisor": 2, "adviser": 2, "tutoring": 3,
+        "club": 2, "organization": 1, "campus": 1, "library": 2, "pilot": 2,
+    },
+    "Health and Safety": {
+        "insurance": 3, "health": 2, "doctor": 3, "hospital": 3, "clinic": 3,
+        "mental health": 3, "counseling": 3, "counselling": 3, "safety": 2,
+        "emergency": 3, "police": 3, "sick": 2,
+    },
+    "Phone and Connectivity": {
+        "phone": 3, "sim": 3, "sim card": 3, "wifi": 3, "wi fi": 3,
+        "internet": 3, "data plan": 3, "mobile": 2, "carrier": 2,
+    },
+    "Work and Career": {
+        "job": 3, "work": 1, "internship": 3, "cpt": 3, "opt": 3,
+        "career": 3, "on campus job": 3, "employment": 3, "resume": 3,
+        "ssn": 2, "social security": 2,
+    },
+    "Community and Daily Life": {
+        "grocery": 3, "groceries": 3, "shopping": 2, "bus": 2,
+        "transport": 2, "transportation": 2, "parking": 2, "community": 1,
+        "restaurant": 3, "food": 1, "church": 2, "temple": 2, "mosque": 2,
+    },
+    "Undergraduate - Placement Assessments": {
+        "placement": 2, "placement exam": 3, "placement test": 3,
+        "placement assessment": 3, "math placement": 3,
+        "writing placement": 3, "aleks": 3,
+    },
+}
+
+# category -> subcategory -> {keyword: weight}. A subcategory keyword also
+# counts towards its category with the same weight, so generic words stay
+# at 1. The words of each label are added with weight 1 (see _compile);
+# only extra synonyms are listed here.
+SUBCATEGORY_KEYWORDS: Dict[str, Dict[str, Dict[str, float]]] = {
+    "Housing": {
+        "Apply / Eligibility": {"housing application": 3, "eligible": 1},
+        "Residence halls": {"residence hall": 3, "dorm": 3, "hall": 1},
+        "Apartments": {"apartment": 3},
+        "Rates & contracts": {"rate": 1, "contract": 1, "lease": 2, "price": 1},
+        "Move-in & move-out": {"move in": 3, "move out": 3, "check in": 1},
+        "Roommates": {"roommate": 3, "room mate": 3},
+        "Break housing & guest housing": {"winter break": 3, "guest": 1},
+    },
+    "Admissions": {
+        "Application and deadlines": {"deadline": 3, "apply": 2},
+        "Documents and test scores": {
+            "transcript": 3, "toefl": 3, "ielts": 3, "gre": 3, "score": 1,
+        },
+        "Decision and next steps": {"admitted": 3, "offer letter": 3, "decision": 1},
+    },
+    "Visa and Immigration": {
+        "I-20 and DS-2019": {"i 20": 3, "i20": 3, "ds 2019": 3},
+        "Visa interview and documents": {"interview": 1, "embassy": 3, "consulate": 3},
+        "SEVIS and reporting": {"sevis": 3, "report": 1},
+        "Maintaining status": {"status": 1, "full time": 2, "grace period": 3},
+    },
+    "Travel and Arrival": {
+        "Booking flights and timing": {"flight": 3, "ticket": 1},
+        "Airport pickup and directions": {"airport": 2, "pickup": 3, "pick up": 3},
+        "Temporary housing / hotels": {"hotel": 3, "temporary housing": 3},
+        "What to pack": {"pack": 3, "luggage": 3, "bring": 1},
+        "Arriving early or late": {"early": 1, "late": 1},
+    },
+    "Forms and Documentation": {
+        "Immunization and health forms": {"immunization": 3, "vaccination": 3},
+        "Financial forms and proof of funding": {
+            "proof of funding": 3, "financial statement": 3, "bank statement": 3,
+        },
+        "Housing application forms": {"housing application": 3},
+        "Enrollment and registration forms": {"enrollment": 1, "registration": 1},
+    },
+    "Money and Banking": {
+        "Paying tuition and fees": {"tuition": 3, "fee": 2, "payment": 2},
+        "Bank accounts and cards": {
+            "bank": 3, "bank account": 3, "debit card": 3, "credit card": 3,
+        },
+        "Budgeting and cost of living": {"budget": 3, "cost": 1, "expense": 1},
+        "Scholarships and assistantships": {"scholarship": 3, "assistantship": 3},
+    },
+    "Campus Life and Academics": {
+        "Class registration": {"register": 3, "enroll": 3, "course": 2, "class": 2},
+        "Advising and tutoring": {"advisor": 3, "adviser": 3, "tutoring": 3},
+        "Clubs and organizations": {"club": 3, "organization": 1},
+        "Campus services and facilities": {"library": 3, "gym": 3, "pilot": 2},
+    },
+    "Health and Safety": {
+        "Health insurance and care": {"insurance": 3, "doctor": 3, "clinic": 3},
+        "Counseling and mental health": {"counseling": 3, "counselling": 3, "stress": 1},
+        "Campus safety and emergency": {"emergency": 3, "police": 3, "safety": 2},
+    },
+    "Phone and Connectivity": {
+        "Phone plans and SIM cards": {"sim": 3, "sim card": 3, "phone plan": 3, "carrier": 2},
+        "Wi-Fi and internet": {"wifi": 3, "wi fi": 3, "internet": 3},
+    },
+    "Work and Career": {
+        "On-campus jobs": {"on campus job": 3, "student job": 3},
+        "CPT / OPT basics": {"cpt": 3, "opt": 3},
+        "Career services and internships": {"internship": 3, "resume": 3, "career": 2},
+    },
+    "Community and Daily Life": {
+        "Shopping and groceries": {"grocery": 3, "groceries": 3, "shopping": 3},
+        "Transportation": {"bus": 3, "parking": 3, "transport": 3},
+        "Local community and culture": {"church": 2, "temple": 2, "mosque": 2, "festival": 1},
+    },
+    "Undergraduate - Placement Assessments": {
+        "Undergraduate - Math Placement Assessment": {"math": 1, "aleks": 3},
+        "Undergraduate - Writing Placement Assessment": {"writing": 1, "essay": 1},
+    },
+}
+
+# Label words too generic to say anything about a subcategory.
+_LABEL_STOPWORDS = {
+    "and", "the", "for", "other", "not", "sure", "basics", "options", "overview",
+    "services", "support", "living", "features", "undergraduate", "assessment",
+    "placement", "questions", "general", "guide", "steps", "next", "forms",
+    "what", "how", "when", "where", "early", "late", "booking", "timing",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Everything but [a-z0-9] (after lower()) separates words, plus common
+# non-ASCII punctuation; other non-ASCII letters stay inside words.
+_SEPARATORS = str.maketrans(
+    {c: " " for c in map(chr, range(128)) if not (c.isascii() and c.isalnum())}
+    | {c: " " for c in "\u2018\u2019\u201c\u201d\u2013\u2014\u2026\u2022\u00b7\u2192"}
+)
+
+
+class Classification(NamedTuple):
+    category: str
+    subcategory: Optional[str]
+    confidence: float
+    # Ranked (category, confidence) for the best CLASSIFIER_TOP_K categories.
+    labels: List[Tuple[str, float]]
+
+
+# -------------------------------------------------------------------
+# Compilation (once per config version)
+# -------------------------------------------------------------------
+class _Phrase(NamedTuple):
+    # What one hit adds: category -> weight (the highest weight the phrase
+    # has for that category, so a subcategory keyword isn't counted twice),
+    # and (category, subcategory) -> weight.
+    categories: List[Tuple[str, float]]
+    subcategories: List[Tuple[Tuple[str, str], float]]
+
+
+def _variants(words: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+    """The phrase and its plural ("form" -> "forms", "class" -> "classes")."""
+    last = words[-1]
+    if last.isdigit() or len(last) < 3:
+        return [words]
+    plural = last + "es" if last.endswith(("s", "x", "ch", "sh")) else last + "s"
+    return [words, words[:-1] + (plural,)]
+
+
+Compiled = Tuple[Dict[str, List[Tuple[Tuple[str, ...], int]]], List[_Phrase]]
+
+
+def _compile(
+    subcategories: Mapping[str, Sequence[str]],
+    category_keywords: Mapping[str, Mapping[str, float]],
+    subcategory_keywords: Mapping[str, Mapping[str, Mapping[str, float]]],
+) -> Compiled:
+    """
+    Returns (index, phrases): index maps a phrase's first word to
+    [(remaining words, phrase id)], longest first.
+    """
+    weights: Dict[Tuple[str, ...], Dict[Tuple[str, Optional[str]], float]] = {}
+
+    def add(keyword: str, category: str, subcategory: Optional[str], weight: float) -> None:
+        words = tuple(_WORD_RE.findall(keyword.lower()))
+        if not words:
+            return
+        for variant in _variants(words):
+            w = weights.setdefault(variant, {})
+            key = (category, subcategory)
+            w[key] = max(w.get(key, 0.0), weight)
+
+    for category, keywords in category_keywords.items():
+        for kw, weight in keywords.items():
+            add(kw, category, None, weight)
+    for category, labels in subcategories.items():
+        extra = subcategory_keywords.get(category, {})
+        for label in labels:
+            for word in _WORD_RE.findall(label.lower()):
+                if len(word) >= 3 and word not in _LABEL_STOPWORDS:
+                    add(word, category, label, 1)
+            for kw, weight in extra.get(label, {}).items():
+                add(kw, category, label, weight)
+
+    index: Dict[str, List[Tuple[Tuple[str, ...], int]]] = {}
+    phrases: List[_Phrase] = []
+    for words, w in weights.items():
+        categories: Dict[str, float] = {}
+        for (cat, _sub), weight in w.items():
+            categories[cat] = max(categories.get(cat, 0.0), weight)
+        subs = [((cat, sub), weight) for (cat, sub), weight in w.items() if sub is not None]
+        index.setdefault(words[0], []).append((words[1:], len(phrases)))
+        phrases.append(_Phrase(list(categories.items()), subs))
+    for entries in index.values():
+        entries.sort(key=lambda e: -len(e[0]))
+    return index, phrases
+
+
+# -------------------------------------------------------------------
+# Classification
+# -------------------------------------------------------------------
+def _words(text: str) -> List[str]:
+    # translate + split is several times faster than a findall() regex.
+    return text.lower().translate(_SEPARATORS).split()
+
+
+def _phrase_hits(text: str, index: Dict[str, List[Tuple[Tuple[str, ...], int]]]) -> Dict[int, int]:
+    """
+    phrase id -> number of occurrences. Words inside a matched multi-word
+    phrase don't count on their own ("sim card" is not also a "card").
+    """
+    words = _words(text)
+    counts = Counter(words)
+    present = counts.keys() & index.keys()
+    hits: Dict[int, int] = {}
+    covered: set = set()
+    singles: List[Tuple[int, int]] = []  # (position, phrase id)
+
+    # Words that start a multi-word phrase: look at each occurrence.
+    for word in present:
+        entries = index[word]
+        if not entries[0][0]:
+            continue
+        i = -1
+        for _ in range(counts[word]):
+            i = words.index(word, i + 1)
+            for rest, pid in entries:
+                if not rest:
+                    singles.append((i, pid))
+                elif tuple(words[i + 1 : i + 1 + len(rest)]) == rest:
+                    hits[pid] = hits.get(pid, 0) + 1
+                    covered.update(range(i + 1, i + 1 + len(rest)))
+                    break
+
+    inside = Counter(words[j] for j in covered)
+    for i, pid in singles:
+        if i not in covered:
+            hits[pid] = hits.get(pid, 0) + 1
+    # Everything else is a single-word phrase: count without a loop.
+    for word in present:
+        (rest, pid), *more = index[word]
+        if not rest and not more:
+            n = counts[word] - inside[word]
+            if n > 0:
+                hits[pid] = n
+    return hits
+
+
+def classify(text: str, top_k: int = CLASSIFIER_TOP_K) -> Classification:
+    """Ranked categories, a subcategory and a confidence for `text`."""
+    category, subcategory = parse_breadcrumb(text or "")
+    if category:
+        # UI button selections are exact.
+        return Classification(category, subcategory, 1.0, [(category, 1.0)])
+
+    # One read, so a config reload mid-call can't mix index and phrases.
+    index, phrases = current().classifier
+    cat_scores: Dict[str, float] = {}
+    sub_scores: Dict[Tuple[str, str], float] = {}
+    for pid, count in _phrase_hits(text or "", index).items():
+        # Repeats count, but less and less: 1, 1.69, 2.10, ...
+        factor = 1 + math.log(count)
+        phrase = phrases[pid]
+        for cat, weight in phrase.categories:
+            cat_scores[cat] = cat_scores.get(cat, 0.0) + weight * factor
+        for key, weight in phrase.subcategories:
+            sub_scores[key] = sub_scores.get(key, 0.0) + weight * factor
+
+    ranked = sorted(cat_scores.items(), key=lambda kv: -kv[1])
+    if not ranked or ranked[0][1] < CLASSIFIER_MIN_SCORE:
+        return Classification(OTHER, None, 0.0, [])
+
+    total = sum(cat_scores.values())
+    labels = [(cat, round(score / total, 3)) for cat, score in ranked[:top_k]]
+    best = ranked[0][0]
+
+    subs = {sub: v for (cat, sub), v in sub_scores.items() if cat == best}
+    subcategory = max(subs, key=subs.get) if subs else None
+    return Classification(best, subcategory, labels[0][1], labels)
@@ -0,0 +1,363 @@
+# app/config_registry.py
+"""
+Versioned, hot-reloadable content configuration.
+
+Categories, subcategories, classifier keywords, the allowed contact emails
+and the housing rate table used to be Python literals only, so changing
+any of them meant a redeploy. They are now published as JSON snapshots
+into `config_snapshots` (one row per version) and every worker switches to
+the newest one within CONFIG_RELOAD_SECS, without a restart:
+
+  python -m app.config_registry export -o zuzu_config.json   # active config
+  python -m app.config_registry publish zuzu_config.json --comment "2026 rates"
+  python -m app.config_registry publish --from-version 3     # roll back
+  python -m app.config_registry status
+
+A snapshot is validated and compiled once, when it is loaded, into an
+immutable `ZuzuConfig` (keyword index for classifier.classify, lowercased
+email set, breadcrumb lookup); the rendered system prompt is cached per
+version in llm.py. A reload builds the new object completely and then
+replaces one module-level reference, so a request sees either the old
+config or the new one, never a mix. Without any published snapshot (or
+without a database) the literals in utils.py / classifier.py and the
+defaults below are used, as version 0.
+
+`config_version()` is part of cache keys whose contents depend on the
+config (analytics_cache.py).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONFIG_RELOAD_SECS = float(os.getenv("CONFIG_RELOAD_SECS", "30"))
+
+DEFAULT_ALLOWED_EMAILS: List[str] = [
+    "admissions@wright.edu",
+    "wsugrad@wright.edu",
+    "raiderconnect@wright.edu",
+    "EnrollmentServices@wright.edu",
+    "wsu-registrar@wright.edu",
+    "international-admissions@wright.edu",
+    "housing@wright.edu",
+    "studenthealthinsurance@wright.edu",
+    "disability_services@wright.edu",
+    "career_services@wright.edu",
+    "helpdesk@wright.edu",
+    "wsupolice@wright.edu",
+    "studentconduct@wright.edu",
+    "deanofstudents@wright.edu",
+    "ucieimmigration@wright.edu",
+    "askucie@wright.edu",
+    "enrollmentservices@wright.edu",
+]
+
+# Wright Guarantee 2025–26 rates, per semester: [building, [[room, USD]]].
+DEFAULT_HOUSING_RATES: List[Tuple[str, List[Tuple[str, int]]]] = [
+    ("Hamilton Hall", [
+        ("Super Single", 3273), ("Double", 2789), ("Double Deluxe", 3032),
+    ]),
+    ("Honors Community", [
+        ("Super Single", 4521), ("Double", 2789),
+    ]),
+    ("The Woods", [
+        ("Single", 4112), ("Super Single", 4526),
+        ("Super Single (Jacob Hall)", 5234), ("Double", 2789),
+        ("Double (Jacob Hall)", 3517), ("Double Deluxe", 3273),
+        ("Triple", 2435), ("Quad", 2012),
+    ]),
+    ("Forest Lane Apartments", [
+        ("Studio", 2899), ("Small Two Bedroom", 3032), ("Large Two Bedroom", 3336),
+    ]),
+    ("College Park Apartments", [
+        ("Quad", 2535), ("Updated Quad", 4059),
+    ]),
+    ("University Park Apartments", [
+        ("Quad", 2535), ("Double Occupancy Quad: Single", 2028),
+        ("Double Occupancy Quad: Double", 1478),
+    ]),
+    ("The Village Apartments", [
+        ("Efficiency", 3113), ("Deluxe Efficiency", 3556), ("One Bedroom", 4038),
+        ("Two Bedroom", 4593), ("Two Bedroom Split", 2396),
+    ]),
+]
+
+
+class ZuzuConfig(NamedTuple):
+    version: int
+    categories: Tuple[str, ...]
+    subcategories: Mapping[str, Tuple[str, ...]]
+    # As written (for the prompt) and lowercased (for checks).
+    allowed_emails: Tuple[str, ...]
+    allowed_emails_lower: FrozenSet[str]
+    housing_rates: Tuple[Tuple[str, Tuple[Tuple[str, int], ...]], ...]
+    # lowercased category -> (category, {lowercased subcategory: subcategory})
+    breadcrumbs: Mapping[str, Tuple[str, Mapping[str, str]]]
+    # classifier._compile() output
+    classifier: Any
+    # The JSON payload this was built from (for export).
+    payload: Mapping[str, Any]
+
+
+# -------------------------------------------------------------------
+# Build
+# -------------------------------------------------------------------
+def default_payload() -> Dict[str, Any]:
+    """The built-in config, in the same shape as a published snapshot."""
+    from .classifier import CATEGORY_KEYWORDS, SUBCATEGORY_KEYWORDS
+    from .utils import ZUZU_CATEGORIES, ZUZU_SUBCATEGORIES
+
+    return {
+        "categories": list(ZUZU_CATEGORIES),
+        "subcategories": {c: list(s) for c, s in ZUZU_SUBCATEGORIES.items()},
+        "category_keywords": {c: dict(k) for c, k in CATEGORY_KEYWORDS.items()},
+        "subcategory_keywords": {
+            c: {s: dict(k) for s, k in subs.items()} for c, subs in SUBCATEGORY_KEYWORDS.items()
+        },
+        "allowed_emails": list(DEFAULT_ALLOWED_EMAILS),
+        "housing_rates": [[b, [list(r) for r in rooms]] for b, rooms in DEFAULT_HOUSING_RATES],
+    }
+
+
+def _check_weights(where: str, keywords: Any) -> None:
+    """`keywords` must be {keyword: weight} with non-empty keys and numeric weights."""
+    if not isinstance(keywords, dict):
+        raise ValueError(f"{where} must map keywords to weights")
+    for kw, weight in keywords.items():
+        if not isinstance(kw, str) or not kw.strip():
+            raise ValueError(f"{where}: keywords must be non-empty strings")
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            raise ValueError(f"{where}: weight of {kw!r} must be a number")
+
+
+def build(payload: Dict[str, Any], version: int) -> ZuzuConfig:
+    """Validate `payload` and compile it. Raises ValueError if it's invalid."""
+    from .classifier import _compile
+
+    try:
+        categories = tuple(payload["categories"])
+        subcategories = {c: tuple(s) for c, s in payload["subcategories"].items()}
+        emails = tuple(e.strip() for e in payload["allowed_emails"])
+        rates = tuple(
+            (str(b), tuple((str(room), int(usd)) for room, usd in rooms))
+            for b, rooms in payload["housing_rates"]
+        )
+        category_keywords = payload["category_keywords"]
+        subcategory_keywords = payload.get("subcategory_keywords", {})
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"malformed config: {e!r}") from e
+
+    if not isinstance(category_keywords, dict) or not isinstance(subcategory_keywords, dict):
+        raise ValueError("category_keywords and subcategory_keywords must be objects")
+    for c, keywords in category_keywords.items():
+        _check_weights(f"category_keywords[{c!r}]", keywords)
+    for c, subs in subcategory_keywords.items():
+        if not isinstance(subs, dict):
+            raise ValueError(f"subcategory_keywords[{c!r}] must map subcategories to keywords")
+        for sub, keywords in subs.items():
+            _check_weights(f"subcategory_keywords[{c!r}][{sub!r}]", keywords)
+
+    unknown = (set(subcategories) | set(category_keywords)) - set(categories)
+    if unknown:
+        raise ValueError(f"unknown categories: {sorted(unknown)}")
+    for c, subs in subcategory_keywords.items():
+        missing = set(subs) - set(subcategories.get(c, ()))
+        if missing:
+            raise ValueError(f"unknown subcategories of {c}: {sorted(missing)}")
+    if any("@" not in e for e in emails):
+        raise ValueError("allowed_emails must be email addresses")
+
+    breadcrumbs = {
+        c.lower(): (c, MappingProxyType({s.lower(): s for s in subcategories.get(c, ())}))
+        for c in subcategories
+    }
+    return ZuzuConfig(
+        version=version,
+        categories=categories,
+        subcategories=MappingProxyType(subcategories),
+        allowed_emails=emails,
+        allowed_emails_lower=frozenset(e.lower() for e in emails),
+        housing_rates=rates,
+        breadcrumbs=MappingProxyType(breadcrumbs),
+        classifier=_compile(subcategories, category_keywords, subcategory_keywords),
+        payload=MappingProxyType(payload),
+    )
+
+
+# -------------------------------------------------------------------
+# Active config
+# -------------------------------------------------------------------
+_current: Optional[ZuzuConfig] = None
+_build_lock = threading.Lock()
+_reloads = 0
+_reload_errors = 0
+_loaded_at: Optional[float] = None
+_checked_at: Optional[float] = None
+
+
+def current() -> ZuzuConfig:
+    """The active config (built-in defaults until a snapshot is loaded)."""
+    cfg = _current
+    if cfg is None:
+        with _build_lock:
+            if _current is None:
+                _swap(build(default_payload(), 0))
+            cfg = _current
+    return cfg
+
+
+def config_version() -> int:
+    return current().version
+
+
+def _swap(cfg: ZuzuConfig) -> None:
+    global _current, _loaded_at
+    _current = cfg
+    _loaded_at = time.time()
+
+
+def _latest(conn, version: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+    if version is None:
+        row = conn.execute(
+            "SELECT version, payload FROM config_snapshots ORDER BY version DESC LIMIT 1"
+        ).fetchone()
+    else:
+        row = conn.execute(
+            "SELECT version, payload FROM config_snapshots WHERE version = %s", (version,)
+        ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def reload() -> bool:
+    """Load the newest snapshot if it differs from the active one."""
+    global _reloads, _checked_at
+    from .db import pool
+
+    with pool.connection() as conn:
+        newest = conn.execute("SELECT max(version) FROM config_snapshots").fetchone()[0]
+        _checked_at = time.time()
+        if newest is None or newest == current().version:
+            return False
+        version, payload = _latest(conn)
+    # Compile outside the connection, then switch with one assignment.
+    _swap(build(payload, version))
+    _reloads += 1
+    logger.info("✅ config version %s loaded", version)
+    return True
+
+
+async def config_reload_loop() -> None:
+    """Background task: pick up newly published snapshots."""
+    global _reload_errors
+    while True:
+        try:
+            await asyncio.to_thread(reload)
+        except Exception as e:
+            _reload_errors += 1
+            # Bad snapshot or DB hiccup: keep serving the current config.
+            logger.warning("⚠️ config reload failed, keeping version %s: %s", config_version(), e)
+        await asyncio.sleep(CONFIG_RELOAD_SECS)
+
+
+def config_stats() -> Dict[str, Any]:
+    cfg = current()
+    return {
+        "version": cfg.version,
+        "loaded_at": _loaded_at,
+        "checked_at": _checked_at,
+        "reloads": _reloads,
+        "reload_errors": _reload_errors,
+        "categories": len(cfg.categories),
+        "allowed_emails": len(cfg.allowed_emails),
+    }
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def publish(payload: Dict[str, Any], comment: str = "") -> int:
+    """Validate and store `payload` as the next version. Returns it."""
+    from psycopg.types.json import Jsonb
+
+    from .db import pool
+
+    build(payload, -1)
+    with pool.connection() as conn:
+        row = conn.execute(
+            "INSERT INTO config_snapshots (payload, comment) VALUES (%s, %s) RETURNING version",
+            (Jsonb(payload), comment),
+        ).fetchone()
+    return row[0]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="ZUZU content config snapshots")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    e = sub.add_parser("export", help="write the active config as JSON")
+    e.add_argument("-o", "--output", help="file (default: stdout)")
+    e.add_argument("--defaults", action="store_true", help="built-in config instead")
+
+    p = sub.add_parser("publish", help="store a new version")
+    p.add_argument("file", nargs="?", help="JSON file")
+    p.add_argument("--from-version", type=int, help="republish an older version")
+    p.add_argument("--comment", default="")
+
+    sub.add_parser("status", help="list versions")
+    args = parser.parse_args(argv)
+
+    from .db import pool
+
+    if args.cmd == "export":
+        payload = default_payload()
+        if not args.defaults:
+            with pool.connection() as conn:
+                latest = _latest(conn)
+            if latest:
+                payload = latest[1]
+        out = json.dumps(payload, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(out + "\n")
+        else:
+            sys.stdout.write(out + "\n")
+    elif args.cmd == "publish":
+        if args.from_version is not None:
+            with pool.connection() as conn:
+                old = _latest(conn, args.from_version)
+            if not old:
+                parser.error(f"no version {args.from_version}")
+            payload = old[1]
+            comment = args.comment or f"republished version {args.from_version}"
+        elif args.file:
+            with open(args.file, encoding="utf-8") as f:
+                payload = json.load(f)
+            comment = args.comment
+        else:
+            parser.error("give a JSON file or --from-version")
+        try:
+            version = publish(payload, comment)
+        except ValueError as err:
+            raise SystemExit(f"❌ {err}")
+        print(f"✅ published version {version}; workers pick it up within {CONFIG_RELOAD_SECS:g}s")
+    else:
+        with pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT version, created_at, comment FROM config_snapshots ORDER BY version"
+            ).fetchall()
+        for version, created_at, comment in rows:
+            print(f"{version:>5}  {created_at:%Y-%m-%d %H:%M}  {comment or ''}")
+        if not rows:
+            print("no snapshots published; built-in defaults are active (version 0)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# app/consistency.py
+"""
+Answer-consistency scoring, computed offline.
+
+"Consistency" is how similar ZUZU's answers are when the same question
+(after normalisation) is asked more than once: the mean pairwise cosine
+similarity of the answer embeddings, scaled to 0–100.
+
+The old version embedded every answer of every chat inside the dashboard
+request. This job instead runs in the background:
+
+  1) pairs each new assistant message with the user message before it and
+     embeds the answers in batches (one API call per CONSISTENCY_EMBED_BATCH
+     answers), storing the vectors in `qa_embeddings`;
+  2) walks the repeated-question groups, computes pairwise similarities with
+     NumPy, and writes per-scope / per-category scores to
+     `consistency_scores` (scope '*' = system-wide, else a device_id).
+
+The dashboard only reads `consistency_scores`. Every API replica runs
+consistency_loop, but an advisory lock lets only one of them embed and
+score at a time.
+
+  python -m app.consistency run        # one pass
+"""
+import argparse
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .config_registry import current
+from .utils import naive_category
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "*"
+
+CONSISTENCY_INTERVAL_SECS = int(os.getenv("CONSISTENCY_INTERVAL_SECS", "900"))
+CONSISTENCY_EMBED_BATCH = int(os.getenv("CONSISTENCY_EMBED_BATCH", "64"))
+# Upper bound on new Q/A pairs embedded per pass, to cap API spend.
+CONSISTENCY_MAX_PAIRS_PER_RUN = int(os.getenv("CONSISTENCY_MAX_PAIRS_PER_RUN", "2000"))
+
+
+def normalize_question(q: str) -> str:
+    return " ".join((q or "").lower().strip().split())
+
+
+# -------------------------------------------------------------------
+# 1) Embed new Q/A pairs
+# -------------------------------------------------------------------
+# Assistant messages after the watermark, each with the latest user message
+# that precedes it in the same chat.
+_NEW_PAIRS_SQL = """
+SELECT a.chat_id, a.created_at, c.device_id, q.content, a.content
+FROM messages a
+JOIN chats c ON c.chat_id = a.chat_id
+CROSS JOIN LATERAL (
+    SELECT content
+    FROM messages q
+    WHERE q.chat_id = a.chat_id
+      AND q.role = 'user'
+      AND q.created_at <= a.created_at
+    ORDER BY q.created_at DESC
+    LIMIT 1
+) q
+WHERE a.role = 'assistant'
+  AND (a.created_at, a.chat_id::text) > (%s, %s)
+ORDER BY a.created_at, a.chat_id::text
+LIMIT %s
+"""
+
+
+def _watermark(conn) -> Tuple[Any, str]:
+    """(created_at, chat_id) of the last assistant message already embedded."""
+    row = conn.execute(
+        "SELECT last_answer_at, last_chat_id FROM consistency_state WHERE id"
+    ).fetchone()
+    if row is None:
+        row = conn.execute("SELECT '-infinity'::timestamptz, ''").fetchone()
+    return row[0], row[1]
+
+
+def embed_new_pairs(max_pairs: int = CONSISTENCY_MAX_PAIRS_PER_RUN) -> int:
+    """Embed answers newer than the watermark. Returns how many were stored."""
+    from .db import pool
+    from .llm import embed_texts
+
+    stored = 0
+    while stored < max_pairs:
+        with pool.connection() as conn:
+            since_at, since_chat = _watermark(conn)
+            rows = conn.execute(
+                _NEW_PAIRS_SQL,
+                (since_at, since_chat, min(CONSISTENCY_EMBED_BATCH, max_pairs - stored)),
+            ).fetchall()
+        if not rows:
+            break
+
+        # One embeddings call per batch, outside any DB transaction.
+        vectors = embed_texts([r[4] for r in rows])
+
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO qa_embeddings
+                        (chat_id, answered_at, device_id, question_key, category, embedding)
+                    VALUES (%s, %s, %s, %s, %s, %s::vector)
+                    ON CONFLICT (chat_id, answered_at) DO NOTHING
+                    """,
+                    [
+                        (
+                            chat_id,
+                            answered_at,
+                            device_id,
+                            normalize_question(question),
+                            naive_category(question),
+                            vec,
+                        )
+                        for (chat_id, answered_at, device_id, question, _), vec in zip(rows, vectors)
+                        if vec
+                    ],
+                )
+            conn.execute(
+                """
+                INSERT INTO consistency_state (id, last_answer_at, last_chat_id)
+                VALUES (TRUE, %s, %s)
+                ON CONFLICT (id) DO UPDATE
+                SET last_answer_at = EXCLUDED.last_answer_at,
+                    last_chat_id = EXCLUDED.last_chat_id
+                """,
+                (rows[-1][1], str(rows[-1][0])),
+            )
+        stored += len(rows)
+
+    return stored
+
+
+# -------------------------------------------------------------------
+# 2) Score repeated-question groups
+# -------------------------------------------------------------------
+def _iter_groups(conn) -> Iterator[Tuple[str, List[Optional[str]], List[str], np.ndarray]]:
+    """
+    Yield (question_key, device_ids, categories, unit vectors) for each
+    question asked at least twice, streaming through a server-side cursor.
+    """
+    with conn.cursor(name="consistency_groups") as cur:
+        cur.itersize = 2000
+        cur.execute(
+            """
+            SELECT question_key, device_id, category, embedding::real[]
+            FROM qa_embeddings
+            WHERE question_key IN (
+                SELECT question_key FROM qa_embeddings
+                GROUP BY question_key HAVING COUNT(*) > 1
+            )
+            ORDER BY question_key
+            """
+        )
+        key: Optional[str] = None
+        devices: List[Optional[str]] = []
+        cats: List[str] = []
+        vecs: List[List[float]] = []
+        for qk, device_id, cat, emb in cur:
+            if qk != key and vecs:
+                yield key, devices, cats, _unit_rows(vecs)
+                devices, cats, vecs = [], [], []
+            key = qk
+            devices.append(device_id)
+            cats.append(cat or "Other Inquiries")
+            vecs.append(emb)
+        if vecs:
+            yield key, devices, cats, _unit_rows(vecs)
+
+
+def _unit_rows(vecs: List[List[float]]) -> np.ndarray:
+    m = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return m / norms
+
+
+def _pair_stats(unit: np.ndarray) -> Tuple[float, int]:
+    """
+    Sum and count of the pairwise cosine similarities (i < j), in O(n·d):
+    ‖Σu‖² is the sum over all ordered pairs plus the diagonal, so the
+    n×n similarity matrix is never built.
+    """
+    n = unit.shape[0]
+    if n < 2:
+        return 0.0, 0
+    total = unit.sum(axis=0, dtype=np.float64)
+    diagonal = float(np.einsum("ij,ij->", unit, unit, dtype=np.float64))
+    return (float(total @ total) - diagonal) / 2.0, n * (n - 1) // 2
+
+
+def score_groups() -> int:
+    """Recompute consistency_scores from qa_embeddings. Returns rows written."""
+    from .db import pool
+
+    # (scope, category) -> [sum of similarities, pair count]; category '' = all.
+    acc: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0.0, 0])
+
+    def add(scope: str, cat: str, s: float, n: int) -> None:
+        for c in (cat, ""):
+            acc[(scope, c)][0] += s
+            acc[(scope, c)][1] += n
+
+    with pool.connection() as conn:
+        for _key, devices, cats, unit in _iter_groups(conn):
+            # A normalised question maps to one naive category.
+            cat = cats[0]
+            s, n = _pair_stats(unit)
+            add(GLOBAL_SCOPE, cat, s, n)
+
+            # Per-device scores only compare a device's own answers.
+            by_device: Dict[str, List[int]] = defaultdict(list)
+            for i, d in enumerate(devices):
+                if d is not None:
+                    by_device[d].append(i)
+            for d, idx in by_device.items():
+                if len(idx) > 1:
+                    ds, dn = _pair_stats(unit[idx])
+                    add(d, cat, ds, dn)
+
+    rows = [
+        (scope, cat, round(100.0 * s / n, 1), int(n))
+        for (scope, cat), (s, n) in acc.items()
+        if n
+    ]
+    with pool.connection() as conn:
+        conn.execute("DELETE FROM consistency_scores")
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO consistency_scores (scope, category, score, pairs, updated_at)
+                VALUES (%s, %s, %s, %s, now())
+                """,
+                rows,
+            )
+    return len(rows)
+
+
+# Arbitrary constant so only one worker runs the job at a time.
+_CONSISTENCY_LOCK_ID = 72_034
+
+
+def run_once() -> Optional[Tuple[int, int]]:
+    """
+    One embed + score pass. Returns None if another worker holds the job's
+    advisory lock (every replica runs consistency_loop).
+    """
+    from .db import pool
+
+    with pool.connection() as conn:
+        got = conn.execute(
+            "SELECT pg_try_advisory_lock(%s)", (_CONSISTENCY_LOCK_ID,)
+        ).fetchone()[0]
+        conn.commit()
+        if not got:
+            return None
+        try:
+            embedded = embed_new_pairs()
+            scored = score_groups()
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (_CONSISTENCY_LOCK_ID,))
+            conn.commit()
+
+    logger.info("Consistency job: embedded %d answers, wrote %d scores", embedded, scored)
+    return embedded, scored
+
+
+async def consistency_loop() -> None:
+    """Background task: one pass every CONSISTENCY_INTERVAL_SECS."""
+    while True:
+        try:
+            await asyncio.to_thread(run_once)
+        except Exception as e:
+            logger.exception("Consistency job failed: %s", e)
+        await asyncio.sleep(CONSISTENCY_INTERVAL_SECS)
+
+
+# -------------------------------------------------------------------
+# Read path (dashboard)
+# -------------------------------------------------------------------
+def fetch_consistency_scores(device_id: Optional[str]) -> Tuple[float, Dict[str, float]]:
+    """
+    Persisted (global score, per-category scores) for a scope. Anything not
+    scored yet (no repeated questions) counts as fully consistent.
+    """
+    from .db import pool
+
+    scope = GLOBAL_SCOPE if device_id is None else device_id
+    with pool.connection() as conn:
+        rows = conn.execute(
+            "SELECT category, score FROM consistency_scores WHERE scope = %s",
+            (scope,),
+        ).fetchall()
+
+    global_score = 100.0
+    per_cat_scores = {cat: 100.0 for cat in current().categories}
+    for cat, score in rows:
+        if cat == "":
+            global_score = float(score)
+        else:
+            per_cat_scores[cat] = float(score)
+    return global_score, per_cat_scores
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Answer consistency scoring")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("run")
+    parser.parse_args(argv)
+
+    result = run_once()
+    if result is None:
+        print("another worker is running the consistency job, skipped")
+        return
+    embedded, scored = result
+    print(f"✅ embedded {embedded} answers, wrote {scored} scores")
+
+
+if __name__ == "__main__":
+    main()
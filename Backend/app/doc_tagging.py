@@ -0,0 +1,99 @@
+# app/doc_tagging.py
+"""
+Category tagging for the `docs` table.
+
+Every doc gets a top-level ZUZU category and (when we can tell) one of its
+ZUZU_SUBCATEGORIES, so `search_docs` can scope retrieval to what the student
+picked in the UI ("Housing → Apartments").
+
+Docs are loaded into the table outside this repo and arrive untagged, so
+run the backfill after every ingestion: untagged docs are only found by
+unscoped searches and are left out of the category centroids. A loader that can import this module may call
+`tag_doc()` itself and insert the tags along with the row.
+
+  python -m app.doc_tagging            # only untagged docs
+  python -m app.doc_tagging --retag    # re-tag everything
+
+The category / subcategory columns and their index belong to the
+migrations (0001, 0002); the backfill applies pending ones first.
+"""
+import argparse
+from typing import List, Optional, Tuple
+
+from .utils import naive_category, naive_subcategory
+
+
+def tag_doc(title: str, url: str, content: str) -> Tuple[str, Optional[str]]:
+    """Return (category, subcategory) for a doc."""
+    # Title and URL path are much stronger signals than body text, which
+    # often carries site-wide navigation; repeat them so they dominate.
+    head = f"{title or ''} {(url or '').replace('-', ' ').replace('/', ' ')}"
+    text = f"{head} {head} {(content or '')[:2000]}"
+    category = naive_category(head)
+    if category == "Other Inquiries":
+        category = naive_category(text)
+    return category, naive_subcategory(text, category)
+
+
+def backfill(retag: bool = False, batch_size: int = 200) -> int:
+    """Tag docs in batches. Returns the number of rows updated."""
+    from .db import ensure_schema, pool
+
+    ensure_schema()
+
+    total = 0
+    last_id = None
+    while True:
+        with pool.connection() as conn:
+            where: List[str] = []
+            params: list = []
+            if not retag:
+                where.append("category IS NULL")
+            if last_id is not None:
+                where.append("id > %s")
+                params.append(last_id)
+            clause = ("WHERE " + " AND ".join(where)) if where else ""
+
+            rows = conn.execute(
+                f"""
+                SELECT id, title, url, content
+                FROM docs
+                {clause}
+                ORDER BY id
+                LIMIT %s
+                """,
+                (*params, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for doc_id, title, url, content in rows:
+                cat, sub = tag_doc(title, url, content)
+                updates.append((cat, sub, doc_id))
+
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "UPDATE docs SET category = %s, subcategory = %s WHERE id = %s",
+                    updates,
+                )
+
+        total += len(rows)
+        last_id = rows[-1][0]
+        print(f"  tagged {total} docs")
+
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Tag docs with ZUZU categories")
+    parser.add_argument("--retag", action="store_true", help="re-tag already tagged docs")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    n = backfill(retag=args.retag, batch_size=args.batch_size)
+    print(f"✅ tagged {n} docs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# app/embedding_store.py
+"""
+Reduced-size embedding storage for the `docs` table.
+
+By default docs are searched on the full-precision `embedding vector(1536)`
+column. This module lets us keep a second, smaller representation next to
+it and point `search_docs` at that column instead:
+
+  - halfvec        -> 2 bytes per dimension instead of 4
+  - Matryoshka     -> text-embedding-3-* vectors can be truncated to the
+                      first N dimensions and still rank well (cosine is
+                      scale-invariant, so no re-normalisation is needed)
+
+Config (env):
+  EMBED_STORAGE = vector | halfvec   (default: vector)
+  EMBED_DIMS    = 1..1536            (default: 1536)
+
+CLI:
+  python -m app.embedding_store migrate --storage halfvec --dims 768
+  python -m app.embedding_store report  --storage halfvec --dims 768
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+EMBED_FULL_DIMS = 1536
+STORAGE_TYPES = ("vector", "halfvec")
+
+EMBED_STORAGE = os.getenv("EMBED_STORAGE", "vector").strip().lower()
+EMBED_DIMS = int(os.getenv("EMBED_DIMS", str(EMBED_FULL_DIMS)))
+
+if EMBED_STORAGE not in STORAGE_TYPES:
+    raise RuntimeError(f"EMBED_STORAGE must be one of {STORAGE_TYPES}")
+if not 1 <= EMBED_DIMS <= EMBED_FULL_DIMS:
+    raise RuntimeError(f"EMBED_DIMS must be between 1 and {EMBED_FULL_DIMS}")
+
+
+# -------------------------------------------------------------------
+# Column naming helpers
+# -------------------------------------------------------------------
+def column_name(storage: str = EMBED_STORAGE, dims: int = EMBED_DIMS) -> str:
+    """
+    Name of the docs column holding vectors for (storage, dims).
+
+    The original full-precision column keeps its historical name.
+    """
+    if storage == "vector" and dims == EMBED_FULL_DIMS:
+        return "embedding"
+    base = "embedding" if storage == "vector" else "embedding_half"
+    if dims == EMBED_FULL_DIMS:
+        return base
+    return f"{base}_{dims}"
+
+
+def sql_type(storage: str = EMBED_STORAGE, dims: int = EMBED_DIMS) -> str:
+    return f"{storage}({dims})"
+
+
+def index_name(storage: str = EMBED_STORAGE, dims: int = EMBED_DIMS) -> str:
+    return f"docs_{column_name(storage, dims)}_hnsw_idx"
+
+
+def query_vector(v: Sequence[float], dims: int = EMBED_DIMS) -> List[float]:
+    """Truncate a full query embedding to the configured Matryoshka size."""
+    return list(v[:dims])
+
+
+# -------------------------------------------------------------------
+# Migration
+# -------------------------------------------------------------------
+def migrate(storage: str, dims: int, batch_size: int = 500) -> None:
+    """
+    Add the reduced column, backfill it from `embedding` in small batches
+    and build an HNSW index on it without locking the table.
+    """
+    from .db import pool, db_url
+
+    col = column_name(storage, dims)
+    if col == "embedding":
+        print("Full-precision column already exists, nothing to migrate.")
+        return
+
+    typ = sql_type(storage, dims)
+    if dims == EMBED_FULL_DIMS:
+        source = f"embedding::{typ}"
+    else:
+        source = f"subvector(embedding, 1, {dims})::{typ}"
+
+    with pool.connection() as conn:
+        conn.execute(f"ALTER TABLE docs ADD COLUMN IF NOT EXISTS {col} {typ}")
+
+    total = 0
+    while True:
+        with pool.connection() as conn:
+            cur = conn.execute(
+                f"""
+                UPDATE docs
+                SET {col} = {source}
+                WHERE id IN (
+                    SELECT id FROM docs
+                    WHERE {col} IS NULL AND embedding IS NOT NULL
+                    LIMIT %s
+                )
+                """,
+                (batch_size,),
+            )
+            updated = cur.rowcount or 0
+        total += updated
+        if updated:
+            print(f"  backfilled {total} rows into {col}")
+        if updated < batch_size:
+            break
+
+    opclass = f"{storage}_cosine_ops"
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so use
+    # a dedicated autocommit connection instead of one from the pool.
+    with psycopg.connect(db_url, autocommit=True) as conn:
+        conn.execute(
+            f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(storage, dims)}
+            ON docs USING hnsw ({col} {opclass})
+            """
+        )
+    print(f"✅ {col} ({typ}) ready, {total} rows backfilled")
+
+
+# -------------------------------------------------------------------
+# Comparison report
+# -------------------------------------------------------------------
+def _storage_stats(conn, col: str) -> Dict[str, Any]:
+    row = conn.execute(
+        f"SELECT COALESCE(SUM(pg_column_size({col})), 0) FROM docs"
+    ).fetchone()
+    column_bytes = int(row[0]) if row else 0
+
+    idx_rows = conn.execute(
+        """
+        SELECT COALESCE(SUM(pg_relation_size(indexrelid)), 0)
+        FROM pg_index i
+        JOIN pg_attribute a
+          ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = 'docs'::regclass AND a.attname = %s
+        """,
+        (col,),
+    ).fetchone()
+    index_bytes = int(idx_rows[0]) if idx_rows else 0
+    return {"column_bytes": column_bytes, "index_bytes": index_bytes}
+
+
+def _top_ids(conn, col: str, typ: str, doc_id: Any, k: int) -> List[Any]:
+    rows = conn.execute(
+        f"""
+        SELECT id
+        FROM docs
+        WHERE id <> %s AND {col} IS NOT NULL
+        ORDER BY {col} <=> (SELECT {col} FROM docs WHERE id = %s)::{typ}
+        LIMIT %s
+        """,
+        (doc_id, doc_id, k),
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def report(storage: str, dims: int, n_queries: int = 50, k: int = 10) -> Dict[str, Any]:
+    """
+    Compare a reduced column against full-precision exact search.
+
+    Queries are sampled doc embeddings (no API calls). Ground truth is an
+    exact scan on `embedding`; latency is reported for that scan, for the
+    full column as production runs it, and for the candidate column.
+    """
+    from .db import pool
+
+    col = column_name(storage, dims)
+    typ = sql_type(storage, dims)
+
+    recalls: List[float] = []
+    base_ms: List[float] = []
+    full_ms: List[float] = []
+    cand_ms: List[float] = []
+
+    with pool.connection() as conn:
+        sample = conn.execute(
+            f"""
+            SELECT id FROM docs
+            WHERE embedding IS NOT NULL AND {col} IS NOT NULL
+            ORDER BY random()
+            LIMIT %s
+            """,
+            (n_queries,),
+        ).fetchall()
+
+        for (doc_id,) in sample:
+            with conn.transaction():
+                conn.execute("SET LOCAL enable_indexscan = off")
+                t0 = time.perf_counter()
+                truth = _top_ids(conn, "embedding", sql_type("vector", EMBED_FULL_DIMS), doc_id, k)
+                base_ms.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            _top_ids(conn, "embedding", sql_type("vector", EMBED_FULL_DIMS), doc_id, k)
+            full_ms.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            got = _top_ids(conn, col, typ, doc_id, k)
+            cand_ms.append((time.perf_counter() - t0) * 1000)
+
+            if truth:
+                recalls.append(len(set(truth) & set(got)) / len(truth))
+
+        full = _storage_stats(conn, "embedding")
+        reduced = _storage_stats(conn, col)
+
+    return {
+        "column": col,
+        "type": typ,
+        "queries": len(sample),
+        "k": k,
+        "recall_at_k": round(statistics.mean(recalls), 4) if recalls else 0.0,
+        "exact_full_p50_ms": round(_pct(base_ms, 0.5), 2),
+        "exact_full_p95_ms": round(_pct(base_ms, 0.95), 2),
+        "full_p50_ms": round(_pct(full_ms, 0.5), 2),
+        "full_p95_ms": round(_pct(full_ms, 0.95), 2),
+        "candidate_p50_ms": round(_pct(cand_ms, 0.5), 2),
+        "candidate_p95_ms": round(_pct(cand_ms, 0.95), 2),
+        "full_column_bytes": full["column_bytes"],
+        "full_index_bytes": full["index_bytes"],
+        "candidate_column_bytes": reduced["column_bytes"],
+        "candidate_index_bytes": reduced["index_bytes"],
+    }
+
+
+def _print_report(result: Dict[str, Any]) -> None:
+    width = max(len(k) for k in result)
+    for key, value in result.items():
+        print(f"{key.ljust(width)}  {value}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reduced embedding storage for docs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    for name in ("migrate", "report"):
+        p = sub.add_parser(name)
+        p.add_argument("--storage", choices=STORAGE_TYPES, default=EMBED_STORAGE)
+        p.add_argument("--dims", type=int, default=EMBED_DIMS)
+        if name == "migrate":
+            p.add_argument("--batch-size", type=int, default=500)
+        else:
+            p.add_argument("--queries", type=int, default=50)
+            p.add_argument("-k", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "migrate":
+        migrate(args.storage, args.dims, args.batch_size)
+    else:
+        _print_report(report(args.storage, args.dims, args.queries, args.k))
+
+
+if __name__ == "__main__":
+    main()
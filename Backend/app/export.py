@@ -0,0 +1,283 @@
+# app/export.py
+"""
+Streaming exports of chats / messages / message_events for offline analysis,
+so analysts stop running ad-hoc queries against the live database.
+
+Every export runs on its own connection (not the app pool), in a read-only
+transaction, and streams rows in chunks of EXPORT_CHUNK_ROWS:
+
+  - CSV of tables without free text is produced by Postgres itself via
+    COPY ... TO STDOUT;
+  - everything else goes through a server-side (named) cursor, with message
+    content passed through `mask_pii` before it leaves the process.
+
+Memory stays bounded by one chunk, and the exporter sleeps
+EXPORT_PAUSE_SECS between chunks so it doesn't compete with /api/chat.
+
+Parquet output needs `pyarrow` (optional dependency).
+
+  python -m app.export messages --format parquet -o messages.parquet
+  python -m app.export all --since 2025-01-01 -o exports/
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+import psycopg
+
+from .db import db_url
+from .utils import mask_pii
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+EXPORT_PAUSE_SECS = float(os.getenv("EXPORT_PAUSE_SECS", "0.05"))
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "0"))
+
+FORMATS = ("csv", "parquet")
+
+# table -> (columns, columns to pass through mask_pii)
+EXPORT_TABLES: Dict[str, Dict[str, Any]] = {
+    "chats": {
+        "columns": ["chat_id", "device_id", "title", "created_at", "updated_at"],
+        "masked": [],
+    },
+    "messages": {
+        "columns": ["chat_id", "role", "content", "created_at"],
+        "masked": ["content"],
+    },
+    "message_events": {
+        "columns": [
+            "id", "chat_id", "device_id", "role", "category", "subcategory",
+            "confidence", "created_at",
+        ],
+        "masked": [],
+    },
+}
+
+
+def _select_sql(table: str, since: Optional[date], until: Optional[date]) -> str:
+    cols = ", ".join(EXPORT_TABLES[table]["columns"])
+    where = ["TRUE"]
+    if since is not None:
+        where.append("created_at >= %(since)s")
+    if until is not None:
+        where.append("created_at < %(until)s::date + 1")
+    return f"SELECT {cols} FROM {table} WHERE {' AND '.join(where)} ORDER BY created_at"
+
+
+def _connect() -> psycopg.Connection:
+    """Dedicated, read-only connection so exports never hold pool slots."""
+    conn = psycopg.connect(db_url)
+    conn.read_only = True
+    if EXPORT_STATEMENT_TIMEOUT_MS:
+        conn.execute(f"SET statement_timeout = {EXPORT_STATEMENT_TIMEOUT_MS}")
+    return conn
+
+
+# -------------------------------------------------------------------
+# Row sources
+# -------------------------------------------------------------------
+def iter_row_chunks(
+    table: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+) -> Iterator[List[tuple]]:
+    """Yield lists of (masked) rows from a server-side cursor."""
+    spec = EXPORT_TABLES[table]
+    masked = [spec["columns"].index(c) for c in spec["masked"]]
+
+    with _connect() as conn:
+        with conn.cursor(name=f"export_{table}") as cur:
+            cur.itersize = chunk_rows
+            cur.execute(_select_sql(table, since, until), {"since": since, "until": until})
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                if masked:
+                    rows = [
+                        tuple(mask_pii(v) if i in masked and v else v for i, v in enumerate(r))
+                        for r in rows
+                    ]
+                yield rows
+                time.sleep(EXPORT_PAUSE_SECS)
+
+
+def _iter_copy_csv(
+    table: str, since: Optional[date], until: Optional[date]
+) -> Iterator[bytes]:
+    """CSV straight from COPY TO STDOUT (tables without masked columns)."""
+    with _connect() as conn:
+        # COPY can't take bind parameters, so interpolate client-side.
+        with psycopg.ClientCursor(conn) as cur:
+            query = cur.mogrify(
+                _select_sql(table, since, until), {"since": since, "until": until}
+            )
+            with cur.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)") as copy:
+                sent = 0
+                for data in copy:
+                    yield bytes(data)
+                    sent += len(data)
+                    # COPY blocks arrive in ~8 KB pieces; pace per ~1 MB.
+                    if sent >= 1 << 20:
+                        sent = 0
+                        time.sleep(EXPORT_PAUSE_SECS)
+
+
+# -------------------------------------------------------------------
+# Formats
+# -------------------------------------------------------------------
+def _iter_csv(table: str, since: Optional[date], until: Optional[date]) -> Iterator[bytes]:
+    if not EXPORT_TABLES[table]["masked"]:
+        yield from _iter_copy_csv(table, since, until)
+        return
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_TABLES[table]["columns"])
+    for rows in iter_row_chunks(table, since, until):
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back in pieces."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self._parts.append(b)
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _iter_parquet(table: str, since: Optional[date], until: Optional[date]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = EXPORT_TABLES[table]["columns"]
+    types = {
+        "id": pa.int64(),
+        "confidence": pa.float32(),
+        "created_at": pa.timestamp("us", tz="UTC"),
+        "updated_at": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+    as_text = [types.get(c) is None for c in columns]  # UUIDs etc. -> str
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in iter_row_chunks(table, since, until):
+            arrays = []
+            for i, col in enumerate(zip(*rows)):
+                if as_text[i]:
+                    col = [None if v is None else str(v) for v in col]
+                arrays.append(pa.array(col, type=schema.field(i).type))
+            # One row group per chunk.
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(
+    table: str,
+    fmt: str = "csv",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> Iterator[bytes]:
+    """Byte chunks of `table` as CSV or Parquet (see module docstring)."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"unknown table {table!r}; choose from {', '.join(EXPORT_TABLES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}; choose from {', '.join(FORMATS)}")
+    if fmt == "csv":
+        return _iter_csv(table, since, until)
+    # Checked up front so an HTTP export fails before the response starts.
+    if not parquet_available():
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    return _iter_parquet(table, since, until)
+
+
+def export_to_file(
+    table: str,
+    path: str,
+    fmt: str = "csv",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> int:
+    """Write one export to `path`; returns bytes written."""
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in iter_export(table, fmt, since, until):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export chats / messages / events")
+    parser.add_argument("table", choices=[*EXPORT_TABLES, "all"])
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--since", type=date.fromisoformat)
+    parser.add_argument("--until", type=date.fromisoformat)
+    parser.add_argument(
+        "-o", "--out", help="output file, or directory for 'all' (default: cwd)"
+    )
+    args = parser.parse_args(argv)
+
+    tables = list(EXPORT_TABLES) if args.table == "all" else [args.table]
+    for table in tables:
+        if args.table == "all" or not args.out:
+            out_dir = args.out or "."
+            os.makedirs(out_dir, exist_ok=True)
+            path = os.path.join(out_dir, f"{table}.{args.format}")
+        else:
+            path = args.out
+        t0 = time.perf_counter()
+        n = export_to_file(table, path, args.format, args.since, args.until)
+        print(f"✅ {table}: {n:,} bytes -> {path} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# app/hll.py
+"""
+Small HyperLogLog implementation for approximate distinct counts.
+
+A sketch is `2 ** precision` one-byte registers (4 KB at the default
+precision of 12). Sketches of the same precision merge by taking the
+register-wise maximum, so per-day sketches can be combined into any
+window without touching the raw events.
+
+Standard error is about 1.04 / sqrt(2 ** precision):
+
+  precision  registers  size     std. error
+  10         1024       1 KB     ~3.3 %
+  12         4096       4 KB     ~1.6 %   (default)
+  14         16384      16 KB    ~0.8 %
+
+Values are hashed with 64-bit BLAKE2b, so no large-range correction is
+needed; small cardinalities use linear counting.
+"""
+import hashlib
+import math
+from typing import Iterable, Optional, Tuple
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def standard_error(precision: int) -> float:
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def register_update(value: str, precision: int) -> Tuple[int, int]:
+    """Return (register index, rank) that adding `value` would set."""
+    x = int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+    rest_bits = 64 - precision
+    idx = x >> rest_bits
+    rest = x & ((1 << rest_bits) - 1)
+    rank = rest_bits - rest.bit_length() + 1
+    return idx, rank
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 12, registers: Optional[bytes] = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(
+                f"HLL precision must be between {MIN_PRECISION} and {MAX_PRECISION}"
+            )
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.m)
+        else:
+            if len(registers) != self.m:
+                raise ValueError("register count does not match precision")
+            self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(int(math.log2(len(data))), data)
+
+    def add(self, value: str) -> None:
+        idx, rank = register_update(value, self.precision)
+        if self.registers[idx] < rank:
+            self.registers[idx] = rank
+
+    def update(self, values: Iterable[str]) -> None:
+        for v in values:
+            self.add(v)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
@@ -1,11 +1,12 @@
 # app/llm.py
 import os
 import asyncio
-from typing import List, Dict, Optional
+import threading
+from typing import Any, List, Dict, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
-from openai import AzureOpenAI
 
+from .config_registry import DEFAULT_ALLOWED_EMAILS, ZuzuConfig, current
 from .utils import contains_pii
 
 load_dotenv()
@@ -24,14 +25,29 @@ EMBED_DEPLOYMENT = os.getenv(
     "AZURE_OPENAI_EMBED_DEPLOYMENT", "text-embedding-3-large"
 ).strip()
 
-if not AZURE_ENDPOINT or not AZURE_API_KEY:
-    raise RuntimeError("Azure OpenAI config not set in environment")
+# The client (and the openai package) is only loaded on first use, so
+# importing this module is cheap and works without Azure settings.
+_client = None
+_client_lock = threading.Lock()
 
-client = AzureOpenAI(
-    azure_endpoint=AZURE_ENDPOINT,
-    api_key=AZURE_API_KEY,
-    api_version=AZURE_API_VERSION,
-)
+
+def get_client():
+    """The shared AzureOpenAI client, created on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not AZURE_ENDPOINT or not AZURE_API_KEY:
+                    raise RuntimeError("Azure OpenAI config not set in environment")
+
+                from openai import AzureOpenAI
+
+                _client = AzureOpenAI(
+                    azure_endpoint=AZURE_ENDPOINT,
+                    api_key=AZURE_API_KEY,
+                    api_version=AZURE_API_VERSION,
+                )
+    return _client
 
 # -------------------------------------------------------------------
 #  SYSTEM PROMPT – who is ZUZU and how should it behave
@@ -309,48 +325,80 @@ client = AzureOpenAI(
 # """
 
 
-ALLOWED_EMAILS = [
-    "admissions@wright.edu",
-    "wsugrad@wright.edu",
-    "raiderconnect@wright.edu",
-    "EnrollmentServices@wright.edu",
-    "wsu-registrar@wright.edu",
-    "international-admissions@wright.edu",
-    "housing@wright.edu",
-    "studenthealthinsurance@wright.edu",
-    "disability_services@wright.edu",
-    "career_services@wright.edu",
-    "helpdesk@wright.edu",
-    "wsupolice@wright.edu",
-    "studentconduct@wright.edu",
-    "deanofstudents@wright.edu",
-    "ucieimmigration@wright.edu",
-    "askucie@wright.edu"
-    "enrollmentservices@wright.edu "
-    
-]
-
 import re
 
-ALLOWED_EMAILS_LOWER = {e.lower() for e in ALLOWED_EMAILS}
+# Approved contact emails now live in the config (config_registry); these
+# names are the built-in defaults, kept for existing imports.
+ALLOWED_EMAILS = DEFAULT_ALLOWED_EMAILS
+ALLOWED_EMAILS_LOWER = frozenset(e.lower() for e in ALLOWED_EMAILS)
 WRIGHT_EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@wright\.edu", re.IGNORECASE)
 
 
+def _replace_email(match: re.Match) -> str:
+    email = match.group(0)
+    if email.lower() in current().allowed_emails_lower:
+        # keep allowed email exactly as the model wrote it
+        return email
+    # block everything else
+    return "the appropriate Wright State office (please check the official directory)"
+
+
 def enforce_allowed_emails(text: str) -> str:
     """
-    Allow ONLY emails from ALLOWED_EMAILS.
+    Allow ONLY the allowed emails of the active config.
     Any other @wright.edu email is replaced with a generic phrase.
     """
+    return WRIGHT_EMAIL_PATTERN.sub(_replace_email, text)
 
-    def _replace(match: re.Match) -> str:
-        email = match.group(0)
-        if email.lower() in ALLOWED_EMAILS_LOWER:
-            # keep allowed email exactly as the model wrote it
-            return email
-        # block everything else
-        return "the appropriate Wright State office (please check the official directory)"
 
-    return WRIGHT_EMAIL_PATTERN.sub(_replace, text)
+def _prefixes(s: str) -> str:
+    """Regex for any prefix of `s` (including ""): "(?:a(?:b)?)?"."""
+    out = ""
+    for ch in reversed(s):
+        out = f"(?:{re.escape(ch)}{out})?"
+    return out
+
+
+# Text at the end of the buffer that could still turn into a match once
+# more arrives: a run of local-part characters, optionally followed by "@"
+# and the start of "wright.edu".
+_EMAIL_TAIL = re.compile(
+    r"[A-Za-z0-9._%+-]*\Z|[A-Za-z0-9._%+-]+@" + _prefixes("wright.edu") + r"\Z",
+    re.IGNORECASE,
+)
+
+
+class StreamingEmailFilter:
+    """
+    `enforce_allowed_emails` for text that arrives in pieces.
+
+    feed() returns the text that is safe to send now; only the shortest tail
+    that could still become part of a @wright.edu address (usually the word
+    being written) is held back. Joining every feed() result and the final
+    flush() gives exactly enforce_allowed_emails(whole text).
+    """
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, chunk: str) -> str:
+        buf = self._buf + chunk
+        parts: List[str] = []
+        pos = 0
+        for m in WRIGHT_EMAIL_PATTERN.finditer(buf):
+            parts.append(buf[pos : m.start()])
+            parts.append(_replace_email(m))
+            pos = m.end()
+        # Starts before the tail can't match whatever comes next, so a
+        # later search may begin at the tail just as well as at `pos`.
+        hold = _EMAIL_TAIL.search(buf, pos).start()
+        parts.append(buf[pos:hold])
+        self._buf = buf[hold:]
+        return "".join(parts)
+
+    def flush(self) -> str:
+        rest, self._buf = self._buf, ""
+        return enforce_allowed_emails(rest)
 
 
 # SYSTEM_PROMPT = f"""
@@ -648,7 +696,9 @@ def enforce_allowed_emails(text: str) -> str:
 
 
 
-SYSTEM_PROMPT = f"""
+# {allowed_emails} and {housing_rates} are filled in from the active config
+# (render_system_prompt); write any other literal brace as {{ or }}.
+_SYSTEM_PROMPT_TEMPLATE = """
 You are ZUZU, a super friendly, high-energy onboarding guide for INTERNATIONAL students
 at Wright State University, with a special focus on helping international students feel
 confident and supported. 🎓🌎
@@ -935,45 +985,7 @@ You MUST include this clickable Markdown link:
 
 Wright Guarantee 2025–26 Housing Rates (Per Semester) (ON-CAMPUS HOUSING):
 
-Hamilton Hall  
-• Super Single — $3,273  
-• Double — $2,789  
-• Double Deluxe — $3,032  
-
-Honors Community  
-• Super Single — $4,521  
-• Double — $2,789  
-
-The Woods  
-• Single — $4,112  
-• Super Single — $4,526  
-• Super Single (Jacob Hall) — $5,234  
-• Double — $2,789  
-• Double (Jacob Hall) — $3,517  
-• Double Deluxe — $3,273  
-• Triple — $2,435  
-• Quad — $2,012  
-
-Forest Lane Apartments  
-• Studio — $2,899  
-• Small Two Bedroom — $3,032  
-• Large Two Bedroom — $3,336  
-
-College Park Apartments  
-• Quad — $2,535  
-• Updated Quad — $4,059  
-
-University Park Apartments  
-• Quad — $2,535  
-• Double Occupancy Quad: Single — $2,028  
-• Double Occupancy Quad: Double — $1,478  
-
-The Village Apartments  
-• Efficiency — $3,113  
-• Deluxe Efficiency — $3,556  
-• One Bedroom — $4,038  
-• Two Bedroom — $4,593  
-• Two Bedroom Split — $2,396  
+{housing_rates}
 
 RULES:
 - When answering any housing pricing question, ALWAYS use ONLY the rates above.
@@ -1030,7 +1042,7 @@ CONTACT INFO RULES (MANDATORY):
   (a) It appears in the retrieved context, OR
   (b) It is exactly one of these approved Wright State email addresses:
 
-{chr(10).join("- " + e for e in ALLOWED_EMAILS)}
+{allowed_emails}
 
 - You may ONLY provide a phone number or URL if it appears in the retrieved context
   or is explicitly specified in this system prompt.
@@ -1200,6 +1212,44 @@ STYLE REMINDERS:
   "You’re doing great by asking this early. Want to go over anything again? 💚"
 """
 
+
+def _render_rates(rates: Sequence[Tuple[str, Sequence[Tuple[str, int]]]]) -> str:
+    return "\n\n".join(
+        building + "  \n" + "\n".join(f"• {room} — ${usd:,}  " for room, usd in rooms)
+        for building, rooms in rates
+    )
+
+
+def render_system_prompt(cfg: ZuzuConfig) -> str:
+    return _SYSTEM_PROMPT_TEMPLATE.format(
+        allowed_emails="\n".join("- " + e for e in cfg.allowed_emails),
+        housing_rates=_render_rates(cfg.housing_rates),
+    )
+
+
+_prompt_cache: Tuple[int, str] = (-1, "")
+
+
+def system_prompt() -> str:
+    """The system prompt for the active config, rendered once per version."""
+    global _prompt_cache
+    cfg = current()
+    version, prompt = _prompt_cache
+    if version != cfg.version:
+        prompt = render_system_prompt(cfg)
+        _prompt_cache = (cfg.version, prompt)
+    return prompt
+
+
+def __getattr__(name: str) -> Any:
+    # Older imports: `SYSTEM_PROMPT` (the prompt for the config active at
+    # the time) and `client`, both resolved on first access.
+    if name == "SYSTEM_PROMPT":
+        return system_prompt()
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # WINGS_SNIPPET = (
 #     "WINGS login portal: [WINGS Login]"
 #     "(https://auth.wright.edu/idp/prp.wsf?client-request-id=9c361ff8-a5a8-4bd2-a21d-25e31d7914bb&username=&wa=wsignin1.0"
@@ -1229,9 +1279,9 @@ async def chat_complete(
     """
     Call Azure OpenAI chat completion with the given messages.
 
-    `messages` should already include a system message (normally SYSTEM_PROMPT).
+    `messages` should already include a system message (normally system_prompt()).
     """
-    resp = client.chat.completions.create(
+    resp = get_client().chat.completions.create(
         model=GPT_DEPLOYMENT,
         messages=messages,
         temperature=temperature,
@@ -1257,7 +1307,7 @@ def embed_text(text: str) -> List[float]:
     if not cleaned.strip():
         return []
 
-    resp = client.embeddings.create(
+    resp = get_client().embeddings.create(
         model=EMBED_DEPLOYMENT,
         input=[cleaned],
         dimensions=1536,  # force 1536
@@ -1270,12 +1320,33 @@ async def embed_text_async(text: str):
     if not cleaned.strip():
         return []
 
-    resp = client.embeddings.create(
+    resp = get_client().embeddings.create(
         model=EMBED_DEPLOYMENT,
         input=[cleaned],
         dimensions=1536,  # force 1536
     )
     return resp.data[0].embedding
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed many texts in one API call. Output lines up with `texts`;
+    blank inputs get [] and are not sent.
+    """
+    cleaned = [(t or "").replace("\n", " ") for t in texts]
+    idx = [i for i, t in enumerate(cleaned) if t.strip()]
+    out: List[List[float]] = [[] for _ in texts]
+    if not idx:
+        return out
+
+    resp = get_client().embeddings.create(
+        model=EMBED_DEPLOYMENT,
+        input=[cleaned[i] for i in idx],
+        dimensions=1536,  # force 1536
+    )
+    for item in resp.data:
+        out[idx[item.index]] = item.embedding
+    return out
   
   
 
@@ -1,8 +1,15 @@
 # app/main.py
+import asyncio
+import base64
 import os
+import time
+from contextlib import asynccontextmanager
 from uuid import uuid4, UUID
-from datetime import datetime, timezone
-from typing import Optional, List
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional, List, Sequence
+
+# Start of the API import, for the startup budget (see lifespan below).
+_IMPORT_STARTED = time.perf_counter()
 
 import logging
 from dotenv import load_dotenv
@@ -14,9 +21,10 @@ from fastapi import (
     Depends,
     Header,
     Body,
+    Query,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 load_dotenv()
@@ -28,6 +36,7 @@ logger = logging.getLogger(__name__)
 from .schemas import (
     ChatCreate,
     ChatSummary,
+    ChatPage,
     ChatPost,
     ChatReply,
     SearchRequest,
@@ -36,35 +45,140 @@ from .schemas import (
 )
 from .db import pool, ensure_schema
 from .storage import append_message, get_chat, delete_chat, get_last_messages
-from .llm import chat_complete, summarize_history, SYSTEM_PROMPT
-from .search import search_docs
-from .utils import naive_category, contains_pii, mask_pii
+from .llm import chat_complete, get_client, summarize_history, system_prompt
+from .search import search_docs, search_docs_with_vector
+from .search_cache import search_cache
+from .analytics_cache import analytics_cache, get_cached_analytics
+from .rollups import record_message_event, reconcile_loop
+from .pii_audit import pii_audit, pii_kinds
+from .config_registry import config_reload_loop, config_stats, config_version
+from .partitions import maintenance_loop
+from .centroids import classify_message
+from .classifier import classify
+from .utils import contains_pii, mask_pii, parse_breadcrumb
 
 # -------------------------------------------------------------------
-# FastAPI app
+# Startup
 # -------------------------------------------------------------------
-app = FastAPI(title="ZUZU Backend")
+# The worker starts serving as soon as the app is imported; the DB pool,
+# migrations, config, system prompt and Azure client are then set up by a
+# warm-up task. /healthz answers from the start (liveness), /readyz once
+# the warm-up has succeeded (readiness). Time from the start of this
+# import to serving is checked against STARTUP_BUDGET_MS;
+# `python -m app.startup_profile` shows where the import time goes.
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
 
+# Long-running maintenance tasks started with the app, cancelled on shutdown.
+_background_tasks: List[asyncio.Task] = []
 
-@app.get("/debug/ping")
-def ping():
-    return {"status": "alive"}
+_startup: Dict[str, Any] = {
+    "serving_ms": None,
+    "ready_ms": None,
+    "ready": False,
+    "checks": {},
+}
+
+
+def _ms_since_import() -> float:
+    return round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
 
 
-@app.on_event("startup")
-async def on_startup():
+async def _warm_up() -> None:
     """
-    Ensure DB schema exists on startup.
-    Do NOT crash the app if this fails.
+    Do what the first requests would otherwise pay for, then start the
+    maintenance loops. Failures are recorded for /readyz, never raised.
     """
+    checks = _startup["checks"]
     try:
-        ensure_schema()
+        # Opens the pool too.
+        await asyncio.to_thread(ensure_schema)
+        checks["db"] = "ok"
     except Exception as e:
+        # Don't crash – app should still run
         logger.exception(
             "❌ ensure_schema failed on startup, continuing without crash: %s", e
         )
-        # Don't re-raise – app should still run
-        pass
+        checks["db"] = f"error: {e}"
+
+    try:
+        await asyncio.to_thread(system_prompt)
+        checks["config"] = "ok"
+    except Exception as e:
+        logger.exception("❌ loading the content config failed: %s", e)
+        checks["config"] = f"error: {e}"
+
+    try:
+        await asyncio.to_thread(get_client)
+        checks["llm"] = "ok"
+    except Exception as e:
+        logger.error("❌ Azure OpenAI client unavailable: %s", e)
+        checks["llm"] = f"error: {e}"
+
+    _startup["ready_ms"] = _ms_since_import()
+    _startup["ready"] = all(v == "ok" for v in checks.values())
+    logger.info("✅ warm-up done in %.0f ms: %s", _startup["ready_ms"], checks)
+
+    from .consistency import consistency_loop  # pulls in NumPy
+
+    _background_tasks.append(asyncio.create_task(reconcile_loop()))
+    _background_tasks.append(asyncio.create_task(consistency_loop()))
+    _background_tasks.append(asyncio.create_task(maintenance_loop()))
+    _background_tasks.append(asyncio.create_task(pii_audit.run()))
+    _background_tasks.append(asyncio.create_task(config_reload_loop()))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _background_tasks.append(asyncio.create_task(_warm_up()))
+    _startup["serving_ms"] = _ms_since_import()
+    if _startup["serving_ms"] > STARTUP_BUDGET_MS:
+        logger.warning(
+            "⚠️ startup took %.0f ms, over the %.0f ms budget",
+            _startup["serving_ms"],
+            STARTUP_BUDGET_MS,
+        )
+    yield
+
+    for task in _background_tasks:
+        task.cancel()
+    # Let the tasks finish cancelling (pii_audit writes what's still queued).
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    await asyncio.to_thread(pool.close)
+
+
+# -------------------------------------------------------------------
+# FastAPI app
+# -------------------------------------------------------------------
+app = FastAPI(title="ZUZU Backend", lifespan=lifespan)
+
+
+@app.get("/debug/ping")
+def ping():
+    return {"status": "alive"}
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: answers as soon as the worker is serving."""
+    return {
+        "status": "alive",
+        "startup_ms": _startup["serving_ms"],
+        "startup_budget_ms": STARTUP_BUDGET_MS,
+        "uptime_s": round(time.perf_counter() - _IMPORT_STARTED, 1),
+    }
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once DB, config and the Azure client are set up."""
+    body = {
+        "ready": _startup["ready"],
+        "ready_ms": _startup["ready_ms"],
+        "checks": _startup["checks"],
+        "config_version": config_version() if _startup["checks"].get("config") == "ok" else None,
+    }
+    return JSONResponse(body, status_code=200 if _startup["ready"] else 503)
 
 
 # -------------------------------------------------------------------
@@ -119,34 +233,62 @@ def _shape_chat_summary_row(row) -> ChatSummary:
 # -------------------------------------------------------------------
 # Chats list + history
 # -------------------------------------------------------------------
-@app.get("/api/chats", response_model=List[ChatSummary])
+def _encode_chat_cursor(updated_at: datetime, chat_id) -> str:
+    raw = f"{updated_at.isoformat()}|{chat_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_chat_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        ts, chat_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), UUID(chat_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+@app.get("/api/chats", response_model=ChatPage)
 async def list_chats(
     device_id: str = Depends(require_device_id),
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
 ):
-    """List chats for a given device, newest first."""
+    """
+    List chats for a given device, newest first, one page at a time.
+
+    Keyset pagination on (updated_at, chat_id): each page starts right after
+    the previous page's last row, so deep pages cost the same as the first
+    (served by the covering index from migration 0003).
+    """
+    where = ""
+    params: list = [device_id]
+    if cursor:
+        where = "AND (updated_at, chat_id) < (%s, %s)"
+        params.extend(_decode_chat_cursor(cursor))
+    params.append(limit + 1)
+
     with pool.connection() as conn:
         rows = conn.execute(
-            """
+            f"""
             SELECT chat_id, title, created_at, updated_at
             FROM chats
             WHERE device_id=%s
-            ORDER BY updated_at DESC
-            LIMIT %s OFFSET %s
+            {where}
+            ORDER BY updated_at DESC, chat_id DESC
+            LIMIT %s
             """,
-            (device_id, limit, offset),
+            params,
         ).fetchall()
 
-    return [
-        ChatSummary(
-            chat_id=r[0],
-            title=r[1],
-            created_at=r[2].isoformat(),
-            updated_at=r[3].isoformat(),
-        )
-        for r in rows
-    ]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_chat_cursor(rows[-1][3], rows[-1][0])
+
+    return ChatPage(
+        chats=[_shape_chat_summary_row(r) for r in rows],
+        next_cursor=next_cursor,
+    )
 
 
 @app.get("/api/chats/{chat_id}")
@@ -155,8 +297,9 @@ async def get_chat_messages(
     device_id: str = Depends(require_device_id),
 ):
     """
-    Return messages for a chat.
-    Ensure the chat row exists & belongs to this device.
+    Return messages for a chat of this device.
+    Opening a chat doesn't create it: an unknown (or another device's)
+    chat_id is empty, and /api/chat creates the row with the first message.
     """
     try:
         with pool.connection() as conn:
@@ -164,17 +307,6 @@ async def get_chat_messages(
                 "SELECT 1 FROM chats WHERE chat_id=%s AND device_id=%s",
                 (chat_id, device_id),
             ).fetchone()
-
-            if not row:
-                # Auto-create chat row if this UUID is new
-                conn.execute(
-                    """
-                    INSERT INTO chats (chat_id, device_id, title, created_at, updated_at)
-                    VALUES (%s, %s, %s, now(), now())
-                    ON CONFLICT (chat_id) DO NOTHING
-                    """,
-                    (chat_id, device_id, "New Conversation"),
-                )
     except OperationalError as e:
         logger.exception("Database connection error in get_chat_messages: %s", e)
         raise HTTPException(
@@ -182,6 +314,8 @@ async def get_chat_messages(
             "Temporary database connection issue. Please try again.",
         )
 
+    if not row:
+        return JSONResponse([])
     return JSONResponse(await get_chat(str(chat_id)))
 
 
@@ -272,17 +406,8 @@ async def chat_api(
 
     # 2) PII check
     if contains_pii(user_msg):
-        try:
-            with pool.connection() as conn:
-                conn.execute(
-                    """
-                    INSERT INTO pii_events (chat_id, device_id, pii_type, created_at)
-                    VALUES (%s, %s, %s, now())
-                    """,
-                    (chat_id, device_id, "generic"),
-                )
-        except OperationalError as e:
-            logger.error("DB error saving pii_events: %s", e)
+        # Recorded in the background (pii_audit.py): kinds only, no values.
+        pii_audit.emit(chat_id, device_id, pii_kinds(user_msg))
 
         friendly_msg = (
             "⚠️ Oops, this message looks like it includes personal details "
@@ -299,24 +424,17 @@ async def chat_api(
             warning="Personal information detected. Message ignored for your safety.",
         )
 
-    # 3) Store user message + event
+    # 3) Store user message (its message_event is recorded after retrieval,
+    #    which may provide the query embedding for classification)
     try:
         await append_message(chat_id, "user", user_msg)
         with pool.connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO message_events (chat_id, device_id, role, category, created_at)
-                VALUES (%s, %s, 'user', %s, now())
-                """,
-                (chat_id, device_id, naive_category(user_msg)),
-            )
             conn.execute(
                 "UPDATE chats SET updated_at = now() WHERE chat_id = %s",
                 (chat_id,),
             )
     except OperationalError as e:
-        logger.error("DB error saving user message/message_event: %s", e)
-        # Continue anyway; worst case analytics miss an event
+        logger.error("DB error saving user message: %s", e)
 
     # 4) Memory
     recent = await get_last_messages(
@@ -335,9 +453,16 @@ async def chat_api(
     # 5) Retrieval context / vector search
     context_block = ""
     hits: List[dict] = []
+    query_vector: Optional[Sequence[float]] = None
     try:
         sources_topk = int(os.getenv("SOURCES_TOPK", "6"))
-        hits = search_docs(user_msg, sources_topk)
+        # UI button clicks arrive as "Category selection: Housing |
+        # Subcategory: Apartments"; scope retrieval to that category when
+        # we recognise it.
+        category, subcategory = parse_breadcrumb(user_msg)
+        hits, query_vector = search_docs_with_vector(
+            user_msg, sources_topk, category, subcategory
+        )
         logger.info("Vector search for '%s' returned %d hits", user_msg, len(hits))
 
         if hits:
@@ -350,8 +475,20 @@ async def chat_api(
         logger.exception("Vector search failed: %s", e)
         hits = []
         context_block = ""
+
+    try:
+        c = classify_message(user_msg, query_vector)
+        with pool.connection() as conn:
+            record_message_event(
+                conn, chat_id, device_id, "user",
+                c.category, c.subcategory, c.confidence, c.labels,
+            )
+    except OperationalError as e:
+        logger.error("DB error saving user message_event: %s", e)
+        # Continue anyway; worst case analytics miss an event
+
     messages: List[dict] = [
-    {"role": "system", "content": SYSTEM_PROMPT},
+    {"role": "system", "content": system_prompt()},
     ]
     if summary:
         messages.append(
@@ -419,13 +556,11 @@ async def chat_api(
     # 7) Store assistant message + event
     try:
         await append_message(chat_id, "assistant", reply)
+        c = classify(reply)
         with pool.connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO message_events (chat_id, device_id, role, category, created_at)
-                VALUES (%s, %s, 'assistant', %s, now())
-                """,
-                (chat_id, device_id, naive_category(reply)),
+            record_message_event(
+                conn, chat_id, device_id, "assistant",
+                c.category, c.subcategory, c.confidence, c.labels,
             )
             conn.execute(
                 "UPDATE chats SET updated_at = now() WHERE chat_id = %s",
@@ -464,6 +599,10 @@ def track_category(
     """
     chat_id = event.chat_id
     category = event.category or "Other Inquiries"
+    # The UI sends a breadcrumb ("Housing – Apartments").
+    crumb_category, subcategory = parse_breadcrumb(category)
+    if crumb_category:
+        category = crumb_category
 
     if not chat_id:
         logger.warning("track_category called without chat_id, skipping")
@@ -485,12 +624,8 @@ def track_category(
                 return {"status": "ok"}
 
             # 2) Safe insert, FK will not explode
-            conn.execute(
-                """
-                INSERT INTO message_events (chat_id, device_id, role, category, created_at)
-                VALUES (%s, %s, 'user', %s, NOW())
-                """,
-                (chat_id, device_id, category),
+            record_message_event(
+                conn, chat_id, device_id, "user", category, subcategory, 1.0,
             )
             conn.execute(
                 "UPDATE chats SET updated_at = now() WHERE chat_id = %s",
@@ -542,20 +677,39 @@ async def verify_admin(payload: dict = Body(None)):
 async def analytics_api(
     device_id: Optional[str] = Depends(require_device_id),
     admin_token: Optional[str] = Header(None, alias="X-Admin-Key"),
+    refresh: bool = Query(False),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    bucket: str = Query("day"),
 ):
     """
     If X-Admin-Key == ADMIN_DASH_TOKEN → return system-wide analytics.
     Otherwise → return analytics scoped to this device_id.
+
+    `start` / `end` (YYYY-MM-DD, inclusive) and `bucket` (hour/day/week)
+    select the usage time series; the default is the last 7 days, daily.
+
+    Responses are cached (analytics_cache.py); admins can pass
+    ?refresh=true to force a recompute.
     """
-    if admin_token == ADMIN_DASH_TOKEN:
+    is_admin = admin_token == ADMIN_DASH_TOKEN
+    if is_admin:
         device_filter = None
     else:
         device_filter = device_id
 
-    try:
-        from .analytics import get_analytics
+    if start is not None or end is not None or bucket != "day":
+        from .analytics import resolve_window
 
-        return await get_analytics(device_filter)
+        try:
+            start, end, bucket = resolve_window(start, end, bucket)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+    try:
+        return await get_cached_analytics(
+            device_filter, refresh and is_admin, start, end, bucket
+        )
     except Exception as e:
         logger.exception("analytics_api failed: %s", e)
         # Safe fallback shape that matches AdminAnalyticsResponse
@@ -567,6 +721,7 @@ async def analytics_api(
             },
             "top_categories": [],
             "by_day": [],
+            "bucket": bucket,
             "consistencyScore": 100.0,
             "consistencyByCategory": {},
         }
@@ -577,10 +732,86 @@ async def analytics_api(
 # -------------------------------------------------------------------
 @app.post("/api/search", response_model=SearchResponse)
 async def semantic_search(req: SearchRequest):
-    hits = search_docs(req.query, req.top_k)
+    hits = search_docs(req.query, req.top_k, req.category, req.subcategory)
     return {"hits": hits}
 
 
+@app.get("/api/admin/search-cache")
+async def search_cache_stats(
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Key"),
+):
+    """Hit ratio and size of the search_docs result cache (admin only)."""
+    if admin_token != ADMIN_DASH_TOKEN:
+        raise HTTPException(403, "Admin key required")
+    return search_cache.stats()
+
+
+@app.get("/api/admin/analytics-cache")
+async def analytics_cache_stats(
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Key"),
+):
+    """Hit / stale / refresh counts of the analytics response cache (admin only)."""
+    if admin_token != ADMIN_DASH_TOKEN:
+        raise HTTPException(403, "Admin key required")
+    return analytics_cache.stats()
+
+
+@app.get("/api/admin/pii-audit")
+async def pii_audit_stats(
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Key"),
+):
+    """Queued / written / dropped counts of the PII audit sink (admin only)."""
+    if admin_token != ADMIN_DASH_TOKEN:
+        raise HTTPException(403, "Admin key required")
+    return pii_audit.stats()
+
+
+@app.get("/api/admin/config")
+async def config_status(
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Key"),
+):
+    """Active content config version and reload status (admin only)."""
+    if admin_token != ADMIN_DASH_TOKEN:
+        raise HTTPException(403, "Admin key required")
+    return config_stats()
+
+
+# -------------------------------------------------------------------
+# Exports (admin)
+# -------------------------------------------------------------------
+@app.get("/api/admin/export/{table}")
+def export_table(
+    table: str,
+    format: str = Query("csv"),
+    since: Optional[date] = Query(None),
+    until: Optional[date] = Query(None),
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Key"),
+):
+    """
+    Stream chats / messages / message_events as CSV or Parquet (see
+    export.py). Message content is PII-masked. Sync handler on purpose:
+    Starlette iterates the generator in its threadpool, off the event loop.
+    """
+    if admin_token != ADMIN_DASH_TOKEN:
+        raise HTTPException(403, "Admin key required")
+
+    from .export import iter_export
+
+    try:
+        chunks = iter_export(table, format, since, until)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except RuntimeError as e:
+        raise HTTPException(501, str(e))
+
+    media = "text/csv" if format == "csv" else "application/vnd.apache.parquet"
+    return StreamingResponse(
+        chunks,
+        media_type=media,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
+
+
 
 # # app/main.py
 # import os
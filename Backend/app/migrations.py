@@ -0,0 +1,268 @@
+# app/migrations.py
+"""
+Versioned schema migrations.
+
+Migrations are plain SQL files in sql/migrations, named NNNN_description.sql
+and applied in order. Applied versions are recorded in `schema_migrations`
+together with a checksum, so an edited migration is reported instead of
+silently skipped.
+
+A file whose first line is
+
+  -- migrate: no-transaction
+
+is run statement by statement in autocommit mode. That is required for
+CREATE INDEX CONCURRENTLY, which keeps tables writable while an index is
+built. Every other file runs in a single transaction.
+
+Postgres cannot build an index CONCURRENTLY on a partitioned table
+(partitions.py), so for those the runner creates the index ON ONLY the
+parent, builds it CONCURRENTLY on each partition and attaches those.
+An index that duplicates an existing one (e.g. from partitions.convert)
+is not built again.
+
+Only one process migrates at a time (advisory lock), so several workers
+can start together. ensure_schema() applies pending migrations on startup
+unless MIGRATE_ON_STARTUP=false:
+
+  python -m app.migrations status
+  python -m app.migrations upgrade
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "sql",
+    "migrations",
+)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+_FILE_NAME = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+_CREATE_INDEX_CONCURRENTLY = re.compile(
+    r"^CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"(\w+)\s+ON\s+(\w+)\s+(.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Arbitrary constant so only one process migrates at a time.
+_MIGRATE_LOCK_ID = 72_039
+
+_BOOKKEEPING_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+version INT PRIMARY KEY,
+name TEXT NOT NULL,
+checksum TEXT NOT NULL,
+applied_at TIMESTAMPTZ DEFAULT now()
+)
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+    sql: str
+    checksum: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    out = []
+    for fname in sorted(os.listdir(directory)):
+        m = _FILE_NAME.match(fname)
+        if not m:
+            continue
+        path = os.path.join(directory, fname)
+        with open(path, encoding="utf-8") as f:
+            sql = f.read()
+        out.append(
+            Migration(
+                version=int(m.group(1)),
+                name=m.group(2),
+                path=path,
+                sql=sql,
+                checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            )
+        )
+    versions = [mg.version for mg in out]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"duplicate migration versions in {directory}")
+    return out
+
+
+def _split_statements(sql: str) -> List[str]:
+    """
+    Split a no-transaction migration into statements. These files hold
+    simple DDL only (no function bodies), so splitting on ';' is enough.
+    """
+    body = "\n".join(
+        line for line in sql.splitlines() if not line.strip().startswith("--")
+    )
+    return [s.strip() for s in body.split(";") if s.strip()]
+
+
+def _connect() -> psycopg.Connection:
+    from .db import db_url
+
+    return psycopg.connect(db_url, autocommit=True)
+
+
+def _applied(conn) -> dict:
+    conn.execute(_BOOKKEEPING_SQL)
+    rows = conn.execute("SELECT version, checksum FROM schema_migrations").fetchall()
+    return {v: c for v, c in rows}
+
+
+def _apply(conn, mg: Migration) -> None:
+    if mg.transactional:
+        with conn.transaction():
+            conn.execute(mg.sql)
+            _record(conn, mg)
+        return
+
+    from .partitions import is_partitioned
+
+    for stmt in _split_statements(mg.sql):
+        m = _CREATE_INDEX_CONCURRENTLY.match(stmt)
+        if m and is_partitioned(conn, m.group(3)):
+            _create_partitioned_index(conn, m.group(1) or "", m.group(2), m.group(3), m.group(4))
+        else:
+            conn.execute(stmt)
+    _record(conn, mg)
+
+
+def _create_partitioned_index(conn, unique: str, name: str, table: str, rest: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY for a partitioned table: an (invalid) index
+    ON ONLY the parent, one CONCURRENTLY built index per partition, each
+    attached to it. The parent index becomes valid once all are attached,
+    and every step is safe to rerun after an interruption.
+    """
+    from .partitions import list_partitions
+
+    conn.execute(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON ONLY {table} {rest}")
+    duplicate = conn.execute(
+        r"""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+          AND i.indexrelid <> %s::regclass
+          AND regexp_replace(pg_get_indexdef(i.indexrelid), ' INDEX \S+ ON (ONLY )?', ' INDEX ON ')
+            = regexp_replace(pg_get_indexdef(%s::regclass), ' INDEX \S+ ON (ONLY )?', ' INDEX ON ')
+        """,
+        (table, name, name),
+    ).fetchone()
+    if duplicate is not None:
+        conn.execute(f"DROP INDEX {name}")
+        logger.info("%s on %s: same as existing index %s, not built", name, table, duplicate[0])
+        return
+
+    for partition, _month in list_partitions(conn, table):
+        child = _child_index_name(name, partition)
+        conn.execute(
+            f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {rest}"
+        )
+        conn.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def _child_index_name(name: str, partition: str) -> str:
+    """<partition>_<name>, shortened to Postgres' 63-character limit."""
+    child = f"{partition}_{name}"
+    if len(child) <= 63:
+        return child
+    digest = hashlib.sha256(child.encode("utf-8")).hexdigest()[:8]
+    return f"{child[:54]}_{digest}"
+
+
+def _record(conn, mg: Migration) -> None:
+    conn.execute(
+        """
+        INSERT INTO schema_migrations (version, name, checksum)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (version) DO UPDATE SET checksum = EXCLUDED.checksum
+        """,
+        (mg.version, mg.name, mg.checksum),
+    )
+
+
+def upgrade(directory: str = MIGRATIONS_DIR) -> List[str]:
+    """Apply pending migrations in order. Returns the names applied."""
+    migrations = load_migrations(directory)
+    done: List[str] = []
+    with _connect() as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (_MIGRATE_LOCK_ID,))
+        try:
+            applied = _applied(conn)
+            for mg in migrations:
+                if mg.version in applied:
+                    if applied[mg.version] != mg.checksum:
+                        logger.warning(
+                            "⚠️ migration %04d_%s changed after it was applied",
+                            mg.version,
+                            mg.name,
+                        )
+                    continue
+                logger.info("Applying migration %04d_%s", mg.version, mg.name)
+                _apply(conn, mg)
+                done.append(f"{mg.version:04d}_{mg.name}")
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATE_LOCK_ID,))
+    return done
+
+
+def status(directory: str = MIGRATIONS_DIR) -> None:
+    migrations = load_migrations(directory)
+    with _connect() as conn:
+        applied = _applied(conn)
+        invalid = conn.execute(
+            """
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid
+            """
+        ).fetchall()
+
+    for mg in migrations:
+        if mg.version not in applied:
+            state = "pending"
+        elif applied[mg.version] != mg.checksum:
+            state = "applied (file changed since)"
+        else:
+            state = "applied"
+        mode = "" if mg.transactional else "  [no-transaction]"
+        print(f"{mg.version:04d}_{mg.name:<32} {state}{mode}")
+    for (name,) in invalid:
+        # Left behind by an interrupted CREATE INDEX CONCURRENTLY.
+        print(f"⚠️ invalid index {name}: DROP INDEX CONCURRENTLY {name}; then upgrade again")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Schema migrations")
+    parser.add_argument("cmd", choices=["status", "upgrade"])
+    parser.add_argument("--dir", default=MIGRATIONS_DIR)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "status":
+        status(args.dir)
+    else:
+        done = upgrade(args.dir)
+        print(f"✅ applied {', '.join(done)}" if done else "✅ schema up to date")
+
+
+if __name__ == "__main__":
+    main()
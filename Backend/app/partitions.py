@@ -0,0 +1,506 @@
+# app/partitions.py
+"""
+Monthly range partitioning and retention for `messages` and `message_events`.
+
+Both tables only grow, and every query filters them by chat_id and/or
+created_at. Once converted, each table is partitioned by month on
+created_at:
+
+  messages_p202509, messages_p202510, ...
+
+and this module keeps it that way:
+
+  - premake:   creates partitions PARTITION_PREMAKE_MONTHS ahead. There is
+               no default partition (it would make every DETACH scan it
+               under a lock), so an insert past the last partition fails;
+  - retention: partitions entirely older than the table's retention window
+               are detached with DETACH ... CONCURRENTLY and moved to the
+               ARCHIVE_SCHEMA schema, or dropped with RETENTION_ACTION=drop.
+
+Tables converted before the default partition was dropped from `convert`
+still have one; `maintain` moves its rows into monthly partitions and
+drops it (one short exclusive lock) before applying retention.
+
+Retention is per table, in months (0 = keep forever):
+
+  RETENTION_MONTHS_MESSAGES=24
+  RETENTION_MONTHS_MESSAGE_EVENTS=0
+
+Archived partitions are no longer visible to the app. Before a
+message_events partition leaves, its counts are folded into the
+analytics_retired_* tables so the all-time rollups keep them
+(rollups.fold_retired).
+
+Retention is resumable. An interrupted DETACH ... CONCURRENTLY leaves the
+partition "pending detach"; the next run finishes it with FINALIZE. An
+expired partition that was detached but not yet folded and archived is
+still in the public schema, and the next run folds and archives it.
+
+DDL runs with lock_timeout = PARTITION_LOCK_TIMEOUT_MS: creating or
+detaching a partition needs a lock on the parent, and waiting behind a
+long export or reclassify batch would queue every insert behind it. A
+statement that times out is retried a few times; after that the table is
+skipped until the next run (partitions are premade months ahead).
+
+Converting an existing table copies its rows into a new partitioned table
+and keeps the old one as <table>_legacy. Run it in a maintenance window:
+
+  python -m app.partitions convert messages
+  python -m app.partitions status
+  python -m app.partitions maintain [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import psycopg
+from psycopg import errors
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+PARTITION_MAINTENANCE_SECS = int(os.getenv("PARTITION_MAINTENANCE_SECS", "86400"))
+ARCHIVE_SCHEMA = os.getenv("ARCHIVE_SCHEMA", "archive")
+RETENTION_ACTION = os.getenv("RETENTION_ACTION", "archive").lower()  # archive | drop
+PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("PARTITION_LOCK_TIMEOUT_MS", "3000"))
+PARTITION_LOCK_RETRIES = 3
+
+# table -> index definitions created on the partitioned parent (and thus on
+# every partition).
+PARTITIONED_TABLES: Dict[str, List[str]] = {
+    "messages": [
+        "(chat_id, created_at)",
+    ],
+    "message_events": [
+        "(chat_id, created_at)",
+        "(created_at)",
+        "(role, device_id, created_at)",
+    ],
+}
+
+RETENTION_MONTHS: Dict[str, int] = {
+    t: int(os.getenv(f"RETENTION_MONTHS_{t.upper()}", "0")) for t in PARTITIONED_TABLES
+}
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+# -------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _connect() -> psycopg.Connection:
+    """DDL runs on its own autocommit connection, outside the app pool."""
+    from .db import db_url
+
+    conn = psycopg.connect(db_url, autocommit=True)
+    conn.execute(f"SET lock_timeout = {PARTITION_LOCK_TIMEOUT_MS}")
+    return conn
+
+
+T = TypeVar("T")
+
+
+def _retry_on_lock(what: str, fn: Callable[[], T]) -> T:
+    """Run fn, retrying after a pause when it hits lock_timeout."""
+    for attempt in range(1, PARTITION_LOCK_RETRIES + 1):
+        try:
+            return fn()
+        except errors.LockNotAvailable:
+            if attempt == PARTITION_LOCK_RETRIES:
+                raise
+            logger.warning("⚠️ %s hit lock_timeout, retry %d in %ds", what, attempt, attempt)
+            time.sleep(attempt)
+    raise AssertionError("unreachable")
+
+
+def is_partitioned(conn, table: str) -> bool:
+    row = conn.execute(
+        """
+        SELECT 1
+        FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = %s AND c.relnamespace = 'public'::regnamespace
+        """,
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def list_partitions(conn, table: str) -> List[Tuple[str, Optional[date]]]:
+    """(partition name, month) for each attached partition; month None = default."""
+    rows = conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s AND p.relnamespace = 'public'::regnamespace
+        ORDER BY c.relname
+        """,
+        (table,),
+    ).fetchall()
+    out = []
+    for (name,) in rows:
+        m = _PARTITION_NAME.search(name)
+        out.append((name, date(int(m.group(1)), int(m.group(2)), 1) if m else None))
+    return out
+
+
+def _create_partition(conn, table: str, month: date) -> bool:
+    name = partition_name(table, month)
+    try:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {name}
+            PARTITION OF {table}
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')
+            """
+        )
+        return True
+    except errors.LockNotAvailable:
+        raise  # the caller decides whether to retry
+    except psycopg.Error as e:
+        # e.g. rows for this month already sit in an old default partition.
+        logger.warning("⚠️ could not create partition %s: %s", name, e)
+        return False
+
+
+# -------------------------------------------------------------------
+# Conversion (one-off)
+# -------------------------------------------------------------------
+def convert(table: str, batch_months: int = 1) -> None:
+    """
+    Replace `table` with a monthly-partitioned copy. The original is renamed
+    to <table>_legacy and left in place for verification.
+    """
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"{table} is not configured for partitioning")
+    legacy = f"{table}_legacy"
+
+    with _connect() as conn:
+        if is_partitioned(conn, table):
+            print(f"{table} is already partitioned")
+            return
+
+        with conn.transaction():
+            conn.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+            seq_row = conn.execute(
+                "SELECT pg_get_serial_sequence(%s, 'id')", (table,)
+            ).fetchone()
+            has_id = conn.execute(
+                """
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = %s AND column_name = 'id'
+                """,
+                (table,),
+            ).fetchone() is not None
+            lo, hi, undated = conn.execute(
+                f"""
+                SELECT min(created_at), max(created_at),
+                       count(*) FILTER (WHERE created_at IS NULL)
+                FROM {table}
+                """
+            ).fetchone()
+            if undated:
+                raise RuntimeError(
+                    f"{table} has {undated} rows without created_at; fix them before converting"
+                )
+
+            conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+            conn.execute(
+                f"""
+                CREATE TABLE {table} (
+                    LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+                ) PARTITION BY RANGE (created_at)
+                """
+            )
+            conn.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+            if has_id:
+                # The partition key has to be part of the primary key.
+                conn.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+            conn.execute(
+                f"""
+                ALTER TABLE {table}
+                ADD FOREIGN KEY (chat_id) REFERENCES chats(chat_id) ON DELETE CASCADE
+                """
+            )
+            if seq_row and seq_row[0]:
+                conn.execute(f"ALTER SEQUENCE {seq_row[0]} OWNED BY {table}.id")
+            for i, cols in enumerate(PARTITIONED_TABLES[table]):
+                conn.execute(f"CREATE INDEX {table}_part_idx{i} ON {table} {cols}")
+
+            first = _month_start(lo.date()) if lo else _month_start(date.today())
+            last = _add_months(
+                _month_start(max(hi.date(), date.today()) if hi else date.today()),
+                PARTITION_PREMAKE_MONTHS,
+            )
+            month = first
+            while month <= last:
+                _create_partition(conn, table, month)
+                month = _add_months(month, 1)
+
+            # Copy month by month to keep each statement's footprint small.
+            month = first
+            while lo and month <= _month_start(hi.date()):
+                upper = _add_months(month, batch_months)
+                conn.execute(
+                    f"""
+                    INSERT INTO {table}
+                    SELECT * FROM {legacy}
+                    WHERE created_at >= %s AND created_at < %s
+                    """,
+                    (month, upper),
+                )
+                month = upper
+
+        conn.execute(f"ANALYZE {table}")
+    print(f"✅ {table} partitioned; old table kept as {legacy}")
+
+
+# -------------------------------------------------------------------
+# Routine maintenance
+# -------------------------------------------------------------------
+def premake(conn, table: str, months: int = PARTITION_PREMAKE_MONTHS) -> List[str]:
+    """Make sure partitions exist from this month through `months` ahead."""
+    existing = {m for _, m in list_partitions(conn, table) if m}
+    created = []
+    this_month = _month_start(date.today())
+    for i in range(months + 1):
+        month = _add_months(this_month, i)
+        if month in existing:
+            continue
+        name = partition_name(table, month)
+        if _retry_on_lock(f"create {name}", lambda: _create_partition(conn, table, month)):
+            created.append(name)
+    return created
+
+
+def _retention_cutoff(table: str, today: Optional[date] = None) -> Optional[date]:
+    """First month inside the retention window (None = keep forever)."""
+    months = RETENTION_MONTHS.get(table, 0)
+    if months <= 0:
+        return None
+    return _add_months(_month_start(today or date.today()), -months)
+
+
+def expired_partitions(conn, table: str, today: Optional[date] = None) -> List[str]:
+    """Partitions whose whole month is older than the retention window."""
+    cutoff = _retention_cutoff(table, today)
+    if cutoff is None:
+        return []
+    return [
+        name
+        for name, month in list_partitions(conn, table)
+        if month is not None and _add_months(month, 1) <= cutoff
+    ]
+
+
+def pending_detaches(conn, table: str) -> List[str]:
+    """Partitions left "pending detach" by an interrupted DETACH ... CONCURRENTLY."""
+    rows = conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s AND p.relnamespace = 'public'::regnamespace
+          AND i.inhdetachpending
+        ORDER BY c.relname
+        """,
+        (table,),
+    ).fetchall()
+    return [name for (name,) in rows]
+
+
+def detached_expired(conn, table: str, today: Optional[date] = None) -> List[str]:
+    """
+    Expired monthly tables still in the public schema but no longer
+    attached: retention detached them and stopped before archiving.
+    """
+    cutoff = _retention_cutoff(table, today)
+    if cutoff is None:
+        return []
+    rows = conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_class c
+        WHERE c.relnamespace = 'public'::regnamespace
+          AND c.relkind = 'r'
+          AND starts_with(c.relname, %s)
+          AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+        ORDER BY c.relname
+        """,
+        (f"{table}_p",),
+    ).fetchall()
+    out = []
+    for (name,) in rows:
+        m = _PARTITION_NAME.search(name)
+        if m and name == f"{table}_p{m.group(1)}{m.group(2)}":
+            if _add_months(date(int(m.group(1)), int(m.group(2)), 1), 1) <= cutoff:
+                out.append(name)
+    return out
+
+
+def drop_default(conn, table: str) -> bool:
+    """
+    Remove a default partition left by an older `convert`: detach it,
+    create monthly partitions for the rows it holds, move them there and
+    drop it, all in one transaction.
+    """
+    name = f"{table}_default"
+    if (name, None) not in list_partitions(conn, table):
+        return False
+
+    def move() -> int:
+        with conn.transaction():
+            conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            months = conn.execute(
+                f"SELECT DISTINCT date_trunc('month', created_at)::date FROM {name}"
+            ).fetchall()
+            for (month,) in months:
+                if not _create_partition(conn, table, month):
+                    raise RuntimeError(f"could not create {partition_name(table, month)}")
+            conn.execute(f"INSERT INTO {table} SELECT * FROM {name}")
+            conn.execute(f"DROP TABLE {name}")
+        return len(months)
+
+    moved = _retry_on_lock(f"drop {name}", move)
+    logger.info("Dropped default partition %s (%d months of rows moved)", name, moved)
+    return True
+
+
+def _retire(conn, name: str, table: str) -> None:
+    """Fold a detached partition's counts (message_events), then archive or drop it."""
+    with conn.transaction():
+        if table == "message_events":
+            from .rollups import fold_retired
+
+            fold_retired(conn, name)
+        if RETENTION_ACTION == "drop":
+            conn.execute(f"DROP TABLE {name}")
+        else:
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+            conn.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+    logger.info("Retention: %s %s", RETENTION_ACTION, name)
+
+
+def apply_retention(conn, table: str, dry_run: bool = False) -> List[str]:
+    if dry_run:
+        return detached_expired(conn, table) + expired_partitions(conn, table)
+
+    def detach(name: str) -> None:
+        # CONCURRENTLY only takes a brief lock on the parent; it cannot run
+        # inside a transaction block (`_connect` is autocommit). If it was
+        # interrupted (here or in an earlier run), FINALIZE completes it.
+        if name in pending_detaches(conn, table):
+            conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE")
+        else:
+            conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY")
+
+    # Finish what an interrupted run left behind first: a pending detach
+    # blocks every other DETACH on the parent.
+    for name in pending_detaches(conn, table):
+        _retry_on_lock(f"finalize {name}", lambda: detach(name))
+    leftover = detached_expired(conn, table)
+    for name in leftover:
+        _retire(conn, name, table)
+
+    expired = expired_partitions(conn, table)
+    for name in expired:
+        _retry_on_lock(f"detach {name}", lambda: detach(name))
+        _retire(conn, name, table)
+    return leftover + expired
+
+
+def maintain(dry_run: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """premake + retention for every partitioned table; others are skipped."""
+    report: Dict[str, Dict[str, List[str]]] = {}
+    with _connect() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            try:
+                if not dry_run:
+                    drop_default(conn, table)
+                report[table] = {
+                    "created": [] if dry_run else premake(conn, table),
+                    "expired": apply_retention(conn, table, dry_run),
+                }
+            except errors.LockNotAvailable as e:
+                logger.warning("⚠️ %s skipped until the next run, lock_timeout: %s", table, e)
+    return report
+
+
+async def maintenance_loop() -> None:
+    """Background task: run `maintain` on startup and then daily."""
+    while True:
+        try:
+            report = await asyncio.to_thread(maintain)
+            if report:
+                logger.info("Partition maintenance: %s", report)
+        except Exception as e:
+            logger.exception("Partition maintenance failed: %s", e)
+        await asyncio.sleep(PARTITION_MAINTENANCE_SECS)
+
+
+def status() -> None:
+    with _connect() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                print(f"{table}: not partitioned")
+                continue
+            parts = list_partitions(conn, table)
+            months = RETENTION_MONTHS.get(table, 0)
+            print(
+                f"{table}: {len(parts)} partitions, "
+                f"retention {'forever' if months <= 0 else f'{months} months'}"
+            )
+            for name, _month in parts:
+                size = conn.execute(
+                    "SELECT pg_size_pretty(pg_total_relation_size(%s::regclass))", (name,)
+                ).fetchone()[0]
+                print(f"  {name:<28} {size}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Partition maintenance")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_convert = sub.add_parser("convert")
+    p_convert.add_argument("table", choices=list(PARTITIONED_TABLES))
+    sub.add_parser("status")
+    p_maint = sub.add_parser("maintain")
+    p_maint.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "convert":
+        convert(args.table)
+    elif args.cmd == "status":
+        status()
+    else:
+        report = maintain(args.dry_run)
+        for table, r in report.items():
+            print(f"{table}: created {r['created'] or '-'}, expired {r['expired'] or '-'}")
+        if not report:
+            print("No partitioned tables.")
+
+
+if __name__ == "__main__":
+    main()
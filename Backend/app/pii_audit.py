@@ -0,0 +1,141 @@
+# app/pii_audit.py
+"""
+Asynchronous, batched recording of blocked-PII incidents.
+
+When `chat_api` blocks a message for PII, the student should get the warning
+right away, not after a pii_events insert and five rollup upserts. The
+handler calls `pii_audit.emit()` instead, which only puts the incident on an
+in-process queue. A background task (started with the app) drains the queue
+every PII_AUDIT_FLUSH_SECS, or sooner once PII_AUDIT_BATCH incidents are
+waiting, and writes each batch in one transaction
+(rollups.record_pii_events).
+
+An incident is (chat_id, device_id, kinds, time), where `kinds` are the
+pattern kinds from utils.detect_pii_spans ("email", "phone", ...). The
+matched values never leave the request.
+
+If the queue is full (database down for a long time) new incidents are
+dropped and counted rather than growing memory; a failed batch is retried
+once with the next flush, then dropped. Pending incidents are written on
+shutdown.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils import detect_pii_spans
+
+logger = logging.getLogger(__name__)
+
+PII_AUDIT_FLUSH_SECS = float(os.getenv("PII_AUDIT_FLUSH_SECS", "1.0"))
+PII_AUDIT_BATCH = int(os.getenv("PII_AUDIT_BATCH", "200"))
+PII_AUDIT_QUEUE_MAX = int(os.getenv("PII_AUDIT_QUEUE_MAX", "10000"))
+
+Incident = Tuple[str, str, List[str], datetime]
+
+
+def pii_kinds(text: str) -> List[str]:
+    """Sorted, distinct kinds of PII found in `text` (no values)."""
+    return sorted({kind for _s, _e, _val, kind in detect_pii_spans(text)})
+
+
+class PiiAuditSink:
+    """Queue + single writer task."""
+
+    def __init__(self, flush_secs: float, batch: int, queue_max: int):
+        self.flush_secs = flush_secs
+        self.batch = batch
+        self.queue_max = queue_max
+        self._queue: Optional["asyncio.Queue[Incident]"] = None
+        self._retry: List[Incident] = []
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+
+    def _q(self) -> "asyncio.Queue[Incident]":
+        # Created lazily so it binds to the running event loop.
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_max)
+        return self._queue
+
+    def emit(self, chat_id: str, device_id: str, kinds: List[str]) -> None:
+        """Queue an incident; never blocks and never touches the database."""
+        incident = (chat_id, device_id, kinds or ["generic"], datetime.now(timezone.utc))
+        try:
+            self._q().put_nowait(incident)
+            self.emitted += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("⚠️ PII audit queue full, %d incidents dropped", self.dropped)
+
+    async def _next_batch(self) -> List[Incident]:
+        """Wait for one incident, then collect more for up to flush_secs."""
+        q = self._q()
+        items = [await q.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_secs
+        while len(items) < self.batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(q.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    def _drain_now(self) -> List[Incident]:
+        q = self._q()
+        items = []
+        while not q.empty():
+            items.append(q.get_nowait())
+        return items
+
+    async def _write(self, items: List[Incident]) -> None:
+        from .db import pool
+        from .rollups import record_pii_events
+
+        def write() -> None:
+            with pool.connection() as conn:
+                record_pii_events(conn, items)
+
+        batch, self._retry = self._retry + items, []
+        try:
+            await asyncio.to_thread(write)
+            self.written += len(batch)
+        except Exception as e:
+            # Keep the new incidents for one more try; drop ones that
+            # already failed once.
+            self.dropped += len(batch) - len(items)
+            self._retry = items
+            logger.error("❌ writing %d PII audit incidents failed: %s", len(batch), e)
+
+    async def run(self) -> None:
+        """Background task: write batches until cancelled, then flush."""
+        try:
+            while True:
+                await self._write(await self._next_batch())
+        except asyncio.CancelledError:
+            pending = self._drain_now() + self._retry
+            self._retry = []
+            if pending:
+                await self._write(pending)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+pii_audit = PiiAuditSink(
+    flush_secs=PII_AUDIT_FLUSH_SECS,
+    batch=PII_AUDIT_BATCH,
+    queue_max=PII_AUDIT_QUEUE_MAX,
+)
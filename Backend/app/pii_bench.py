@@ -0,0 +1,246 @@
+# app/pii_bench.py
+"""
+Benchmark for the PII helpers in utils.py on long pasted messages.
+
+Compares the old implementation (six regexes run one after another, then
+sort + merge, with `contains_pii` / `mask_pii` each redoing all of it) with
+the single combined scanner, and checks that both mask exactly the same
+characters (tests/test_pii.py has the cases that once differed).
+
+With --adversarial it instead times inputs built to make regexes
+backtrack (long digit runs, digits between long runs of spaces, "+1 "
+repeated, e-mail-like tokens without an "@", pasted chat transcripts,
+emoji-heavy text) at two sizes, and fails unless scan time grows roughly
+linearly with length. The legacy code is only timed at the smaller size:
+some of these inputs are quadratic for it.
+
+  python -m app.pii_bench                             # 500 texts of ~8 KB
+  python -m app.pii_bench --texts 200 --kb 50 --pii-rate 0
+  python -m app.pii_bench --adversarial --sizes 8,64
+"""
+import argparse
+import math
+import random
+import re
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from .utils import contains_pii, detect_pii_spans, mask_pii
+
+_LEGACY_REGEXES = [
+    re.compile(r"\b\d{3}-\d{2}-\d{4}\b"),
+    re.compile(r"\b\d{9}\b"),
+    re.compile(r"\b(?:\+?1[\s-]?)?(?:\(\d{3}\)|\d{3})[\s-]?\d{3}[\s-]?\d{4}\b"),
+    re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"),
+    re.compile(r"\b(?:\d[ -]*?){13,16}\b"),
+    re.compile(
+        r"\b\d+\s+(?:street|st\.?|avenue|ave\.?|road|rd\.?|lane|ln\.?|drive|dr\.?)\b",
+        re.IGNORECASE,
+    ),
+]
+
+
+def _legacy_detect_pii_spans(text: str) -> List[tuple]:
+    spans: List[tuple] = []
+    if not text:
+        return spans
+    for pat in _LEGACY_REGEXES:
+        for m in pat.finditer(text):
+            spans.append((m.start(), m.end(), m.group(0), pat.pattern))
+    spans.sort(key=lambda x: x[0])
+    merged: List[tuple] = []
+    for s, e, val, pat in spans:
+        if merged and s <= merged[-1][1]:
+            last_s, last_e, last_val, last_pat = merged[-1]
+            merged[-1] = (last_s, max(last_e, e), last_val, last_pat)
+        else:
+            merged.append((s, e, val, pat))
+    return merged
+
+
+def _legacy_contains_pii(text: str) -> bool:
+    return bool(_legacy_detect_pii_spans(text or ""))
+
+
+def _legacy_mask_pii(text: str) -> str:
+    out = text or ""
+    for s, e, _val, _pat in sorted(
+        _legacy_detect_pii_spans(text or ""), key=lambda x: x[0], reverse=True
+    ):
+        out = out[:s] + "<PII>" + out[e:]
+    return out
+
+
+# ---------------- corpus ----------------
+
+_PROSE = (
+    "Hi, I am an incoming graduate student and I have a few questions about "
+    "my housing contract, the I-20 and when I should book my flight. My "
+    "advisor said the orientation starts on August 18 at 9:30 in room 120. "
+    "I already paid the $250 deposit on 07/02/2025 and got confirmation "
+    "number WSU-2025-118. "
+)
+_LOG = (
+    "2025-08-14T10:22:31.118Z INFO  request_id=7f3c2a91 user_agent=Mozilla/5.0 "
+    "path=/api/chat status=200 elapsed_ms=1432 bytes=18231 "
+)
+_CODE = (
+    "def total(items):\n    return sum(i.price * i.qty for i in items)  "
+    "# version 3.11.7, build 20250814\n"
+)
+_TOKEN = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9" * 4 + " "
+_PII = [
+    "my SSN is 123-45-6789",
+    "call me at (937) 555-0142",
+    "email jane.doe@example.com",
+    "card 4111 1111 1111 1111",
+    "I live at 3640 Colonel Glenn Hwy, 12 Main Street",
+    "student id 123456789",
+    "+1 937-555-0199",
+]
+
+
+def make_texts(n: int, kb: float, pii_rate: float, seed: int = 11) -> List[str]:
+    """Long pastes of prose / logs / code / tokens, some with PII inside."""
+    rng = random.Random(seed)
+    blocks = [_PROSE, _LOG, _CODE, _TOKEN]
+    texts = []
+    for _ in range(n):
+        parts: List[str] = []
+        size = 0
+        while size < kb * 1024:
+            block = rng.choice(blocks)
+            parts.append(block)
+            size += len(block)
+        if rng.random() < pii_rate:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(_PII) + ". ")
+        texts.append("".join(parts))
+    return texts
+
+
+def _repeat(unit: str, n: int) -> str:
+    return unit * (n // len(unit) + 1)
+
+
+def _transcript_line(i: int) -> str:
+    return (
+        f"[{i % 24:02d}:{i % 60:02d}:{(7 * i) % 60:02d}] user{i % 7}: order "
+        f"{100000 + 37 * i} shipped, {i % 9} items, ref {i * 7919 % 10**6:06d}\n"
+    )
+
+
+# name -> text of about n characters
+ADVERSARIAL: Dict[str, Callable[[int], str]] = {
+    "digit run": lambda n: "4" * n,
+    "digit space": lambda n: _repeat("4 ", n),
+    "digit dash": lambda n: _repeat("4-", n),
+    "spaced digits": lambda n: _repeat("4" + " " * 40, n),
+    "dashed digits": lambda n: _repeat("4" + " -" * 200, n),
+    "near-card": lambda n: _repeat("4 " * 15 + "4x ", n),
+    "plus one": lambda n: _repeat("+1 ", n),
+    "parens": lambda n: _repeat("(555) ", n),
+    "no-at token": lambda n: "a" * n,
+    "dotted token": lambda n: _repeat("a.", n),
+    "long domain": lambda n: "a@" + _repeat("a.", n),
+    "at chain": lambda n: _repeat("a@", n),
+    "number street": lambda n: _repeat("12" + " " * 30 + "stree ", n),
+    "transcript": lambda n: "".join(_transcript_line(i) for i in range(n // 60 + 1)),
+    "emoji": lambda n: _repeat("\U0001F600 4 \U0001F389 a@ \u2014 ", n),
+}
+
+
+def adversarial(sizes_kb: List[float], runs: int) -> bool:
+    """Print timings per adversarial input; False if any grows superlinearly."""
+    lo, hi = (int(kb * 1024) for kb in sizes_kb)
+    print(
+        f"{'input':<15}{'legacy @' + format(sizes_kb[0], 'g') + 'KB':>14}"
+        + "".join(f"{'mask @' + format(kb, 'g') + 'KB':>14}" for kb in sizes_kb)
+        + f"{'µs/KB':>8}{'growth':>8}"
+    )
+    ok = True
+    for name, make in ADVERSARIAL.items():
+        small, large = make(lo)[:lo], make(hi)[:hi]
+        legacy_ms = _time(_legacy_mask_pii, [small], 1)
+        t_small = _time(mask_pii, [small], runs)
+        t_large = _time(mask_pii, [large], runs)
+        # Exponent of time vs. length: ~1 is linear, ~2 quadratic. Tiny
+        # timings are mostly noise, so only judge ones above 1 ms.
+        growth = math.log(max(t_large, 1e-6) / max(t_small, 1e-6)) / math.log(hi / lo)
+        bad = growth > 1.3 and t_large > 1
+        ok &= not bad
+        print(
+            f"{name:<15}{legacy_ms:11.2f} ms{t_small:11.2f} ms{t_large:11.2f} ms"
+            f"{t_large * 1e3 / (hi / 1024):8.0f}{growth:8.2f}{'  ❌' if bad else ''}"
+        )
+    return ok
+
+
+def _covered(spans: List[tuple]) -> set:
+    return {i for s, e, *_ in spans for i in range(s, e)}
+
+
+def _time(fn: Callable[[str], object], texts: List[str], runs: int) -> float:
+    """Median ms per text over `runs` passes."""
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        out.append((time.perf_counter() - t0) / len(texts) * 1e3)
+    return statistics.median(out)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark PII detection / masking")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--kb", type=float, default=8, help="approx. size of each text")
+    parser.add_argument(
+        "--pii-rate", type=float, default=0.3, help="share of texts containing PII"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--adversarial", action="store_true", help="worst-case inputs instead"
+    )
+    parser.add_argument(
+        "--sizes", default="8,64", help="two sizes in KB for --adversarial"
+    )
+    args = parser.parse_args(argv)
+
+    if args.adversarial:
+        sizes = [float(x) for x in args.sizes.split(",")]
+        if len(sizes) != 2 or sizes[0] >= sizes[1]:
+            parser.error("--sizes takes two increasing sizes, e.g. 8,64")
+        if not adversarial(sizes, args.runs):
+            raise SystemExit("❌ PII scan time grows faster than linearly")
+        return
+
+    texts = make_texts(args.texts, args.kb, args.pii_rate)
+    missed = wider = 0
+    for t in texts:
+        before = _covered(_legacy_detect_pii_spans(t))
+        after = _covered(detect_pii_spans(t))
+        missed += bool(before - after)
+        wider += bool(after - before)
+    flagged = sum(contains_pii(t) for t in texts)
+    print(
+        f"{len(texts)} texts of ~{args.kb:g} KB, {flagged} with PII; "
+        f"masks less than legacy: {missed}, more: {wider}"
+    )
+
+    for name, legacy, new in (
+        ("contains_pii", _legacy_contains_pii, contains_pii),
+        ("mask_pii", _legacy_mask_pii, mask_pii),
+    ):
+        old_ms = _time(legacy, texts, args.runs)
+        new_ms = _time(new, texts, args.runs)
+        print(
+            f"{name:<13} legacy {old_ms:8.3f} ms/text   "
+            f"combined {new_ms:8.3f} ms/text   {old_ms / new_ms:.2f}x"
+        )
+    if missed or wider:
+        raise SystemExit("❌ masked spans differ from the legacy code")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# app/reclassify.py
+"""
+Re-label historical message_events with the current classifier.
+
+message_events.category / subcategory / confidence / labels are written once,
+at insert time. After a change to the keyword tables (classifier.py,
+ZUZU_CATEGORIES) old rows keep their old labels; this job rewrites them:
+
+  1) streams events from a server-side cursor on a read-only connection,
+     each with the text of its message (the latest message of the same
+     chat and role at most RECLASSIFY_MATCH_WINDOW_SECS before the event);
+  2) classifies a batch (identical texts, e.g. repeated questions, once)
+     the way chat_api labelled it live: user messages with
+     centroids.classify_message, assistant replies with the keyword
+     classifier;
+  3) COPYs the labels into a temp table and applies them with a single
+     UPDATE ... FROM, touching only rows whose labels actually changed.
+
+Each batch is its own short transaction with a lock_timeout, together with
+the job's checkpoint in `reclassify_checkpoints`, so the job can run
+against production, be stopped at any point and resumed. A batch that
+can't get its row locks in time is retried after a pause. Throughput is
+capped at --rows-per-sec.
+
+With CATEGORY_CLASSIFIER=centroid, user messages are re-embedded
+(llm.embed_texts, RECLASSIFY_EMBED_BATCH texts per API call) so they get
+centroid labels again instead of being overwritten with keyword ones; this
+costs one embedding per distinct question. Assistant events are always
+relabelled with the keyword classifier, as they are live (there is no
+embedding of the reply).
+
+Events recorded by /api/track-category (UI selections, confidence 1.0
+without labels) have no message text and are left alone. Rollups are
+rebuilt from message_events at the end (rollups.reconcile).
+
+  python -m app.reclassify                       # resume (or start)
+  python -m app.reclassify --restart --since 2025-01-01
+  python -m app.reclassify --dry-run             # count changes, write nothing
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg
+from psycopg import errors
+
+from .centroids import CATEGORY_CLASSIFIER, classify_message
+from .classifier import Classification, classify
+from .db import db_url
+
+logger = logging.getLogger(__name__)
+
+RECLASSIFY_BATCH_ROWS = int(os.getenv("RECLASSIFY_BATCH_ROWS", "5000"))
+RECLASSIFY_ROWS_PER_SEC = float(os.getenv("RECLASSIFY_ROWS_PER_SEC", "5000"))
+RECLASSIFY_LOCK_TIMEOUT_MS = int(os.getenv("RECLASSIFY_LOCK_TIMEOUT_MS", "2000"))
+RECLASSIFY_MATCH_WINDOW_SECS = int(os.getenv("RECLASSIFY_MATCH_WINDOW_SECS", "120"))
+RECLASSIFY_EMBED_BATCH = int(os.getenv("RECLASSIFY_EMBED_BATCH", "256"))
+RECLASSIFY_MAX_RETRIES = 5
+
+DEFAULT_JOB = "message_events"
+
+# (created_at, id) keyset order: resumable and served by the created_at index.
+_EVENTS_SQL = """
+SELECT e.id, e.created_at, e.role, m.content
+FROM message_events e
+LEFT JOIN LATERAL (
+    SELECT content
+    FROM messages m
+    WHERE m.chat_id = e.chat_id
+      AND m.role = e.role
+      AND m.created_at <= e.created_at
+      AND m.created_at >= e.created_at - make_interval(secs => %(window)s)
+    ORDER BY m.created_at DESC
+    LIMIT 1
+) m ON TRUE
+-- Track events are (labels NULL, confidence 1.0). Rows from before 0004
+-- have both NULL and are reclassified.
+WHERE (e.labels IS NOT NULL OR e.confidence IS DISTINCT FROM 1.0)
+  AND e.created_at >= %(since)s
+  AND (e.created_at, e.id) > (%(after_ts)s, %(after_id)s)
+ORDER BY e.created_at, e.id
+"""
+
+_STAGE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS reclassify_batch (
+    id BIGINT,
+    created_at TIMESTAMPTZ,
+    category TEXT,
+    subcategory TEXT,
+    confidence REAL,
+    labels JSONB
+) ON COMMIT DELETE ROWS
+"""
+
+# created_at lets Postgres prune to the right partition(s).
+_APPLY_SQL = """
+UPDATE message_events e
+SET category = b.category,
+    subcategory = b.subcategory,
+    confidence = b.confidence,
+    labels = b.labels
+FROM reclassify_batch b
+WHERE e.id = b.id
+  AND e.created_at = b.created_at
+  AND (e.category, e.subcategory, e.confidence, e.labels)
+      IS DISTINCT FROM (b.category, b.subcategory, b.confidence, b.labels)
+"""
+
+_CHECKPOINT_SQL = """
+INSERT INTO reclassify_checkpoints
+    (job, last_created_at, last_id, rows_seen, rows_updated, updated_at)
+VALUES (%s, %s, %s, %s, %s, now())
+ON CONFLICT (job) DO UPDATE SET
+    last_created_at = EXCLUDED.last_created_at,
+    last_id = EXCLUDED.last_id,
+    rows_seen = reclassify_checkpoints.rows_seen + EXCLUDED.rows_seen,
+    rows_updated = reclassify_checkpoints.rows_updated + EXCLUDED.rows_updated,
+    updated_at = now()
+"""
+
+_EPOCH = date(1970, 1, 1)
+
+
+# -------------------------------------------------------------------
+# Checkpoints
+# -------------------------------------------------------------------
+def load_checkpoint(conn, job: str) -> Tuple[Any, int]:
+    """(last_created_at, last_id) to resume after; the start if none."""
+    row = conn.execute(
+        "SELECT last_created_at, last_id FROM reclassify_checkpoints WHERE job = %s",
+        (job,),
+    ).fetchone()
+    if not row or row[0] is None:
+        return "-infinity", 0
+    return row[0], row[1]
+
+
+def reset_checkpoint(conn, job: str) -> None:
+    conn.execute("DELETE FROM reclassify_checkpoints WHERE job = %s", (job,))
+
+
+# -------------------------------------------------------------------
+# Read / classify / write
+# -------------------------------------------------------------------
+def _read_connection() -> psycopg.Connection:
+    """Dedicated read-only connection, like export.py, off the app pool."""
+    conn = psycopg.connect(db_url)
+    conn.read_only = True
+    return conn
+
+
+def iter_batches(
+    after: Tuple[Any, int], since: date, batch_rows: int
+) -> Iterator[List[tuple]]:
+    """Yield lists of (id, created_at, role, content) from a server-side cursor."""
+    params = {
+        "window": RECLASSIFY_MATCH_WINDOW_SECS,
+        "since": since,
+        "after_ts": after[0],
+        "after_id": after[1],
+    }
+    with _read_connection() as conn:
+        with conn.cursor(name="reclassify_events") as cur:
+            cur.itersize = batch_rows
+            cur.execute(_EVENTS_SQL, params)
+            while True:
+                rows = cur.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield rows
+
+
+def _embed_questions(rows: List[tuple]) -> Dict[str, List[float]]:
+    """Embeddings of the distinct user messages in `rows`, by text."""
+    from .llm import embed_texts
+
+    texts = list(
+        dict.fromkeys(
+            content for _, _, role, content in rows
+            if role == "user" and content is not None
+        )
+    )
+    vectors: Dict[str, List[float]] = {}
+    for i in range(0, len(texts), RECLASSIFY_EMBED_BATCH):
+        chunk = texts[i : i + RECLASSIFY_EMBED_BATCH]
+        vectors.update(zip(chunk, embed_texts(chunk)))
+    return vectors
+
+
+def classify_batch(rows: List[tuple]) -> List[tuple]:
+    """
+    Rows for the temp table: (id, created_at, category, subcategory,
+    confidence, labels json). Events whose message is gone are skipped.
+    """
+    vectors = _embed_questions(rows) if CATEGORY_CLASSIFIER == "centroid" else {}
+    seen: Dict[Tuple[str, str], Classification] = {}
+    out = []
+    for event_id, created_at, role, content in rows:
+        if content is None:
+            continue
+        c = seen.get((role, content))
+        if c is None:
+            if role == "user":
+                c = classify_message(content, vectors.get(content))
+            else:
+                c = classify(content)
+            seen[(role, content)] = c
+        out.append(
+            (event_id, created_at, c.category, c.subcategory, c.confidence, json.dumps(c.labels))
+        )
+    return out
+
+
+def apply_batch(
+    conn, job: str, labelled: List[tuple], last: tuple, seen: int, dry_run: bool
+) -> int:
+    """COPY + UPDATE ... FROM and advance the checkpoint, in one transaction."""
+    with conn.transaction(force_rollback=dry_run):
+        conn.execute(f"SET LOCAL lock_timeout = {RECLASSIFY_LOCK_TIMEOUT_MS}")
+        conn.execute(_STAGE_SQL)
+        with conn.cursor() as cur:
+            with cur.copy(
+                "COPY reclassify_batch "
+                "(id, created_at, category, subcategory, confidence, labels) FROM STDIN"
+            ) as copy:
+                for row in labelled:
+                    copy.write_row(row)
+            cur.execute(_APPLY_SQL)
+            updated = cur.rowcount
+        conn.execute(_CHECKPOINT_SQL, (job, last[1], last[0], seen, updated))
+    return updated
+
+
+def _apply_with_retry(conn, *args) -> int:
+    for attempt in range(1, RECLASSIFY_MAX_RETRIES + 1):
+        try:
+            return apply_batch(conn, *args)
+        except errors.LockNotAvailable:
+            if attempt == RECLASSIFY_MAX_RETRIES:
+                raise
+            logger.warning("⚠️ batch hit lock_timeout, retry %d in %ds", attempt, attempt)
+            time.sleep(attempt)
+    return 0
+
+
+def run(
+    job: str = DEFAULT_JOB,
+    since: Optional[date] = None,
+    restart: bool = False,
+    batch_rows: int = RECLASSIFY_BATCH_ROWS,
+    rows_per_sec: float = RECLASSIFY_ROWS_PER_SEC,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+) -> Tuple[int, int]:
+    """Reclassify events after the checkpoint. Returns (rows seen, rows updated)."""
+    since = since or _EPOCH
+    with psycopg.connect(db_url, autocommit=True) as conn:
+        if restart and not dry_run:
+            reset_checkpoint(conn, job)
+        after = load_checkpoint(conn, job)
+        total = conn.execute(
+            """
+            SELECT COUNT(*) FROM message_events
+            WHERE (labels IS NOT NULL OR confidence IS DISTINCT FROM 1.0)
+              AND created_at >= %s AND (created_at, id) > (%s, %s)
+            """,
+            (since, after[0], after[1]),
+        ).fetchone()[0]
+        if limit is not None:
+            total = min(total, limit)
+        print(f"{job}: {total:,} events to check, resuming after {after[0]}")
+
+        seen = updated = 0
+        t0 = time.monotonic()
+        for rows in iter_batches(after, since, batch_rows):
+            if limit is not None:
+                if seen >= limit:
+                    break
+                rows = rows[: limit - seen]
+            labelled = classify_batch(rows)
+            updated += _apply_with_retry(
+                conn, job, labelled, rows[-1], len(rows), dry_run
+            )
+            seen += len(rows)
+
+            elapsed = time.monotonic() - t0
+            rate = seen / elapsed if elapsed else 0.0
+            eta = (total - seen) / rate if rate else 0.0
+            print(
+                f"  {seen:,}/{total:,} checked, {updated:,} changed "
+                f"({rate:,.0f} rows/s, ETA {eta:,.0f}s)"
+            )
+            # Rate limit: sleep until we're back under rows_per_sec.
+            if rows_per_sec > 0:
+                ahead = seen / rows_per_sec - (time.monotonic() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+    return seen, updated
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reclassify historical message_events")
+    parser.add_argument("--job", default=DEFAULT_JOB, help="checkpoint name")
+    parser.add_argument("--since", type=date.fromisoformat, help="only events from this day on")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    parser.add_argument("--batch-rows", type=int, default=RECLASSIFY_BATCH_ROWS)
+    parser.add_argument("--rows-per-sec", type=float, default=RECLASSIFY_ROWS_PER_SEC)
+    parser.add_argument("--limit", type=int, help="stop after this many events")
+    parser.add_argument("--dry-run", action="store_true", help="roll every batch back")
+    parser.add_argument(
+        "--no-reconcile", action="store_true", help="don't rebuild rollups afterwards"
+    )
+    args = parser.parse_args(argv)
+
+    seen, updated = run(
+        args.job, args.since, args.restart, args.batch_rows,
+        args.rows_per_sec, args.limit, args.dry_run,
+    )
+    verb = "would change" if args.dry_run else "changed"
+    print(f"✅ checked {seen:,} events, {verb} {updated:,}")
+
+    if updated and not args.dry_run and not args.no_reconcile:
+        from .rollups import reconcile
+
+        ok = reconcile(None)
+        print("✅ rollups rebuilt" if ok else "another worker is reconciling, skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# app/rerank.py
+"""
+Post-retrieval reranking for `search_docs`.
+
+The vector search over-fetches candidates; this stage then:
+  1) collapses hits that point at the same page (URL normalisation),
+  2) drops candidates far below the best score,
+  3) drops near-duplicates whose embeddings are almost identical
+     (the same page crawled twice under different URLs),
+  4) picks the final list with Maximal Marginal Relevance (MMR), trading
+     relevance against similarity to what is already selected.
+
+The result is usually shorter than top_k, which keeps the prompt small.
+Similarities are computed once, as one NumPy matrix product over the
+candidates' unit vectors (NumPy is imported on first use, like in
+centroids.py, to keep it out of the API's startup).
+"""
+import os
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+SEARCH_MMR_LAMBDA = float(os.getenv("SEARCH_MMR_LAMBDA", "0.7"))
+SEARCH_DEDUP_SIMILARITY = float(os.getenv("SEARCH_DEDUP_SIMILARITY", "0.95"))
+SEARCH_MAX_SCORE_GAP = float(os.getenv("SEARCH_MAX_SCORE_GAP", "0.15"))
+
+
+def parse_vector(text: Optional[str]) -> List[float]:
+    """Parse pgvector's text output ('[0.1,0.2,...]') into floats."""
+    if not text:
+        return []
+    return [float(x) for x in text.strip("[]").split(",") if x]
+
+
+def normalize_url(url: Optional[str]) -> str:
+    if not url:
+        return ""
+    parts = urlsplit(url.strip().lower())
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = parts.path.rstrip("/")
+    for suffix in ("/index.html", "/index.php", "/index.htm"):
+        if path.endswith(suffix):
+            path = path[: -len(suffix)]
+    return f"{host}{path}"
+
+
+def rerank(
+    candidates: List[Dict],
+    top_k: int,
+    mmr_lambda: float = SEARCH_MMR_LAMBDA,
+    dedup_similarity: float = SEARCH_DEDUP_SIMILARITY,
+    max_score_gap: float = SEARCH_MAX_SCORE_GAP,
+) -> List[Dict]:
+    """
+    Dedupe and diversify search hits.
+
+    `candidates` are search_docs hits, each carrying an "embedding" list;
+    on URL collisions the earlier hit wins. The returned hits have "embedding" removed.
+    """
+    if not candidates:
+        return []
+
+    import numpy as np
+
+    # 1) Same page, different URL spelling: keep the best-scoring one.
+    seen_urls = set()
+    unique: List[Dict] = []
+    for h in candidates:
+        key = normalize_url(h.get("url")) or f"id:{h.get('id')}"
+        if key in seen_urls:
+            continue
+        seen_urls.add(key)
+        unique.append(h)
+
+    # 2) Weak tail.
+    best_score = max(h["score"] for h in unique)
+    pool = [h for h in unique if h["score"] >= best_score - max_score_gap]
+
+    # All pairwise cosine similarities in one product. Hits without an
+    # embedding (or of another dimension) get a zero row: similarity 0.
+    dim = max(len(h.get("embedding") or []) for h in pool)
+    vecs = np.zeros((len(pool), dim), dtype=np.float32)
+    for i, h in enumerate(pool):
+        emb = h.get("embedding")
+        if emb and len(emb) == dim:
+            vecs[i] = emb
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    np.divide(vecs, norms, out=vecs, where=norms > 0)
+    sims = vecs @ vecs.T
+
+    # 3) Near-duplicate content: keep the first of each cluster.
+    kept: List[int] = []
+    for i in range(len(pool)):
+        if kept and sims[i, kept].max() >= dedup_similarity:
+            continue
+        kept.append(i)
+    pool = [pool[i] for i in kept]
+    sims = sims[np.ix_(kept, kept)]
+
+    # 4) MMR selection. `redundancy` is each candidate's highest similarity
+    # to anything selected so far.
+    scores = np.array([h["score"] for h in pool], dtype=np.float64)
+    redundancy = np.full(len(pool), -np.inf)
+    available = np.ones(len(pool), dtype=bool)
+    selected: List[int] = []
+    while len(selected) < min(top_k, len(pool)):
+        penalty = redundancy if selected else 0.0
+        mmr = np.where(available, mmr_lambda * scores - (1 - mmr_lambda) * penalty, -np.inf)
+        best_i = int(np.argmax(mmr))
+        selected.append(best_i)
+        available[best_i] = False
+        redundancy = np.maximum(redundancy, sims[:, best_i])
+
+    out = []
+    for i in selected:
+        h = dict(pool[i])
+        h.pop("embedding", None)
+        out.append(h)
+    return out
@@ -0,0 +1,306 @@
+# app/retrieval_eval.py
+"""
+Offline evaluation harness for `search_docs`.
+
+Runs a labelled set of questions (question -> expected doc URLs) through
+several retrieval configurations against the docs table and reports, per
+configuration:
+
+  - recall@k       share of expected URLs found in the returned hits
+  - MRR            1 / rank of the first expected URL (0 if missing)
+  - p50 / p95 ms   vector search latency (embedding time excluded; every
+                   question is embedded once and reused across configs)
+  - avg tokens     prompt tokens the hits would add to a chat turn
+
+The question set lives in eval/retrieval_questions.jsonl, one JSON object
+per line: {"id", "question", "category", "subcategory", "expected_urls"}.
+It is seeded from ZUZU_SUBCATEGORIES and labelled by hand; `run` refuses
+to report anything until at least one question has expected URLs, since
+recall and MRR over unlabelled questions are meaningless:
+
+  python -m app.retrieval_eval seed          # (re)write the seed file
+  python -m app.retrieval_eval label         # pick expected URLs per question
+  python -m app.retrieval_eval run           # default configuration grid
+  python -m app.retrieval_eval run --column halfvec:768 --json out.json
+
+Point DB_CONNECTION_STRING at a local pgvector copy, not production.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils import ZUZU_SUBCATEGORIES
+
+EVAL_SET_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "eval",
+    "retrieval_questions.jsonl",
+)
+
+DEFAULT_CONFIGS: List[Dict[str, Any]] = [
+    {"name": "baseline", "top_k": 6, "rerank": False, "scoped": False},
+    {"name": "rerank", "top_k": 6, "rerank": True, "scoped": False},
+    {"name": "scoped", "top_k": 6, "rerank": False, "scoped": True},
+    {"name": "scoped+rerank", "top_k": 6, "rerank": True, "scoped": True},
+    {"name": "top4+rerank", "top_k": 4, "rerank": True, "scoped": True},
+    {"name": "top8+rerank", "top_k": 8, "rerank": True, "scoped": True},
+]
+
+
+# -------------------------------------------------------------------
+# Question set
+# -------------------------------------------------------------------
+def seed_questions() -> List[Dict[str, Any]]:
+    """
+    Two questions per subcategory: the selection text a UI button click
+    sends (see utils.parse_breadcrumb) and a free-text one.
+    """
+    out: List[Dict[str, Any]] = []
+    for cat, subs in ZUZU_SUBCATEGORIES.items():
+        for sub in subs:
+            base = "/".join(re.sub(r"[^a-z0-9]+", "-", x.lower()).strip("-") for x in (cat, sub))
+            out.append(
+                {
+                    "id": f"{base}#ui",
+                    "question": f"Category selection: {cat} | Subcategory: {sub}",
+                    "category": cat,
+                    "subcategory": sub,
+                    "expected_urls": [],
+                }
+            )
+            out.append(
+                {
+                    "id": f"{base}#text",
+                    "question": f"{cat}: what should I know about {sub.lower()}?",
+                    "category": cat,
+                    "subcategory": sub,
+                    "expected_urls": [],
+                }
+            )
+    return out
+
+
+def load_questions(path: str = EVAL_SET_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_questions(questions: List[Dict[str, Any]], path: str = EVAL_SET_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for q in questions:
+            f.write(json.dumps(q, ensure_ascii=False) + "\n")
+
+
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when installed, else ~4 chars per token."""
+    try:
+        import tiktoken
+
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        return math.ceil(len(text) / 4)
+
+
+def context_block(hits: List[Dict[str, Any]]) -> str:
+    """The snippet block exactly as chat_api puts it into the prompt."""
+    lines = [f"[{h['source']}] {h['content_snippet']}" for h in hits]
+    return "\n".join(ln for ln in lines if ln)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def score_hits(hits: List[Dict[str, Any]], expected: List[str]) -> Tuple[float, float]:
+    """Return (recall, reciprocal rank) for one question."""
+    from .rerank import normalize_url
+
+    want = {normalize_url(u) for u in expected}
+    got = [normalize_url(h.get("url")) for h in hits]
+    found = want & set(got)
+    recall = len(found) / len(want) if want else 0.0
+    rr = 0.0
+    for rank, url in enumerate(got, start=1):
+        if url in want:
+            rr = 1.0 / rank
+            break
+    return recall, rr
+
+
+# -------------------------------------------------------------------
+# Runner
+# -------------------------------------------------------------------
+def run(
+    questions: List[Dict[str, Any]],
+    configs: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    from .llm import embed_text
+    from .search import search_by_vector
+    from .embedding_store import EMBED_DIMS, EMBED_STORAGE
+
+    labelled = [q for q in questions if q.get("expected_urls")]
+    if not labelled:
+        raise SystemExit(
+            f"❌ none of the {len(questions)} questions has expected_urls; "
+            "label them first (python -m app.retrieval_eval label)"
+        )
+    skipped = len(questions) - len(labelled)
+    if skipped:
+        print(f"⚠️  skipping {skipped} unlabelled questions")
+
+    vectors = {q["id"]: embed_text(q["question"]) for q in labelled}
+
+    results: List[Dict[str, Any]] = []
+    for cfg in configs:
+        recalls: List[float] = []
+        rrs: List[float] = []
+        latencies: List[float] = []
+        tokens: List[int] = []
+
+        for q in labelled:
+            category = subcategory = None
+            if cfg.get("scoped"):
+                # The scope the UI would have sent with this question.
+                category, subcategory = q.get("category"), q.get("subcategory")
+
+            t0 = time.perf_counter()
+            hits = search_by_vector(
+                vectors[q["id"]],
+                cfg["top_k"],
+                category,
+                subcategory,
+                rerank=cfg.get("rerank", False),
+                storage=cfg.get("storage", EMBED_STORAGE),
+                dims=cfg.get("dims", EMBED_DIMS),
+            )
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+            recall, rr = score_hits(hits, q["expected_urls"])
+            recalls.append(recall)
+            rrs.append(rr)
+            tokens.append(estimate_tokens(context_block(hits)))
+
+        results.append(
+            {
+                "config": cfg["name"],
+                "k": cfg["top_k"],
+                "recall_at_k": round(statistics.mean(recalls), 4),
+                "mrr": round(statistics.mean(rrs), 4),
+                "p50_ms": round(_percentile(latencies, 0.5), 2),
+                "p95_ms": round(_percentile(latencies, 0.95), 2),
+                "avg_prompt_tokens": round(statistics.mean(tokens), 1),
+                "questions": len(labelled),
+            }
+        )
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    if not results:
+        print("No results.")
+        return
+    cols = list(results[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in cols))
+
+
+def _column_configs(specs: List[str]) -> List[Dict[str, Any]]:
+    """Extra configs for --column storage:dims, built on the best default."""
+    out = []
+    for spec in specs:
+        storage, _, dims = spec.partition(":")
+        out.append(
+            {
+                "name": f"scoped+rerank@{storage}:{dims}",
+                "top_k": 6,
+                "rerank": True,
+                "scoped": True,
+                "storage": storage,
+                "dims": int(dims),
+            }
+        )
+    return out
+
+
+# -------------------------------------------------------------------
+# Labelling helper
+# -------------------------------------------------------------------
+def label(path: str = EVAL_SET_PATH, top_k: int = 8) -> None:
+    """Show the current top hits for each unlabelled question and record picks."""
+    from .search import search_docs
+
+    questions = load_questions(path)
+    for q in questions:
+        if q.get("expected_urls"):
+            continue
+        hits = search_docs(q["question"], top_k, rerank=False)
+        print(f"\n{q['question']}")
+        for i, h in enumerate(hits, start=1):
+            print(f"  {i}. {h['title']}  {h['url']}")
+        picked = input("relevant numbers (comma separated, empty to skip, q to stop): ")
+        if picked.strip().lower() == "q":
+            break
+        idx = [int(x) for x in picked.replace(" ", "").split(",") if x.isdigit()]
+        q["expected_urls"] = [hits[i - 1]["url"] for i in idx if 0 < i <= len(hits)]
+        save_questions(questions, path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Retrieval quality / latency eval")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_seed = sub.add_parser("seed")
+    p_seed.add_argument("--path", default=EVAL_SET_PATH)
+
+    p_label = sub.add_parser("label")
+    p_label.add_argument("--path", default=EVAL_SET_PATH)
+
+    p_run = sub.add_parser("run")
+    p_run.add_argument("--path", default=EVAL_SET_PATH)
+    p_run.add_argument("--configs", help="JSON file with a list of configs")
+    p_run.add_argument(
+        "--column",
+        action="append",
+        default=[],
+        help="also evaluate an embedding column, e.g. halfvec:768",
+    )
+    p_run.add_argument("--json", help="write results to this file")
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "seed":
+        save_questions(seed_questions(), args.path)
+        print(f"✅ wrote seed questions to {args.path}")
+    elif args.cmd == "label":
+        label(args.path)
+    else:
+        configs = DEFAULT_CONFIGS
+        if args.configs:
+            with open(args.configs, encoding="utf-8") as f:
+                configs = json.load(f)
+        configs = configs + _column_configs(args.column)
+
+        results = run(load_questions(args.path), configs)
+        print_results(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
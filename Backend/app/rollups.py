@@ -0,0 +1,753 @@
+# app/rollups.py
+"""
+Pre-aggregated analytics, maintained as events are written.
+
+Instead of scanning `message_events` / `pii_events` / `chats` on every
+dashboard load, each write also bumps a few counters:
+
+  analytics_rollup_daily     (scope, day, kind)            -> n
+  analytics_rollup_hourly    (scope, hour, kind)           -> n
+  analytics_rollup_category  (scope, kind, category)       -> n
+  analytics_rollup_device    (device_id)                   -> questions, pii_events
+  analytics_hll_daily        (day, category)               -> HyperLogLog of device_ids
+  analytics_rollup_pii_type  (scope, pii_type)             -> n
+
+`scope` is '*' for the system-wide view or a device_id for the per-device
+view; `kind` is 'question' (user message_events) or 'pii' (pii_events).
+pii_events.pii_type lists the detected kinds ("email,phone"); each kind is
+counted once per event in analytics_rollup_pii_type.
+
+The HLL sketches (hll.py) answer "distinct users" for any window of days
+and optionally one category by merging a few small rows; category '' is
+the all-categories sketch. ANALYTICS_DISTINCT_USERS=exact keeps the old
+COUNT(DISTINCT ...) instead. Changing ANALYTICS_HLL_PRECISION needs a
+`reconcile --full` to rebuild the sketches at the new size.
+
+Counters are bumped in the same transaction as the event insert. A periodic
+reconciliation rebuilds them from the raw tables to correct any drift
+(crashes between statements, manual deletes, retention jobs), in short
+transactions so it never stalls those writes (see reconcile()):
+
+  python -m app.rollups reconcile            # recent days
+  python -m app.rollups reconcile --full     # everything
+
+A full reconcile rebuilds the per-day rollups only from each table's
+oldest retained row on, so days that partitions.py has archived keep
+their rows. The all-time counters of an archived message_events month
+live on in analytics_retired_* (see fold_retired) and are added back in.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg.types.json import Jsonb
+
+from .hll import HyperLogLog, register_update
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "*"
+
+ANALYTICS_RECONCILE_SECS = int(os.getenv("ANALYTICS_RECONCILE_SECS", "3600"))
+ANALYTICS_RECONCILE_DAYS = int(os.getenv("ANALYTICS_RECONCILE_DAYS", "2"))
+ANALYTICS_FULL_RECONCILE_HOURS = int(os.getenv("ANALYTICS_FULL_RECONCILE_HOURS", "24"))
+
+# "hll" (approximate, see hll.py for error bounds) or "exact".
+ANALYTICS_DISTINCT_USERS = os.getenv("ANALYTICS_DISTINCT_USERS", "hll").lower()
+ANALYTICS_HLL_PRECISION = int(os.getenv("ANALYTICS_HLL_PRECISION", "12"))
+
+
+# -------------------------------------------------------------------
+# Write path (called inside the request's connection/transaction)
+# -------------------------------------------------------------------
+def _bump(conn, device_id: str, kind: str, category: str, n: int = 1) -> None:
+    conn.execute(
+        """
+        INSERT INTO analytics_rollup_hourly (scope, hour, kind, n)
+        VALUES (%s, date_trunc('hour', now()), %s, %s),
+               (%s, date_trunc('hour', now()), %s, %s)
+        ON CONFLICT (scope, hour, kind)
+        DO UPDATE SET n = analytics_rollup_hourly.n + EXCLUDED.n
+        """,
+        (GLOBAL_SCOPE, kind, n, device_id, kind, n),
+    )
+    conn.execute(
+        """
+        INSERT INTO analytics_rollup_daily (scope, day, kind, n)
+        VALUES (%s, now()::date, %s, %s), (%s, now()::date, %s, %s)
+        ON CONFLICT (scope, day, kind)
+        DO UPDATE SET n = analytics_rollup_daily.n + EXCLUDED.n
+        """,
+        (GLOBAL_SCOPE, kind, n, device_id, kind, n),
+    )
+    conn.execute(
+        """
+        INSERT INTO analytics_rollup_category (scope, kind, category, n)
+        VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)
+        ON CONFLICT (scope, kind, category)
+        DO UPDATE SET n = analytics_rollup_category.n + EXCLUDED.n
+        """,
+        (GLOBAL_SCOPE, kind, category, n, device_id, kind, category, n),
+    )
+    col = "questions" if kind == "question" else "pii_events"
+    conn.execute(
+        f"""
+        INSERT INTO analytics_rollup_device (device_id, {col}, first_seen, last_seen)
+        VALUES (%s, %s, now(), now())
+        ON CONFLICT (device_id)
+        DO UPDATE SET {col} = analytics_rollup_device.{col} + EXCLUDED.{col},
+                      last_seen = now()
+        """,
+        (device_id, n),
+    )
+
+
+def _bump_hll(conn, device_id: str, category: str) -> None:
+    """Fold device_id into today's all-categories and per-category sketches."""
+    idx, rank = register_update(device_id, ANALYTICS_HLL_PRECISION)
+    fresh = bytearray(1 << ANALYTICS_HLL_PRECISION)
+    fresh[idx] = rank
+    # The WHERE skips the row rewrite when the register is already high
+    # enough, which is the common case once a sketch has warmed up. Rows
+    # written at another precision are left alone until reconcile --full.
+    conn.execute(
+        """
+        INSERT INTO analytics_hll_daily (day, category, registers)
+        VALUES (now()::date, '', %s), (now()::date, %s, %s)
+        ON CONFLICT (day, category)
+        DO UPDATE SET registers = set_byte(analytics_hll_daily.registers, %s, %s)
+        WHERE CASE WHEN length(analytics_hll_daily.registers) = %s
+                   THEN get_byte(analytics_hll_daily.registers, %s) < %s
+                   ELSE FALSE END
+        """,
+        (bytes(fresh), category, bytes(fresh), idx, rank, len(fresh), idx, rank),
+    )
+
+
+def record_message_event(
+    conn,
+    chat_id: str,
+    device_id: str,
+    role: str,
+    category: str,
+    subcategory: Optional[str] = None,
+    confidence: Optional[float] = None,
+    labels: Optional[List[Tuple[str, float]]] = None,
+) -> None:
+    """
+    Insert a message_events row and update the rollups for user messages.
+    subcategory / confidence / labels come from classifier.classify().
+    """
+    conn.execute(
+        """
+        INSERT INTO message_events
+            (chat_id, device_id, role, category, subcategory, confidence, labels, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, now())
+        """,
+        (
+            chat_id,
+            device_id,
+            role,
+            category,
+            subcategory,
+            confidence,
+            Jsonb(labels) if labels is not None else None,
+        ),
+    )
+    if role == "user":
+        _bump(conn, device_id, "question", category or "Other Inquiries")
+        if device_id:
+            _bump_hll(conn, device_id, category or "Other Inquiries")
+
+
+def record_pii_events(conn, incidents: List[Tuple[str, str, List[str], Any]]) -> None:
+    """
+    Insert pii_events rows for (chat_id, device_id, kinds, created_at)
+    incidents and update the rollups, one statement per counter and device
+    rather than per incident (see pii_audit.py).
+    """
+    with conn.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO pii_events (chat_id, device_id, pii_type, created_at)
+            VALUES (%s, %s, %s, %s)
+            """,
+            [
+                (chat_id, device_id, ",".join(kinds), created_at)
+                for chat_id, device_id, kinds, created_at in incidents
+            ],
+        )
+
+    per_device: Dict[str, int] = {}
+    per_type: Dict[Tuple[str, str], int] = {}
+    for _chat_id, device_id, kinds, _created_at in incidents:
+        per_device[device_id] = per_device.get(device_id, 0) + 1
+        for kind in kinds:
+            for scope in (GLOBAL_SCOPE, device_id):
+                per_type[(scope, kind)] = per_type.get((scope, kind), 0) + 1
+    for device_id, n in per_device.items():
+        _bump(conn, device_id, "pii", "", n)
+    with conn.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO analytics_rollup_pii_type (scope, pii_type, n)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (scope, pii_type)
+            DO UPDATE SET n = analytics_rollup_pii_type.n + EXCLUDED.n
+            """,
+            [(scope, kind, n) for (scope, kind), n in per_type.items()],
+        )
+
+
+# -------------------------------------------------------------------
+# Read path
+# -------------------------------------------------------------------
+def fetch_rollup_aggregates(device_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Same totals / top_categories / by_day shape as the raw queries in
+    analytics.py, read from a handful of rollup rows.
+    """
+    from .db import pool
+
+    scope = GLOBAL_SCOPE if device_id is None else device_id
+
+    with pool.connection() as conn:
+        cat_rows = conn.execute(
+            """
+            SELECT scope, kind, category, n
+            FROM analytics_rollup_category
+            WHERE scope = %s OR (scope = %s AND kind = 'pii')
+            """,
+            (scope, GLOBAL_SCOPE),
+        ).fetchall()
+
+        by_day_rows = conn.execute(
+            """
+            SELECT day, n
+            FROM analytics_rollup_daily
+            WHERE scope = %s
+              AND kind = 'question'
+              AND day >= (now() - INTERVAL '7 days')::date
+            ORDER BY day
+            """,
+            (scope,),
+        ).fetchall()
+
+        pii_type_rows = conn.execute(
+            "SELECT pii_type, n FROM analytics_rollup_pii_type WHERE scope = %s",
+            (scope,),
+        ).fetchall()
+
+    total_questions = 0
+    pii_events = 0
+    top_categories: List[Dict[str, Any]] = []
+    for row_scope, kind, category, n in cat_rows:
+        if kind == "pii":
+            # PII count is system-wide regardless of scope (as before).
+            if row_scope == GLOBAL_SCOPE:
+                pii_events += int(n)
+            continue
+        total_questions += int(n)
+        top_categories.append({"category": category or "Other Inquiries", "count": int(n)})
+    top_categories.sort(key=lambda c: c["count"], reverse=True)
+
+    return {
+        "totals": {
+            "totalUsers": 0,  # see analytics._fetch_total_users
+            "totalQuestions": total_questions,
+            "totalPiiEvents": pii_events,
+        },
+        "top_categories": top_categories,
+        "by_day": [
+            {"date": day.isoformat(), "count": int(n)} for day, n in by_day_rows
+        ],
+        "pii_by_type": {t: int(n) for t, n in pii_type_rows},
+    }
+
+
+# bucket -> (table, bucket expression, time column)
+_SERIES_SOURCES = {
+    "hour": ("analytics_rollup_hourly", "hour", "hour"),
+    "day": ("analytics_rollup_daily", "day", "day"),
+    "week": ("analytics_rollup_daily", "date_trunc('week', day)::date", "day"),
+}
+
+
+def fetch_time_series(
+    device_id: Optional[str],
+    start: date,
+    end: date,
+    bucket: str = "day",
+) -> List[Dict[str, Any]]:
+    """
+    Question counts per hour / day / week between `start` and `end`
+    (inclusive days), read from the pre-bucketed rollups: the cost is
+    proportional to the number of buckets, not events. Empty buckets are
+    omitted, as with the old by_day query.
+    """
+    from .db import pool
+
+    table, expr, col = _SERIES_SOURCES[bucket]
+    scope = GLOBAL_SCOPE if device_id is None else device_id
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {expr} AS bucket, SUM(n)
+            FROM {table}
+            WHERE scope = %s
+              AND kind = 'question'
+              AND {col} >= %s::date
+              AND {col} < %s::date + 1
+            GROUP BY 1
+            ORDER BY 1
+            """,
+            (scope, start, end),
+        ).fetchall()
+
+    return [{"date": b.isoformat(), "count": int(n)} for b, n in rows]
+
+
+def fetch_distinct_users(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+) -> int:
+    """
+    Approximate number of distinct devices that asked a question between
+    `start` and `end` (inclusive, open-ended if None), optionally limited to
+    one category, by merging the daily sketches.
+    """
+    from .db import pool
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT registers
+            FROM analytics_hll_daily
+            WHERE category = %s
+              AND (%s::date IS NULL OR day >= %s::date)
+              AND (%s::date IS NULL OR day <= %s::date)
+            """,
+            (category or "", start, start, end, end),
+        ).fetchall()
+
+    sketch = HyperLogLog(ANALYTICS_HLL_PRECISION)
+    for (registers,) in rows:
+        if len(registers) != sketch.m:
+            continue  # written at another precision; fixed by reconcile --full
+        sketch.merge(HyperLogLog(ANALYTICS_HLL_PRECISION, registers))
+    return sketch.count()
+
+
+def fetch_exact_distinct_users(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> int:
+    """
+    Exact number of distinct devices that asked a question between `start`
+    and `end` (inclusive), or ever when both are None: the same count as
+    fetch_distinct_users, from the per-device rollup rows.
+    """
+    from .db import pool
+
+    with pool.connection() as conn:
+        if start is None and end is None:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM analytics_rollup_device WHERE questions > 0"
+            ).fetchone()
+        else:
+            row = conn.execute(
+                """
+                SELECT COUNT(DISTINCT scope)
+                FROM analytics_rollup_daily
+                WHERE kind = 'question'
+                  AND scope <> %s
+                  AND (%s::date IS NULL OR day >= %s::date)
+                  AND (%s::date IS NULL OR day <= %s::date)
+                """,
+                (GLOBAL_SCOPE, start, start, end, end),
+            ).fetchone()
+    return int(row[0]) if row is not None else 0
+
+
+# -------------------------------------------------------------------
+# Reconciliation
+# -------------------------------------------------------------------
+# Rebuild one day of a rollup table from a raw table ([day, day + 1)).
+# GROUPING SETS produce the '*' scope and the per-device scope in one scan.
+# The rows are deleted first, so the upsert only matters for keys that
+# _bump inserted meanwhile.
+_DAILY_REBUILD_SQL = """
+INSERT INTO analytics_rollup_daily (scope, day, kind, n)
+SELECT
+    CASE WHEN GROUPING(device_id) = 1 THEN '*' ELSE device_id END,
+    created_at::date,
+    %s,
+    COUNT(*)
+FROM {table}
+WHERE {where} AND created_at >= %s::date AND created_at < %s::date + 1
+GROUP BY GROUPING SETS ((created_at::date), (device_id, created_at::date))
+HAVING GROUPING(device_id) = 1 OR device_id IS NOT NULL
+ON CONFLICT (scope, day, kind) DO UPDATE SET n = EXCLUDED.n
+"""
+
+_HOURLY_REBUILD_SQL = """
+INSERT INTO analytics_rollup_hourly (scope, hour, kind, n)
+SELECT
+    CASE WHEN GROUPING(device_id) = 1 THEN '*' ELSE device_id END,
+    date_trunc('hour', created_at),
+    %s,
+    COUNT(*)
+FROM {table}
+WHERE {where} AND created_at >= %s::date AND created_at < %s::date + 1
+GROUP BY GROUPING SETS ((date_trunc('hour', created_at)), (device_id, date_trunc('hour', created_at)))
+HAVING GROUPING(device_id) = 1 OR device_id IS NOT NULL
+ON CONFLICT (scope, hour, kind) DO UPDATE SET n = EXCLUDED.n
+"""
+
+_CATEGORY_REBUILD_SQL = """
+INSERT INTO {target} (scope, kind, category, n)
+SELECT
+    CASE WHEN GROUPING(device_id) = 1 THEN '*' ELSE device_id END,
+    %s,
+    {category},
+    COUNT(*)
+FROM {table}
+WHERE {where}
+GROUP BY GROUPING SETS ({sets})
+HAVING GROUPING(device_id) = 1 OR device_id IS NOT NULL
+"""
+
+# Older rows (before pii_audit.py) have pii_type 'generic'.
+_PII_TYPE_REBUILD_SQL = """
+INSERT INTO {target} (scope, pii_type, n)
+SELECT
+    CASE WHEN GROUPING(device_id) = 1 THEN '*' ELSE device_id END,
+    t.pii_type,
+    COUNT(*)
+FROM pii_events,
+     unnest(string_to_array(COALESCE(pii_type, 'generic'), ',')) AS t(pii_type)
+GROUP BY GROUPING SETS ((t.pii_type), (device_id, t.pii_type))
+HAVING GROUPING(device_id) = 1 OR device_id IS NOT NULL
+"""
+
+_DEVICE_REBUILD_SQL = """
+INSERT INTO {target} (device_id, questions, pii_events, first_seen, last_seen)
+SELECT device_id,
+       SUM(questions), SUM(pii_events),
+       MIN(first_seen), MAX(last_seen)
+FROM (
+    SELECT device_id, COUNT(*) AS questions, 0 AS pii_events,
+           MIN(created_at) AS first_seen, MAX(created_at) AS last_seen
+    FROM message_events
+    WHERE role = 'user' AND device_id IS NOT NULL
+    GROUP BY device_id
+    UNION ALL
+    SELECT device_id, 0, COUNT(*), MIN(created_at), MAX(created_at)
+    FROM pii_events
+    WHERE device_id IS NOT NULL
+    GROUP BY device_id
+) s
+GROUP BY device_id
+"""
+
+_SOURCES = [
+    # (kind, table, where, category expression or None)
+    ("question", "message_events", "role = 'user'", "COALESCE(category, 'Other Inquiries')"),
+    ("pii", "pii_events", "TRUE", None),
+]
+
+# Arbitrary constant so only one worker reconciles at a time.
+_RECONCILE_LOCK_ID = 72_031
+
+
+def reconcile(days: Optional[int] = ANALYTICS_RECONCILE_DAYS) -> bool:
+    """
+    Rebuild rollups from the raw event tables.
+
+    With `days`, only the daily/hourly rollups (and HLL sketches) for the
+    last `days` days are rebuilt (cheap, index range scans). With days=None
+    they are rebuilt from each table's oldest row, and the all-time
+    category, pii_type and device counters are rebuilt too, as retained
+    rows plus analytics_retired_*. Rollup rows for days before the oldest
+    retained row are never deleted.
+
+    Nothing here holds rollup row locks for long, since _bump needs the
+    same rows on every question:
+      - daily/hourly/HLL rows are rebuilt one day per transaction, locking
+        hourly before daily like _bump does, so the two cannot deadlock;
+      - the all-time counters are computed into a temp table first and
+        then applied as one upsert + delete.
+    A session-level advisory lock keeps other workers out across all of
+    these transactions.
+
+    Returns False if another worker is already reconciling.
+    """
+    from .db import pool
+
+    with pool.connection() as conn:
+        got = conn.execute(
+            "SELECT pg_try_advisory_lock(%s)", (_RECONCILE_LOCK_ID,)
+        ).fetchone()[0]
+        conn.commit()
+        if not got:
+            return False
+        try:
+            _reconcile_locked(conn, days)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (_RECONCILE_LOCK_ID,))
+            conn.commit()
+
+    logger.info("Analytics rollups reconciled (days=%s)", days)
+    return True
+
+
+def _reconcile_locked(conn, days: Optional[int]) -> None:
+    today = conn.execute("SELECT now()::date").fetchone()[0]
+
+    # kind -> first day to rebuild; a source with no rows is left alone.
+    first_day: Dict[str, date] = {}
+    for kind, table, where, _cat in _SOURCES:
+        if days is None:
+            row = conn.execute(
+                f"SELECT MIN(created_at)::date FROM {table} WHERE {where}"
+            ).fetchone()
+            if row is not None and row[0] is not None:
+                first_day[kind] = row[0]
+        else:
+            first_day[kind] = today - timedelta(days=days)
+    conn.commit()
+
+    if first_day:
+        day = min(first_day.values())
+        while day <= today:
+            sources = [s for s in _SOURCES if s[0] in first_day and first_day[s[0]] <= day]
+            _reconcile_day(conn, day, sources)
+            day += timedelta(days=1)
+
+    if days is None:
+        _rebuild_counters(conn)
+
+
+def _reconcile_day(conn, day: date, sources: List[Tuple[str, str, str, Optional[str]]]) -> None:
+    """Rebuild one day of hourly, daily and HLL rows (in _bump's lock order)."""
+    with conn.transaction():
+        for kind, table, where, _cat in sources:
+            conn.execute(
+                "DELETE FROM analytics_rollup_hourly"
+                " WHERE kind = %s AND hour >= %s::date AND hour < %s::date + 1",
+                (kind, day, day),
+            )
+            conn.execute(
+                _HOURLY_REBUILD_SQL.format(table=table, where=where), (kind, day, day)
+            )
+        for kind, table, where, _cat in sources:
+            conn.execute(
+                "DELETE FROM analytics_rollup_daily WHERE kind = %s AND day = %s",
+                (kind, day),
+            )
+            conn.execute(
+                _DAILY_REBUILD_SQL.format(table=table, where=where), (kind, day, day)
+            )
+        if any(kind == "question" for kind, *_ in sources):
+            _rebuild_hll_day(conn, day)
+
+
+def _rebuild_hll_day(conn, day: date) -> None:
+    """Rebuild one day's HLL sketches from message_events."""
+    # Delete first: a concurrent _bump_hll then waits for this transaction
+    # instead of folding its device into a row that is about to be replaced.
+    conn.execute("DELETE FROM analytics_hll_daily WHERE day = %s", (day,))
+    rows = conn.execute(
+        """
+        SELECT DISTINCT COALESCE(category, 'Other Inquiries'), device_id
+        FROM message_events
+        WHERE role = 'user' AND device_id IS NOT NULL
+          AND created_at >= %s::date AND created_at < %s::date + 1
+        """,
+        (day, day),
+    ).fetchall()
+
+    sketches: Dict[str, HyperLogLog] = {}
+    for category, device_id in rows:
+        for key in ("", category):
+            sk = sketches.get(key)
+            if sk is None:
+                sk = sketches[key] = HyperLogLog(ANALYTICS_HLL_PRECISION)
+            sk.add(device_id)
+
+    with conn.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO analytics_hll_daily (day, category, registers)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (day, category) DO UPDATE SET registers = EXCLUDED.registers
+            """,
+            [(day, cat, sk.to_bytes()) for cat, sk in sketches.items()],
+        )
+
+
+def _rebuild_counters(conn) -> None:
+    """Rebuild the all-time category, pii_type and device counters."""
+    with conn.transaction():
+        _create_stage(conn, "analytics_rollup_category")
+        for kind, table, where, cat in _SOURCES:
+            conn.execute(_category_sql("rollup_stage", table, where, cat), (kind,))
+        conn.execute(
+            """
+            INSERT INTO rollup_stage (scope, kind, category, n)
+            SELECT scope, kind, category, n FROM analytics_retired_category
+            """
+        )
+        _apply_stage(
+            conn, "analytics_rollup_category", ["scope", "kind", "category"], {"n": "SUM"}
+        )
+
+    with conn.transaction():
+        _create_stage(conn, "analytics_rollup_device")
+        conn.execute(_DEVICE_REBUILD_SQL.format(target="rollup_stage"))
+        conn.execute(
+            """
+            INSERT INTO rollup_stage (device_id, questions, pii_events, first_seen, last_seen)
+            SELECT device_id, questions, pii_events, first_seen, last_seen
+            FROM analytics_retired_device
+            """
+        )
+        _apply_stage(
+            conn, "analytics_rollup_device", ["device_id"],
+            {"questions": "SUM", "pii_events": "SUM", "first_seen": "MIN", "last_seen": "MAX"},
+        )
+
+    with conn.transaction():
+        _create_stage(conn, "analytics_rollup_pii_type")
+        conn.execute(_PII_TYPE_REBUILD_SQL.format(target="rollup_stage"))
+        _apply_stage(conn, "analytics_rollup_pii_type", ["scope", "pii_type"], {"n": "SUM"})
+
+
+def _category_sql(target: str, table: str, where: str, cat: Optional[str]) -> str:
+    # Postgres rejects constants in GROUP BY, so sources without a
+    # category group by device only and select ''.
+    sets = f"({cat}), (device_id, {cat})" if cat else "(), (device_id)"
+    return _CATEGORY_REBUILD_SQL.format(
+        target=target, table=table, where=where, category=cat or "''", sets=sets
+    )
+
+
+def _create_stage(conn, table: str) -> None:
+    conn.execute(f"CREATE TEMP TABLE rollup_stage (LIKE {table}) ON COMMIT DROP")
+
+
+def _apply_stage(conn, table: str, key: List[str], cols: Dict[str, str]) -> None:
+    """
+    Make `table` equal to rollup_stage, grouped by `key` with one aggregate
+    per column: upsert changed rows (in key order) and delete rows the
+    rebuild no longer produces. Only these two statements lock rows of
+    `table`, right before the commit.
+    """
+    keys = ", ".join(key)
+    values = ", ".join(cols)
+    aggregates = ", ".join(f"{agg}({c})" for c, agg in cols.items())
+    conn.execute(
+        f"""
+        INSERT INTO {table} AS t ({keys}, {values})
+        SELECT {keys}, {aggregates} FROM rollup_stage GROUP BY {keys} ORDER BY {keys}
+        ON CONFLICT ({keys}) DO UPDATE
+        SET {", ".join(f"{c} = EXCLUDED.{c}" for c in cols)}
+        WHERE ({", ".join(f"t.{c}" for c in cols)})
+              IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in cols)})
+        """
+    )
+    conn.execute(
+        f"""
+        DELETE FROM {table} t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM rollup_stage s
+            WHERE {" AND ".join(f"s.{k} = t.{k}" for k in key)}
+        )
+        """
+    )
+
+
+def fold_retired(conn, partition: str) -> bool:
+    """
+    Add the counts of a detached message_events partition to
+    analytics_retired_*, inside the caller's transaction, before
+    partitions.py archives or drops it. Returns False if this partition
+    was already folded.
+    """
+    row = conn.execute(
+        """
+        INSERT INTO analytics_retired_partitions (partition) VALUES (%s)
+        ON CONFLICT (partition) DO NOTHING
+        RETURNING partition
+        """,
+        (partition,),
+    ).fetchone()
+    if row is None:
+        return False
+
+    for kind, table, where, cat in _SOURCES:
+        if table != "message_events":
+            continue
+        conn.execute(
+            _category_sql("analytics_retired_category", partition, where, cat)
+            + """
+            ON CONFLICT (scope, kind, category)
+            DO UPDATE SET n = analytics_retired_category.n + EXCLUDED.n
+            """,
+            (kind,),
+        )
+    conn.execute(
+        f"""
+        INSERT INTO analytics_retired_device (device_id, questions, first_seen, last_seen)
+        SELECT device_id, COUNT(*), MIN(created_at), MAX(created_at)
+        FROM {partition}
+        WHERE role = 'user' AND device_id IS NOT NULL
+        GROUP BY device_id
+        ON CONFLICT (device_id) DO UPDATE
+        SET questions = analytics_retired_device.questions + EXCLUDED.questions,
+            first_seen = LEAST(analytics_retired_device.first_seen, EXCLUDED.first_seen),
+            last_seen = GREATEST(analytics_retired_device.last_seen, EXCLUDED.last_seen)
+        """
+    )
+    return True
+
+
+async def reconcile_loop() -> None:
+    """
+    Background task: full rebuild on startup and every
+    ANALYTICS_FULL_RECONCILE_HOURS, recent-days rebuild every
+    ANALYTICS_RECONCILE_SECS in between.
+    """
+    full_every = ANALYTICS_FULL_RECONCILE_HOURS * 3600
+    since_full = full_every
+    while True:
+        full = since_full >= full_every
+        try:
+            await asyncio.to_thread(reconcile, None if full else ANALYTICS_RECONCILE_DAYS)
+            if full:
+                since_full = 0
+        except Exception as e:
+            logger.exception("Analytics rollup reconciliation failed: %s", e)
+        await asyncio.sleep(ANALYTICS_RECONCILE_SECS)
+        since_full += ANALYTICS_RECONCILE_SECS
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Analytics rollup maintenance")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("reconcile")
+    p.add_argument("--full", action="store_true", help="rebuild everything")
+    p.add_argument("--days", type=int, default=ANALYTICS_RECONCILE_DAYS)
+    args = parser.parse_args(argv)
+
+    ok = reconcile(None if args.full else args.days)
+    print("✅ reconciled" if ok else "another worker is reconciling, skipped")
+
+
+if __name__ == "__main__":
+    main()
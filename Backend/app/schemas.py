@@ -23,9 +23,15 @@ class ChatSummary(BaseModel):
     created_at: str
     updated_at: str
 
+class ChatPage(BaseModel):
+    chats: List[ChatSummary]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
 
 class SearchResponse(BaseModel):
     hits: List[dict]
@@ -43,6 +49,10 @@ class DayCount(BaseModel):
 class AdminAnalyticsResponse(BaseModel):
     totals: Dict[str, int]
     top_categories: List[CategoryCount]
-    by_day: List[DayCount]
+    by_day: List[DayCount]  # one point per bucket; `date` is ISO date or datetime
+    bucket: str = "day"
     consistencyScore: float
     consistencyByCategory: Dict[str, float]
+    piiByType: Dict[str, int] = {}  # PII detections per kind (email, phone, ...)
+    generatedAt: Optional[float] = None  # unix time the numbers were computed
+    stale: bool = False  # served from cache while a refresh runs
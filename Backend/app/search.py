@@ -1,23 +1,68 @@
+import os
+from array import array
+from typing import Any, List, Optional, Sequence, Tuple
+
 from .db import pool
 from .llm import embed_text as embed
+from .embedding_store import (
+    EMBED_DIMS,
+    EMBED_STORAGE,
+    column_name,
+    sql_type,
+    query_vector,
+)
+from .rerank import rerank as rerank_hits, parse_vector
+from .search_cache import search_cache, normalize_query, SEARCH_CACHE_ENABLED
+
+# If a category-scoped search returns fewer hits than this, widen the search
+# (subcategory -> category -> whole corpus) and top up with the extra hits.
+SEARCH_CATEGORY_MIN_HITS = int(os.getenv("SEARCH_CATEGORY_MIN_HITS", "3"))
+
+# Dedupe + MMR over an over-fetched candidate set (see rerank.py).
+SEARCH_RERANK = os.getenv("SEARCH_RERANK", "true").lower() == "true"
+SEARCH_OVERFETCH = int(os.getenv("SEARCH_OVERFETCH", "3"))
+
+
+def _query_docs(
+    v: List[float],
+    top_k: int,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    with_embedding: bool = False,
+    storage: str = EMBED_STORAGE,
+    dims: int = EMBED_DIMS,
+) -> List[dict]:
+    col = column_name(storage, dims)
+    typ = sql_type(storage, dims)
+    emb_expr = f"{col}::text" if with_embedding else "NULL"
+
+    where = ""
+    params: List[Any] = [v]
+    if category is not None:
+        where = "WHERE category = %s"
+        params.append(category)
+        if subcategory is not None:
+            where += " AND subcategory = %s"
+            params.append(subcategory)
+    params.extend([v, top_k])
 
-def search_docs(query: str, top_k: int = 5):
-    v = embed(query)
     with pool.connection() as conn:
         rows = conn.execute(
-            """
+            f"""
             SELECT
                 id,
                 title,
                 url,
                 LEFT(content, 1200) AS content_snippet,
                 'WSU housing site' AS source,
-                1 - (embedding <=> %s::vector) AS score
+                1 - ({col} <=> %s::{typ}) AS score,
+                {emb_expr} AS embedding
             FROM docs
-            ORDER BY embedding <=> %s::vector
+            {where}
+            ORDER BY {col} <=> %s::{typ}
             LIMIT %s
             """,
-            (v, v, top_k),
+            params,
         ).fetchall()
 
     return [
@@ -28,6 +73,105 @@ def search_docs(query: str, top_k: int = 5):
             "content_snippet": r[3],
             "source": r[4],
             "score": float(r[5]),
+            **({"embedding": parse_vector(r[6])} if with_embedding else {}),
         }
         for r in rows
     ]
+
+
+def search_by_vector(
+    v: List[float],
+    top_k: int = 5,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    rerank: Optional[bool] = None,
+    storage: str = EMBED_STORAGE,
+    dims: int = EMBED_DIMS,
+) -> List[dict]:
+    """
+    Vector search over docs for an already-computed full query embedding.
+
+    With `category` (and optionally `subcategory`) the search is scoped to
+    docs tagged with that label. When the scoped search is too thin, it falls
+    back to progressively wider scopes and fills the remaining slots.
+
+    With reranking on (SEARCH_RERANK), top_k * SEARCH_OVERFETCH candidates
+    are fetched and reduced to at most top_k diverse hits.
+    """
+    if rerank is None:
+        rerank = SEARCH_RERANK
+    v = query_vector(v, dims)
+    limit = top_k * max(SEARCH_OVERFETCH, 1) if rerank else top_k
+
+    scopes = []
+    if category is not None:
+        if subcategory is not None:
+            scopes.append((category, subcategory))
+        scopes.append((category, None))
+    scopes.append((None, None))
+
+    hits: List[dict] = []
+    seen = set()
+    min_hits = min(SEARCH_CATEGORY_MIN_HITS, top_k)
+    for cat, sub in scopes:
+        for h in _query_docs(v, limit, cat, sub, rerank, storage, dims):
+            if h["id"] not in seen and len(hits) < limit:
+                seen.add(h["id"])
+                hits.append(h)
+        if len(hits) >= min_hits:
+            break
+
+    if rerank:
+        hits = rerank_hits(hits, top_k)
+    return hits
+
+
+def search_docs_with_vector(
+    query: str,
+    top_k: int = 5,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    rerank: Optional[bool] = None,
+) -> Tuple[List[dict], Sequence[float]]:
+    """
+    Embed `query` and run `search_by_vector`. Returns (hits, query vector),
+    so callers can reuse the embedding (centroids.py) without a second API
+    call.
+
+    Results are cached per normalised query + parameters (search_cache.py),
+    together with the vector as float32 to keep entries small.
+    """
+    if rerank is None:
+        rerank = SEARCH_RERANK
+
+    cache_key = (
+        normalize_query(query),
+        top_k,
+        category,
+        subcategory,
+        rerank,
+        column_name(),
+    )
+    if SEARCH_CACHE_ENABLED:
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            hits, vector = cached
+            return list(hits), vector
+
+    vector = array("f", embed(query))
+    hits = search_by_vector(list(vector), top_k, category, subcategory, rerank)
+
+    if SEARCH_CACHE_ENABLED:
+        search_cache.put(cache_key, (hits, vector))
+    return list(hits), vector
+
+
+def search_docs(
+    query: str,
+    top_k: int = 5,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    rerank: Optional[bool] = None,
+):
+    """Hits only; see `search_docs_with_vector`."""
+    return search_docs_with_vector(query, top_k, category, subcategory, rerank)[0]
@@ -0,0 +1,129 @@
+# app/search_cache.py
+"""
+In-process cache for `search_docs` results.
+
+Both /api/search and /api/chat go through `search_docs`, so caching there
+saves the embedding call and the vector scan for repeated questions
+("how do I apply for housing?" vs "How do I apply for housing").
+
+Entries are keyed by the normalised query plus everything that changes the
+result (top_k, category filters, rerank, embedding column) and expire after
+SEARCH_CACHE_TTL_SECS. They are also stamped with the docs version, a
+counter bumped by a trigger on `docs`, so re-ingesting docs invalidates
+the cache without waiting for the TTL.
+
+The docs_version table and its trigger are created by migration
+0001_tables.sql, which ensure_schema() applies on startup (or run
+`python -m app.migrations upgrade`).
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_TTL_SECS = float(os.getenv("SEARCH_CACHE_TTL_SECS", "600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+# How often we re-read docs_version from the DB (seconds).
+SEARCH_CACHE_VERSION_CHECK_SECS = float(
+    os.getenv("SEARCH_CACHE_VERSION_CHECK_SECS", "30")
+)
+
+_PUNCT_EDGES = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and trim punctuation at the edges."""
+    q = " ".join((query or "").lower().split())
+    return _PUNCT_EDGES.sub("", q)
+
+
+class SearchCache:
+    """Thread-safe LRU + TTL cache stamped with the docs version."""
+
+    def __init__(self, ttl: float, max_entries: int, version_check_secs: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_check_secs = version_check_secs
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Any = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    # ---- docs version ----
+    def _docs_version(self) -> Any:
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_secs:
+            return self._version
+        self._version_checked_at = now
+        try:
+            from .db import pool
+
+            with pool.connection() as conn:
+                row = conn.execute("SELECT version FROM docs_version").fetchone()
+            self._version = row[0] if row else None
+        except Exception as e:
+            # Migrations not applied (or DB hiccup): fall back to TTL only.
+            logger.warning("docs_version lookup failed, using TTL only: %s", e)
+            self._version = None
+        return self._version
+
+    # ---- cache API ----
+    def get(self, key: Hashable) -> Optional[Any]:
+        version = self._docs_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, stored_version, value = entry
+            if now - stored_at > self.ttl or stored_version != version:
+                del self._data[key]
+                self.misses += 1
+                self.stale += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        version = self._docs_version()
+        with self._lock:
+            self._data[key] = (time.monotonic(), version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": SEARCH_CACHE_ENABLED,
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "docs_version": self._version,
+            }
+
+
+search_cache = SearchCache(
+    ttl=SEARCH_CACHE_TTL_SECS,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    version_check_secs=SEARCH_CACHE_VERSION_CHECK_SECS,
+)
+
@@ -0,0 +1,139 @@
+# app/startup_profile.py
+"""
+Import-time profile and startup check for the API process.
+
+Cold starts (scale-out, tests) pay for every module `app.main` pulls in.
+This runs the import in a fresh interpreter with `python -X importtime`
+and reports the slowest imports, the total, and how much of it is our
+own code:
+
+  python -m app.startup_profile                      # profile app.main
+  python -m app.startup_profile --module app.llm --top 30
+  python -m app.startup_profile --serve              # time to first /healthz
+
+--serve starts uvicorn on a free port and measures the wall time until
+GET /healthz answers. That is what a load balancer sees, interpreter
+start included. Both modes fail (exit 1) when over --budget-ms
+(default STARTUP_BUDGET_MS, as checked by main.py).
+
+Neither needs a database or Azure settings: app.main connects and
+creates its clients after it starts serving (see the lifespan in main.py).
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, NamedTuple, Optional
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+# "import time:       123 |       4567 |     package.module"
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile_imports(module: str) -> List[ImportTime]:
+    """Per-module import times of `import module` in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"❌ import {module} failed:\n{proc.stderr[-2000:]}")
+    out = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            depth = (len(m.group(3)) - 1) // 2
+            out.append(ImportTime(m.group(4), int(m.group(1)), int(m.group(2)), depth))
+    return out
+
+
+def report_imports(module: str, top: int, budget_ms: float) -> bool:
+    times = profile_imports(module)
+    total_ms = sum(t.self_us for t in times) / 1000
+    ours_ms = sum(t.self_us for t in times if t.module.startswith("app.")) / 1000
+
+    print(f"import {module}: {total_ms:,.0f} ms, {len(times)} modules "
+          f"({ours_ms:,.0f} ms in app.*)")
+    print("\nslowest by cumulative time (direct imports of our modules and top level):")
+    print(f"{'cumulative':>11} {'self':>8}  module")
+    interesting = [t for t in times if t.depth == 0 or t.module.startswith("app.")]
+    for t in sorted(interesting, key=lambda t: -t.cumulative_us)[:top]:
+        print(f"{t.cumulative_us / 1000:9.1f}ms {t.self_us / 1000:6.1f}ms  "
+              f"{'  ' * t.depth}{t.module}")
+
+    ok = total_ms <= budget_ms
+    print(f"\n{'✅' if ok else '❌'} {total_ms:,.0f} ms of a {budget_ms:,.0f} ms budget")
+    return ok
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_healthy(timeout_s: float = 30.0) -> Optional[float]:
+    """Start uvicorn and return ms until /healthz answers (None on timeout)."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/healthz"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning"],
+    )
+    try:
+        while time.perf_counter() - t0 < timeout_s:
+            if proc.poll() is not None:
+                raise SystemExit(f"❌ uvicorn exited with {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    body = json.loads(resp.read())
+                elapsed = (time.perf_counter() - t0) * 1000
+                print(f"/healthz after {elapsed:,.0f} ms "
+                      f"(app reports {body.get('startup_ms')} ms since its import)")
+                return elapsed
+            except OSError:
+                time.sleep(0.02)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="API import / startup profile")
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--top", type=int, default=20, help="rows to show")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--serve", action="store_true", help="time uvicorn to /healthz")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        elapsed = time_to_healthy()
+        ok = elapsed is not None and elapsed <= args.budget_ms
+        if elapsed is None:
+            print("❌ /healthz never answered")
+        else:
+            print(f"{'✅' if ok else '❌'} {elapsed:,.0f} ms of a {args.budget_ms:,.0f} ms budget")
+    else:
+        ok = report_imports(args.module, args.top, args.budget_ms)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
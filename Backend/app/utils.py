@@ -1,9 +1,13 @@
 # app/utils.py
 import re
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from .config_registry import ZuzuConfig, current
 
 # ---------------- ZUZU CATEGORIES & HIERARCHY ----------------
 # Clear, onboarding-focused categories for international students.
+# These are the built-in defaults; at runtime the active set comes from
+# config_registry.current() and can be changed without a redeploy.
 
 ZUZU_CATEGORIES: List[str] = [
     "Housing",
@@ -17,7 +21,7 @@ ZUZU_CATEGORIES: List[str] = [
     "Phone and Connectivity",
     "Work and Career",
     "Community and Daily Life",
-    "Undergraduate - Placement Assessments"
+    "Undergraduate - Placement Assessments",
     "Other Inquiries",
 ]
 
@@ -108,6 +112,89 @@ ZUZU_SUBCATEGORIES: Dict[str, List[str]] = {
 
 # ---------------- CATEGORY HEURISTICS ----------------
 
+_DEFAULT_CATEGORY = "Other Inquiries"
+
+
+def _naive_keywords(cfg: ZuzuConfig) -> List[Tuple[str, List[str]]]:
+    """
+    (category, keywords) in priority order for naive_category: the active
+    config's classifier keywords, in category order. Those are written as
+    words ("i 20", "move in") and match any punctuation in between; here
+    they are plain substrings of the lowercased text ("hall" also matches
+    "shall"), so a phrase is looked for with hyphens as well ("i-20").
+    """
+    out = []
+    for cat in cfg.categories:
+        keywords = list(cfg.payload["category_keywords"].get(cat, ()))
+        keywords += [kw.replace(" ", "-") for kw in keywords if " " in kw]
+        if keywords:
+            out.append((cat, keywords))
+    return out
+
+
+def _compile_keyword_table(
+    keywords: List[Tuple[str, List[str]]],
+) -> List[Tuple[str, Tuple[str, ...]]]:
+    """
+    `keywords` as tuples. A keyword that contains another keyword of the
+    same or an earlier category ("forms" / "form", "temporary housing" /
+    "housing") can never change the result, so it is dropped and never
+    scanned for.
+    """
+    rank: Dict[str, int] = {}
+    for i, (_cat, kws) in enumerate(keywords):
+        for kw in kws:
+            rank.setdefault(kw, i)
+    table = []
+    for i, (cat, kws) in enumerate(keywords):
+        kept = tuple(
+            kw
+            for kw in kws
+            if rank[kw] == i
+            and not any(o != kw and o in kw and r <= i for o, r in rank.items())
+        )
+        table.append((cat, kept))
+    return table
+
+
+_SUBCATEGORY_STOPWORDS = {"and", "the", "for", "other", "not", "sure", "basics"}
+
+
+def _subcategory_tokens(cfg: ZuzuConfig) -> Dict[str, List[tuple]]:
+    """Word tokens per subcategory label of the active config."""
+    return {
+        cat: [
+            (
+                label,
+                [
+                    w
+                    for w in re.findall(r"[a-z0-9]+", label.lower())
+                    if len(w) >= 3 and w not in _SUBCATEGORY_STOPWORDS
+                ],
+            )
+            for label in labels
+        ]
+        for cat, labels in cfg.subcategories.items()
+    }
+
+
+# (config version, category table, subcategory tokens)
+_naive_cache: Tuple[int, List[Tuple[str, Tuple[str, ...]]], Dict[str, List[tuple]]] = (
+    -1, [], {}
+)
+
+
+def _naive_tables() -> Tuple[List[Tuple[str, Tuple[str, ...]]], Dict[str, List[tuple]]]:
+    """naive_category / naive_subcategory tables, compiled once per config version."""
+    global _naive_cache
+    cfg = current()
+    version, table, tokens = _naive_cache
+    if version != cfg.version:
+        table = _compile_keyword_table(_naive_keywords(cfg))
+        tokens = _subcategory_tokens(cfg)
+        _naive_cache = (cfg.version, table, tokens)
+    return table, tokens
+
 
 def naive_category(text: str) -> str:
     """
@@ -115,217 +202,86 @@ def naive_category(text: str) -> str:
     top-level ZUZU_CATEGORIES for analytics and message_events.
 
     It does NOT have to be perfect; just good enough for charts and grouping.
+    The first category (in _naive_keywords order) with a keyword in the
+    text wins.
     """
     if not text:
-        return "Other Inquiries"
+        return _DEFAULT_CATEGORY
 
     t = text.lower()
+    table, _ = _naive_tables()
+    for category, keywords in table:
+        for kw in keywords:
+            if kw in t:
+                return category
+    return _DEFAULT_CATEGORY
 
-    # Housing
-    if any(
-        kw in t
-        for kw in [
-            "housing",
-            "dorm",
-            "residence hall",
-            "hall",
-            "apartment",
-            "roommate",
-            "room mate",
-            "move-in",
-            "move in",
-            "move-out",
-            "move out",
-            "lease",
-            "contract",
-        ]
-    ):
-        return "Housing"
-
-    # Admissions
-    if any(
-        kw in t
-        for kw in [
-            "admission",
-            "apply",
-            "application",
-            "deadline",
-            "program requirements",
-            "gpa",
-            "transcript",
-            "offer letter",
-        ]
-    ):
-        return "Admissions"
-
-    # Visa / immigration
-    if any(
-        kw in t
-        for kw in [
-            "visa",
-            "i-20",
-            "i20",
-            "sevis",
-            "ds-2019",
-            "immigration",
-            "status",
-            "consulate",
-        ]
-    ):
-        return "Visa and Immigration"
-
-    # Travel / arrival
-    if any(
-        kw in t
-        for kw in [
-            "flight",
-            "airport",
-            "arrival",
-            "travel",
-            "pickup",
-            "pick up",
-            "hotel",
-            "temporary housing",
-        ]
-    ):
-        return "Travel and Arrival"
-
-    # Forms & docs
-    if any(
-        kw in t
-        for kw in [
-            "form",
-            "forms",
-            "document",
-            "documents",
-            "paperwork",
-            "pdf upload",
-        ]
-    ):
-        return "Forms and Documentation"
-
-    # Money & banking
-    if any(
-        kw in t
-        for kw in [
-            "tuition",
-            "fee",
-            "bank",
-            "account",
-            "card",
-            "loan",
-            "scholarship",
-            "assistantship",
-            "budget",
-            "money",
-            "rent",
-        ]
-    ):
-        return "Money and Banking"
-
-    # Campus life & academics
-    if any(
-        kw in t
-        for kw in [
-            "class",
-            "course",
-            "registration",
-            "enroll",
-            "enrol",
-            "advisor",
-            "adviser",
-            "tutoring",
-            "club",
-            "organization",
-            "society",
-            "campus",
-        ]
-    ):
-        return "Campus Life and Academics"
-
-    # Health & safety
-    if any(
-        kw in t
-        for kw in [
-            "insurance",
-            "health",
-            "doctor",
-            "hospital",
-            "clinic",
-            "mental health",
-            "counseling",
-            "counselling",
-            "safety",
-            "emergency",
-        ]
-    ):
-        return "Health and Safety"
-
-    # Phone & connectivity
-    if any(
-        kw in t
-        for kw in [
-            "phone",
-            "sim",
-            "sim card",
-            "wifi",
-            "wi-fi",
-            "internet",
-            "data plan",
-        ]
-    ):
-        return "Phone and Connectivity"
-
-    # Work & career
-    if any(
-        kw in t
-        for kw in [
-            "job",
-            "work",
-            "internship",
-            "cpt",
-            "opt",
-            "career",
-            "on-campus job",
-            "on campus job",
-            "employment",
-        ]
-    ):
-        return "Work and Career"
-    
-        # Undergrad Placement Assessments
-    if any(
-        kw in t
-        for kw in [
-            "placement exam",
-            "placement test",
-            "placement assessment",
-            "math placement",
-            "writing placement",
-            "aleks",
-        ]
-    ):
-        return "Undergrad Placement Assessments"
-
-
-    # Community & daily life
-    if any(
-        kw in t
-        for kw in [
-            "grocery",
-            "groceries",
-            "shopping",
-            "bus",
-            "transport",
-            "transportation",
-            "parking",
-            "community",
-            "restaurant",
-        ]
-    ):
-        return "Community and Daily Life"
 
-    return "Other Inquiries"
+# ---------------- SUBCATEGORIES & BREADCRUMBS ----------------
+
+def naive_subcategory(text: str, category: str) -> Optional[str]:
+    """
+    Pick the subcategory label of `category` whose words show up most
+    often in `text`. Returns None when nothing matches.
+    """
+    _, tokens = _naive_tables()
+    if not text or category not in tokens:
+        return None
+
+    t = text.lower()
+    best: Optional[str] = None
+    best_score = 0
+    for label, words in tokens[category]:
+        score = sum(t.count(w) for w in words)
+        if score > best_score:
+            best, best_score = label, score
+    return best
+
+
+# How a UI selection reaches the backend (Frontend/app/page.tsx):
+#   chat:            "Student profile: graduate student.\n\n"   (optional)
+#                    "Category selection: Housing | Subcategory: Apartments"
+#                    (" | Detail: ..." for third-level buttons)
+#   track-category:  "Housing – Apartments"
+#   display text:    "Housing → Apartments"
+_PROFILE_PREFIX_RE = re.compile(r"\AStudent profile:[^\n]*\n+")
+_SELECTION_PREFIX = "category selection:"
+_CRUMB_SEPARATORS_RE = re.compile(r"\s*[→–]\s*")
+
+
+def _breadcrumb_parts(text: str) -> List[str]:
+    text = _PROFILE_PREFIX_RE.sub("", text.strip(), count=1).strip()
+    if text.lower().startswith(_SELECTION_PREFIX):
+        fields = {}
+        for field in text.split("|"):
+            key, _, value = field.partition(":")
+            fields[key.strip().lower()] = value.strip()
+        return [fields.get("category selection", ""), fields.get("subcategory", "")]
+    if "→" in text or "–" in text:
+        return _CRUMB_SEPARATORS_RE.split(text)
+    return []
+
+
+def parse_breadcrumb(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Parse a UI button selection (see the formats above) into
+    (category, subcategory).
+
+    Only categories / subcategories of the active config are returned, so
+    free-text messages that happen to contain an arrow or dash come back
+    as (None, None).
+    """
+    parts = _breadcrumb_parts(text or "")
+    if not parts:
+        return None, None
+
+    found = current().breadcrumbs.get(parts[0].lower())
+    if not found:
+        return None, None
+
+    category, subs = found
+    subcategory = subs.get(parts[1].lower()) if len(parts) > 1 else None
+    return category, subcategory
 
 
 # ---------------- PII DETECTION ----------------
@@ -393,67 +349,142 @@ def naive_category(text: str) -> str:
 # - Addresses
 # (we're *not* flagging names/ages for now to avoid false positives)
 
-_PII_REGEXES = [
+# (kind, pattern), combined below into one regex with a named group per kind.
+# When two patterns match at the same position the first one listed wins,
+# so the ones that can cover more text come first (an email may start with
+# nine digits; a card number contains SSN- and phone-like runs).
+# Each pattern is either bounded in length or only tried where a token
+# starts and reads a bounded number of tokens, so a scan is linear in the
+# text length, also on inputs built to make regexes backtrack
+# (python -m app.pii_bench --adversarial).
+_PII_EMAIL = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+
+_PII_PATTERNS: List[Tuple[str, str]] = [
+    # Email addresses. Only tried where the local part starts (retrying at
+    # every character of a long token was quadratic); detect_pii_spans
+    # also tries right after the previous email, as finditer() did.
+    ("email", r"(?<![A-Za-z0-9._%+-])" + _PII_EMAIL),
+
+    # Credit/debit / long account-like digit strings (very rough), with any
+    # run of spaces and dashes between digits ("4111 - 1111 - ..."). A try
+    # reads at most 16 digits, so any character is read by at most the 16
+    # tries that start at the digits before it.
+    ("card", r"\b(?:\d[ -]*?){13,16}\b"),
+
     # US SSN-like: 123-45-6789 or 123456789
-    re.compile(r"\b\d{3}-\d{2}-\d{4}\b"),
-    re.compile(r"\b\d{9}\b"),
+    ("ssn", r"\b\d{3}-\d{2}-\d{4}\b"),
 
     # Phone numbers: +1 555-555-5555, (555) 555-5555, 555-555-5555
-    re.compile(
-        r"\b(?:\+?1[\s-]?)?(?:\(\d{3}\)|\d{3})[\s-]?\d{3}[\s-]?\d{4}\b"
-    ),
-
-    # Email addresses
-    re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"),
+    ("phone", r"\b(?:\+?1[\s-]?)?(?:\(\d{3}\)|\d{3})[\s-]?\d{3}[\s-]?\d{4}\b"),
 
-    # Credit/debit / long account-like digit strings (very rough)
-    re.compile(r"\b(?:\d[ -]*?){13,16}\b"),
+    ("ssn", r"\b\d{9}\b"),
 
     # Address-like (very rough): number + street word
-    re.compile(
-        r"\b\d+\s+(?:street|st\.?|avenue|ave\.?|road|rd\.?|lane|ln\.?|drive|dr\.?)\b",
-        re.IGNORECASE,
+    (
+        "address",
+        r"(?i:\b\d+\s+(?:street|st\.?|avenue|ave\.?|road|rd\.?|lane|ln\.?|drive|dr\.?)\b)",
     ),
 ]
 
 
+def _pii_group(i: int) -> str:
+    kind, pat = _PII_PATTERNS[i]
+    return f"(?P<{kind}{i}>{pat})"
+
+
+# One pass over the text finds every kind; a match's kind is m.lastgroup.
+# All patterns after the email one start with \b and then a digit, "(" or
+# "+", so one guard rules them all out at any other character, and at
+# digits inside a word or a digit run ("\b" can't hold there).
+_PII_SCANNER = re.compile(
+    _pii_group(0)
+    + r"|(?:(?<!\w)(?=\d)|(?=[(+]))(?:"
+    + "|".join(_pii_group(i) for i in range(1, len(_PII_PATTERNS)))
+    + ")"
+)
+_PII_KINDS: Dict[str, str] = {
+    f"{kind}{i}": kind for i, (kind, _pat) in enumerate(_PII_PATTERNS)
+}
+_PII_MATCHERS = [(kind, re.compile(pat)) for kind, pat in _PII_PATTERNS]
+_PII_INDEX: Dict[str, int] = {f"{kind}{i}": i for i, (kind, _pat) in enumerate(_PII_PATTERNS)}
+_PII_EMAIL_ANYWHERE = re.compile(_PII_EMAIL)
+
 
 def detect_pii_spans(text: str) -> List[tuple]:
     """
-    Return a list of (start, end, value, pattern) for each PII span detected.
+    Return a list of (start, end, value, kind) for each PII span detected,
+    in order. Overlapping or touching matches are merged into one span,
+    which keeps the kind of the first.
     """
     spans: List[tuple] = []
     if not text:
         return spans
 
-    for pat in _PII_REGEXES:
-        for m in pat.finditer(text):
-            spans.append((m.start(), m.end(), m.group(0), pat.pattern))
-
-    # Merge overlapping spans conservatively
-    spans.sort(key=lambda x: x[0])
-    merged: List[tuple] = []
-    for s, e, val, pat in spans:
-        if not merged:
-            merged.append((s, e, val, pat))
-            continue
-        last_s, last_e, last_val, last_pat = merged[-1]
-        if s <= last_e:
-            # overlap, extend the previous span
-            merged[-1] = (last_s, max(last_e, e), last_val, last_pat)
+    search = _PII_SCANNER.search
+    # Same matches as the per-pattern finditer() this replaced: a pattern
+    # doesn't match again inside its own previous match (other patterns
+    # may), and resumes right at its end. resume[i] is that end.
+    resume = [0] * len(_PII_MATCHERS)
+    pos = 0
+    while True:
+        m = search(text, pos)
+        s = m.start() if m is not None else len(text) + 1
+        # An email may start right where the previous one ended, mid-run,
+        # where the scanner's lookbehind rules it out.
+        tail = resume[0]
+        at_tail = pos <= tail < s and _PII_EMAIL_ANYWHERE.match(text, tail) is not None
+        if at_tail:
+            s = tail
+        elif m is None:
+            break
+
+        # The scanner reports the first pattern that matches at a position
+        # (those listed before it didn't); where later ones match too, mask
+        # as far as the longest one reaches.
+        first = 0 if at_tail or s == tail else _PII_INDEX[m.lastgroup]
+        e, kind = -1, None
+        for i in range(first, len(_PII_MATCHERS)):
+            if s < resume[i]:
+                continue
+            pat = _PII_EMAIL_ANYWHERE if i == 0 and s == tail else _PII_MATCHERS[i][1]
+            hit = pat.match(text, s)
+            if hit is None:
+                continue
+            resume[i] = hit.end()
+            if hit.end() > e:
+                e, kind = hit.end(), _PII_MATCHERS[i][0]
+
+        if kind is None:
+            pass
+        elif spans and s <= spans[-1][1]:
+            # Values are sliced at the end: re-slicing here on every hit
+            # was quadratic for long runs like "1 1 1 1 ...".
+            if e > spans[-1][1]:
+                spans[-1][1] = e
         else:
-            merged.append((s, e, val, pat))
-    return merged
+            spans.append([s, e, kind])
+        # Next candidate may start inside this match (e.g. a card number
+        # that begins in the middle of an SSN).
+        pos = s + 1
+    return [(s, e, text[s:e], kind) for s, e, kind in spans]
 
 
 def contains_pii(text: str) -> bool:
-    return bool(detect_pii_spans(text or ""))
+    """True as soon as anything PII-like is found; doesn't scan the rest."""
+    return bool(text) and _PII_SCANNER.search(text) is not None
 
 
 def mask_pii(text: str) -> str:
-    out = text or ""
-    spans = detect_pii_spans(text or "")
-    # replace from end to start to avoid messing up indices
-    for s, e, _val, _pat in sorted(spans, key=lambda x: x[0], reverse=True):
-        out = out[:s] + "<PII>" + out[e:]
-    return out
+    """Replace every PII span with "<PII>", in one pass over the text."""
+    if not text:
+        return ""
+    parts: List[str] = []
+    pos = 0
+    for s, e, _val, _kind in detect_pii_spans(text):
+        parts.append(text[pos:s])
+        parts.append("<PII>")
+        pos = e
+    if not parts:
+        return text
+    parts.append(text[pos:])
+    return "".join(parts)
@@ -1,3 +1,8 @@
+-- Superseded by the versioned migrations in sql/migrations, which define
+-- every table and index and are applied by `python -m app.migrations
+-- upgrade` (or on startup). Kept for reference only: this is the original
+-- schema (message_events.ts is created_at since 0001_tables.sql).
+
 CREATE EXTENSION IF NOT EXISTS vector;
 
 
@@ -0,0 +1,165 @@
+-- 0001: every table the backend reads or writes.
+-- Idempotent, so it also brings databases created from the old init.sql
+-- (or by hand) up to date.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+
+-- Chats metadata (for listing / analytics)
+CREATE TABLE IF NOT EXISTS chats (
+chat_id UUID PRIMARY KEY,
+device_id TEXT,
+title TEXT,
+created_at TIMESTAMPTZ DEFAULT now(),
+updated_at TIMESTAMPTZ DEFAULT now()
+);
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS device_id TEXT;
+
+
+-- Chat history (storage.py)
+CREATE TABLE IF NOT EXISTS messages (
+id BIGSERIAL PRIMARY KEY,
+chat_id UUID NOT NULL REFERENCES chats(chat_id) ON DELETE CASCADE,
+role TEXT NOT NULL,
+content TEXT,
+created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+
+-- Per-message analytics materialization
+CREATE TABLE IF NOT EXISTS message_events (
+id BIGSERIAL PRIMARY KEY,
+chat_id UUID REFERENCES chats(chat_id) ON DELETE CASCADE,
+device_id TEXT,
+role TEXT CHECK (role IN ('user','assistant')),
+category TEXT,
+created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE message_events ADD COLUMN IF NOT EXISTS device_id TEXT;
+DO $$
+BEGIN
+    -- init.sql used to call this column `ts`; the code uses created_at.
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = 'message_events'
+                 AND column_name = 'ts')
+       AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = 'public' AND table_name = 'message_events'
+                         AND column_name = 'created_at') THEN
+        ALTER TABLE message_events RENAME COLUMN ts TO created_at;
+    END IF;
+END
+$$;
+
+
+CREATE TABLE IF NOT EXISTS pii_events (
+id BIGSERIAL PRIMARY KEY,
+chat_id UUID REFERENCES chats(chat_id) ON DELETE CASCADE,
+device_id TEXT,
+pii_type TEXT,
+created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+
+-- Crawled housing pages for retrieval
+CREATE TABLE IF NOT EXISTS docs (
+id BIGSERIAL PRIMARY KEY,
+title TEXT,
+url TEXT,
+content TEXT,
+embedding vector(1536),
+category TEXT,
+subcategory TEXT
+);
+ALTER TABLE docs ADD COLUMN IF NOT EXISTS category TEXT;
+ALTER TABLE docs ADD COLUMN IF NOT EXISTS subcategory TEXT;
+
+
+-- Docs change counter for the search cache (search_cache.py)
+CREATE TABLE IF NOT EXISTS docs_version (
+id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+version BIGINT NOT NULL DEFAULT 0,
+updated_at TIMESTAMPTZ DEFAULT now()
+);
+INSERT INTO docs_version (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_docs_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE docs_version SET version = version + 1, updated_at = now();
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS docs_version_bump ON docs;
+CREATE TRIGGER docs_version_bump
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON docs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_docs_version();
+
+
+-- Pre-aggregated analytics (rollups.py)
+CREATE TABLE IF NOT EXISTS analytics_rollup_daily (
+scope TEXT NOT NULL,
+day DATE NOT NULL,
+kind TEXT NOT NULL CHECK (kind IN ('question','pii')),
+n BIGINT NOT NULL DEFAULT 0,
+PRIMARY KEY (scope, day, kind)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_rollup_hourly (
+scope TEXT NOT NULL,
+hour TIMESTAMPTZ NOT NULL,
+kind TEXT NOT NULL CHECK (kind IN ('question','pii')),
+n BIGINT NOT NULL DEFAULT 0,
+PRIMARY KEY (scope, hour, kind)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_rollup_category (
+scope TEXT NOT NULL,
+kind TEXT NOT NULL CHECK (kind IN ('question','pii')),
+category TEXT NOT NULL,
+n BIGINT NOT NULL DEFAULT 0,
+PRIMARY KEY (scope, kind, category)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_rollup_device (
+device_id TEXT PRIMARY KEY,
+questions BIGINT NOT NULL DEFAULT 0,
+pii_events BIGINT NOT NULL DEFAULT 0,
+first_seen TIMESTAMPTZ,
+last_seen TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS analytics_hll_daily (
+day DATE NOT NULL,
+category TEXT NOT NULL,
+registers BYTEA NOT NULL,
+PRIMARY KEY (day, category)
+);
+
+
+-- Answer consistency (consistency.py)
+CREATE TABLE IF NOT EXISTS qa_embeddings (
+chat_id UUID NOT NULL,
+answered_at TIMESTAMPTZ NOT NULL,
+device_id TEXT,
+question_key TEXT NOT NULL,
+category TEXT,
+embedding vector(1536) NOT NULL,
+PRIMARY KEY (chat_id, answered_at)
+);
+CREATE INDEX IF NOT EXISTS qa_embeddings_question_key_idx ON qa_embeddings (question_key);
+
+CREATE TABLE IF NOT EXISTS consistency_state (
+id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+last_answer_at TIMESTAMPTZ NOT NULL,
+last_chat_id TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS consistency_scores (
+scope TEXT NOT NULL,
+category TEXT NOT NULL,
+score REAL NOT NULL,
+pairs BIGINT NOT NULL,
+updated_at TIMESTAMPTZ DEFAULT now(),
+PRIMARY KEY (scope, category)
+);
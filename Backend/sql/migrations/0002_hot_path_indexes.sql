@@ -0,0 +1,30 @@
+-- migrate: no-transaction
+-- 0002: indexes behind the hot paths, built CONCURRENTLY so production
+-- tables stay writable. Tables already partitioned by partitions.py carry
+-- equivalent per-partition indexes; the runner skips them here.
+
+-- /api/chats: a device's chats, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chats_device_updated_idx
+ON chats (device_id, updated_at DESC);
+
+-- get_chat / get_last_messages
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_chat_created_idx
+ON messages (chat_id, created_at);
+
+-- analytics: global and per-device question counts by time
+CREATE INDEX CONCURRENTLY IF NOT EXISTS message_events_role_created_idx
+ON message_events (role, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS message_events_role_device_created_idx
+ON message_events (role, device_id, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS pii_events_created_idx
+ON pii_events (created_at);
+
+-- category-scoped retrieval (doc_tagging.py)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS docs_category_subcategory_idx
+ON docs (category, subcategory);
+
+-- vector search (same name as embedding_store.index_name())
+CREATE INDEX CONCURRENTLY IF NOT EXISTS docs_embedding_hnsw_idx
+ON docs USING hnsw (embedding vector_cosine_ops);
@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- 0003: covering index for keyset-paginated /api/chats.
+-- Serves WHERE device_id = ? AND (updated_at, chat_id) < (?, ?)
+-- ORDER BY updated_at DESC, chat_id DESC (backward scan) as an index-only
+-- scan; it supersedes chats_device_updated_idx from 0002.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chats_device_updated_cover_idx
+ON chats (device_id, updated_at, chat_id) INCLUDE (title, created_at);
+
+DROP INDEX CONCURRENTLY IF EXISTS chats_device_updated_idx;
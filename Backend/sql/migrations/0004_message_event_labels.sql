@@ -0,0 +1,10 @@
+-- 0004: richer labels from app/classifier.py on message_events.
+-- subcategory: one of ZUZU_SUBCATEGORIES[category], or NULL
+-- confidence:  share of the keyword score that went to `category` (0..1)
+-- labels:      ranked [[category, confidence], ...] for the top few
+-- Adding nullable columns without defaults is a catalog-only change, also
+-- on the partitioned table.
+
+ALTER TABLE message_events ADD COLUMN IF NOT EXISTS subcategory TEXT;
+ALTER TABLE message_events ADD COLUMN IF NOT EXISTS confidence REAL;
+ALTER TABLE message_events ADD COLUMN IF NOT EXISTS labels JSONB;
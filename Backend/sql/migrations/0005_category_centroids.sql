@@ -0,0 +1,12 @@
+-- 0005: mean doc embedding per category and per (category, subcategory),
+-- for the centroid classifier in app/centroids.py.
+-- subcategory IS NULL -> the category-level centroid.
+-- Rebuilt wholesale by `python -m app.centroids rebuild`.
+
+CREATE TABLE IF NOT EXISTS category_centroids (
+category TEXT NOT NULL,
+subcategory TEXT,
+centroid vector(1536) NOT NULL,
+n_docs INT NOT NULL,
+updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,13 @@
+-- 0006: resume points for `python -m app.reclassify`, one row per job.
+-- (last_created_at, last_id) is the last message_events row already
+-- written back; a rerun continues after it.
+
+CREATE TABLE IF NOT EXISTS reclassify_checkpoints (
+job TEXT PRIMARY KEY,
+last_created_at TIMESTAMPTZ,
+last_id BIGINT,
+rows_seen BIGINT NOT NULL DEFAULT 0,
+rows_updated BIGINT NOT NULL DEFAULT 0,
+started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,11 @@
+-- 0007: PII detections per kind, maintained by app/pii_audit.py through
+-- rollups.record_pii_events and rebuilt by a full reconcile.
+-- scope is '*' (system-wide) or a device_id, as in the other rollups;
+-- pii_type is one kind from utils.detect_pii_spans (email, phone, ...).
+
+CREATE TABLE IF NOT EXISTS analytics_rollup_pii_type (
+scope TEXT NOT NULL,
+pii_type TEXT NOT NULL,
+n BIGINT NOT NULL DEFAULT 0,
+PRIMARY KEY (scope, pii_type)
+);
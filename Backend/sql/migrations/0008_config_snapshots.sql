@@ -0,0 +1,11 @@
+-- 0008: published content config (categories, classifier keywords, allowed
+-- emails, housing rates), one immutable row per version. The newest row is
+-- active; app/config_registry.py reloads it without a restart. Roll back by
+-- republishing an older payload as a new version.
+
+CREATE TABLE IF NOT EXISTS config_snapshots (
+version BIGSERIAL PRIMARY KEY,
+payload JSONB NOT NULL,
+comment TEXT,
+created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
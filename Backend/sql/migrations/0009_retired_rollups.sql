@@ -0,0 +1,26 @@
+-- 0009: all-time counts of message_events partitions removed by retention
+-- (app/partitions.py). rollups.fold_retired adds a partition's counts here
+-- right after it is detached, and a full reconcile adds these rows to what
+-- it counts in the retained data, so archiving old months no longer
+-- erases them from analytics_rollup_category / analytics_rollup_device.
+
+CREATE TABLE IF NOT EXISTS analytics_retired_partitions (
+partition TEXT PRIMARY KEY,
+retired_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS analytics_retired_category (
+scope TEXT NOT NULL,
+kind TEXT NOT NULL CHECK (kind IN ('question','pii')),
+category TEXT NOT NULL,
+n BIGINT NOT NULL DEFAULT 0,
+PRIMARY KEY (scope, kind, category)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_retired_device (
+device_id TEXT PRIMARY KEY,
+questions BIGINT NOT NULL DEFAULT 0,
+pii_events BIGINT NOT NULL DEFAULT 0,
+first_seen TIMESTAMPTZ,
+last_seen TIMESTAMPTZ
+);
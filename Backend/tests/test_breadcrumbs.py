@@ -0,0 +1,44 @@
+# tests/test_breadcrumbs.py
+"""
+parse_breadcrumb against the payloads Frontend/app/page.tsx really sends.
+
+  cd Backend && python -m pytest -q tests
+"""
+from app.classifier import classify
+from app.utils import parse_breadcrumb
+
+# sendMessageWithText(): profile prefix + handleButtonClick() context.
+CHAT_SUBCATEGORY = (
+    "Student profile: graduate student.\n\n"
+    "Category selection: Money and Banking | Subcategory: Bank accounts and cards"
+)
+CHAT_THIRD_LEVEL = (
+    "Student profile: undergraduate student.\n\n"
+    "Category selection: Housing | Subcategory: Apartments | Detail: Forest Lane Apartments"
+)
+# trackCategorySelection()
+TRACK = "Housing – Residence halls"
+
+
+def test_chat_selection():
+    assert parse_breadcrumb(CHAT_SUBCATEGORY) == ("Money and Banking", "Bank accounts and cards")
+    assert parse_breadcrumb(CHAT_THIRD_LEVEL) == ("Housing", "Apartments")
+
+
+def test_track_category_payload():
+    assert parse_breadcrumb(TRACK) == ("Housing", "Residence halls")
+    assert parse_breadcrumb("Housing – On-campus housing") == ("Housing", None)
+
+
+def test_display_arrow_form():
+    assert parse_breadcrumb("Housing → Apartments") == ("Housing", "Apartments")
+
+
+def test_free_text_is_not_a_breadcrumb():
+    assert parse_breadcrumb("Student profile: graduate student.\n\nWhere do I pay tuition?") == (None, None)
+    assert parse_breadcrumb("Is on-campus housing – or off-campus – cheaper?") == (None, None)
+
+
+def test_classifier_uses_the_selection():
+    c = classify(CHAT_SUBCATEGORY)
+    assert (c.category, c.subcategory, c.confidence) == ("Money and Banking", "Bank accounts and cards", 1.0)
@@ -0,0 +1,43 @@
+# tests/test_config_registry.py
+"""
+config_registry.build rejects keyword tables of the wrong shape.
+
+  cd Backend && python -m pytest -q tests
+"""
+import copy
+
+import pytest
+
+from app.config_registry import build, default_payload
+
+
+def _with(path, value):
+    payload = copy.deepcopy(default_payload())
+    node = payload
+    for key in path[:-1]:
+        node = node[key]
+    node[path[-1]] = value
+    return payload
+
+
+def test_defaults_build():
+    assert build(default_payload(), 0).version == 0
+
+
+@pytest.mark.parametrize(
+    "path, value",
+    [
+        (("category_keywords",), ["housing"]),
+        (("category_keywords", "Housing"), ["housing", "dorm"]),
+        (("category_keywords", "Housing"), {"dorm": "3"}),
+        (("category_keywords", "Housing"), {"dorm": True}),
+        (("category_keywords", "Housing"), {"": 2}),
+        (("subcategory_keywords",), [["Housing", "Apartments"]]),
+        (("subcategory_keywords", "Housing"), ["Apartments"]),
+        (("subcategory_keywords", "Housing", "Apartments"), "apartment"),
+        (("subcategory_keywords", "Housing", "Apartments"), {"apartment": None}),
+    ],
+)
+def test_malformed_keywords(path, value):
+    with pytest.raises(ValueError):
+        build(_with(path, value), 1)
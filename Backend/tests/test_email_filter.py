@@ -0,0 +1,70 @@
+# tests/test_email_filter.py
+"""
+StreamingEmailFilter against enforce_allowed_emails on the whole text,
+for replies split into arbitrary pieces.
+
+  cd Backend && python -m pytest -q tests
+"""
+import random
+
+import pytest
+
+pytest.importorskip("dotenv")  # app.llm loads .env on import
+
+from app.llm import (  # noqa: E402
+    DEFAULT_ALLOWED_EMAILS,
+    StreamingEmailFilter,
+    enforce_allowed_emails,
+)
+
+ALLOWED = DEFAULT_ALLOWED_EMAILS[0]
+
+REPLIES = [
+    "Write to someone.else@wright.edu for help.",
+    f"Contact {ALLOWED} or bob@wright.edu today",
+    "bob@wright.education is not a wright.edu address",
+    "a@b@wright.edu, x@WRIGHT.EDU and x@gmail.com",
+    "no emails here at all, just @ signs and wright.edu",
+    "trailing address joe@wright.ed",
+]
+
+
+def _stream(text: str, cuts) -> str:
+    f = StreamingEmailFilter()
+    out, pos = [], 0
+    for cut in sorted(cuts) + [len(text)]:
+        out.append(f.feed(text[pos:cut]))
+        pos = cut
+    out.append(f.flush())
+    return "".join(out)
+
+
+@pytest.mark.parametrize("text", REPLIES)
+def test_every_split_point(text):
+    expected = enforce_allowed_emails(text)
+    for i in range(len(text) + 1):
+        assert _stream(text, [i]) == expected
+
+
+@pytest.mark.parametrize("text", REPLIES)
+def test_character_by_character(text):
+    assert _stream(text, range(1, len(text))) == enforce_allowed_emails(text)
+
+
+def test_random_splits():
+    rnd = random.Random(47)
+    pieces = ["bob", "@", "wright", ".", "edu", " ", "x.y", ALLOWED, "@wright.e", "du!"]
+    for _ in range(2000):
+        text = "".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 12)))
+        cuts = rnd.sample(range(len(text) + 1), rnd.randint(0, min(5, len(text))))
+        assert _stream(text, cuts) == enforce_allowed_emails(text), text
+
+
+def test_holds_back_only_a_possible_address():
+    f = StreamingEmailFilter()
+    assert f.feed("Email the office at ") == "Email the office at "
+    assert f.feed("someone@wri") == ""
+    assert f.feed("ght.edu now") == (
+        enforce_allowed_emails("someone@wright.edu") + " "
+    )
+    assert f.flush() == "now"
@@ -0,0 +1,49 @@
+# tests/test_naive_category.py
+"""
+naive_category / naive_subcategory follow the active config version.
+
+  cd Backend && python -m pytest -q tests
+"""
+import copy
+import itertools
+
+import pytest
+
+from app import config_registry
+from app.utils import naive_category, naive_subcategory
+
+
+# Real versions are never reused, and the tables are cached per version.
+_versions = itertools.count(1000)
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Make a modified copy of the defaults the active config."""
+
+    def publish(edit):
+        payload = copy.deepcopy(config_registry.default_payload())
+        edit(payload)
+        cfg = config_registry.build(payload, next(_versions))
+        monkeypatch.setattr(config_registry, "_current", cfg)
+
+    return publish
+
+
+def test_hyphenated_phrases():
+    assert naive_category("Where do I upload my I-20?") == "Visa and Immigration"
+    assert naive_category("move-in weekend") == "Housing"
+
+
+def test_new_keyword_after_reload(published):
+    assert naive_category("Where is the gym?") == "Other Inquiries"
+    published(lambda p: p["category_keywords"]["Health and Safety"].update(gym=2))
+    assert naive_category("Where is the gym?") == "Health and Safety"
+
+
+def test_new_subcategory_after_reload(published):
+    def edit(p):
+        p["subcategories"]["Housing"].append("Summer storage")
+
+    published(edit)
+    assert naive_subcategory("storage over the summer", "Housing") == "Summer storage"
@@ -0,0 +1,81 @@
+# tests/test_pii.py
+"""
+mask_pii against the per-pattern finditer() scan it replaced: same spans,
+including where matches of different patterns overlap.
+
+  cd Backend && python -m pytest -q tests
+"""
+import random
+
+import pytest
+
+from app.pii_bench import _legacy_contains_pii, _legacy_mask_pii
+from app.utils import contains_pii, detect_pii_spans, mask_pii
+
+
+def test_masks_common_kinds():
+    text = "Call 555-123-4567 or mail jane.doe@example.com, ssn 123-45-6789"
+    assert mask_pii(text) == "Call <PII> or mail <PII>, ssn <PII>"
+    assert [kind for *_, kind in detect_pii_spans(text)] == ["phone", "email", "ssn"]
+
+
+def test_pattern_does_not_restart_inside_its_own_match():
+    # The second "@" must not start another email inside the first one,
+    # which would stretch the mask over "@t0.eZc".
+    assert mask_pii("eva@9668s.5b.eseY@t0.eZc") == "<PII>@t0.eZc"
+
+
+def test_email_resumes_where_the_previous_one_ended():
+    # "9e9t@.3t5.ea" follows the first email mid-token: finditer() found
+    # it there even though an email can't otherwise start mid-run.
+    text = "t@1a8vY@s.Ya9e9t@.3t5.ea-"
+    assert mask_pii(text) == "t@<PII>-"
+
+
+def test_card_with_long_separators():
+    assert mask_pii("4111 - 1111 - 1111 - 1111") == "<PII>"
+    assert mask_pii("card 4111   1111   1111   1111 ok") == "card <PII> ok"
+    assert mask_pii("4111--1111--1111--1111") == "<PII>"
+
+
+# Cards and phones with long or mixed separators, next to other digits.
+SEPARATOR_CASES = [
+    "4111 - 1111 - 1111 - 1111",
+    "4111 -  - 1111-- 1111 -1111 end",
+    "card 4111      1111      1111      1111",
+    "4111 1111 1111 1111 1111 1111",
+    "123-45-6789 4111 1111 1111 1111",
+    "+1 555-555-5555  -  4111 1111 1111 1",
+    "(555) 555-5555 - 555 555 5555",
+    "1 555 555 5555 1 555 555 5555",
+    "555-555-5555-555-555-5555",
+    "+1-(555) 555 5555 or 55555 55555 55555",
+]
+
+
+@pytest.mark.parametrize("text", SEPARATOR_CASES)
+def test_same_as_legacy_scanner(text):
+    assert mask_pii(text) == _legacy_mask_pii(text)
+    assert contains_pii(text) == _legacy_contains_pii(text)
+
+
+def _digits_and_separators(rnd: random.Random) -> str:
+    parts = []
+    for _ in range(rnd.randint(1, 25)):
+        r = rnd.random()
+        if r < 0.45:
+            parts.append("".join(rnd.choice("0123456789") for _ in range(rnd.randint(1, 5))))
+        elif r < 0.75:
+            parts.append("".join(rnd.choice(" -") for _ in range(rnd.randint(1, 5))))
+        elif r < 0.85:
+            parts.append(rnd.choice(["(", ")", "+1", "+", "\n", "\t"]))
+        else:
+            parts.append(rnd.choice(["a", "x@y.co", "St", " street", ".", "ok "]))
+    return "".join(parts)
+
+
+def test_random_separator_runs_same_as_legacy_scanner():
+    rnd = random.Random(7)
+    for _ in range(5000):
+        text = _digits_and_separators(rnd)
+        assert mask_pii(text) == _legacy_mask_pii(text), text
@@ -22,6 +22,7 @@ import {
   Lock,
   Sparkles,
   PieChart as PieChartIcon,
+  RefreshCw,
 } from "lucide-react";
 import { createPortal } from "react-dom";
 import ReactMarkdown from "react-markdown";
@@ -715,6 +716,39 @@ async function sendToBackend(
   };
 }
 
+// ============================================================
+//              SERVER CHAT HISTORY (paged)
+// ============================================================
+
+type ChatPage = {
+  chats: { chat_id: string; title: string; created_at: string; updated_at: string }[];
+  next_cursor: string | null;
+};
+
+async function fetchChatPage(cursor: string | null): Promise<ChatPage> {
+  const qs = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+  const res = await fetch(`${API_BASE}/chats${qs}`, {
+    headers: { "X-Device-Id": DEVICE_ID },
+  });
+  if (!res.ok) throw new Error(`Chat list failed: ${res.status}`);
+  return await res.json();
+}
+
+async function fetchChatMessages(chatId: string): Promise<Message[]> {
+  const res = await fetch(`${API_BASE}/chats/${chatId}`, {
+    headers: { "X-Device-Id": DEVICE_ID },
+  });
+  if (!res.ok) throw new Error(`Chat history failed: ${res.status}`);
+  const rows: { role: string; content: string; created_at: string | null }[] =
+    await res.json();
+  return rows.map((r): Message => ({
+    id: uid(),
+    role: r.role === "user" ? "user" : "bot",
+    content: r.content,
+    ts: r.created_at ? Date.parse(r.created_at) : Date.now(),
+  }));
+}
+
 // ============================================================
 //                   MAIN COMPONENT START
 // ============================================================
@@ -752,6 +786,16 @@ function ZuzuApp() {
   const bottomRef = useRef<HTMLDivElement | null>(null);
   const bootRef = useRef(false);
 
+  // Server-side chat list, paged by cursor as the sidebar scrolls.
+  // undefined = first page not loaded yet, null = no more pages.
+  const [chatCursor, setChatCursor] = useState<string | null | undefined>(
+    undefined
+  );
+  const loadingChatsRef = useRef(false);
+  const sidebarEndRef = useRef<HTMLDivElement | null>(null);
+  // Chats whose messages were already requested: each is fetched once.
+  const historyRequestedRef = useRef<Set<string>>(new Set());
+
   const [adminKey, setAdminKey] = useState<string | null>(null);
   const [studentLevel, setStudentLevel] = useState<string | null>(null);
 
@@ -767,7 +811,8 @@ function ZuzuApp() {
     } else {
       setStudentLevel(null);
     }
-  }, [activeConvo]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [activeConvo?.id, activeConvo?.studentLevel]);
 
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -831,6 +876,66 @@ function ZuzuApp() {
     localStorage.setItem("zuzu_convos", JSON.stringify(convos));
   }, [convos]);
 
+  // Append the next page of server chats that aren't already stored locally.
+  async function loadMoreChats() {
+    if (loadingChatsRef.current || chatCursor === null) return;
+    loadingChatsRef.current = true;
+    try {
+      const page = await fetchChatPage(chatCursor ?? null);
+      setConvos((prev) => {
+        const known = new Set(prev.map((c) => c.id));
+        const extra: Conversation[] = page.chats
+          .filter((c) => !known.has(c.chat_id))
+          .map((c) => ({
+            id: c.chat_id,
+            title: c.title,
+            createdAt: Date.parse(c.created_at),
+            messages: [],
+          }));
+        return extra.length ? [...prev, ...extra] : prev;
+      });
+      setChatCursor(page.next_cursor);
+    } catch (err) {
+      console.error("Failed to load chat list", err);
+      setChatCursor(null);
+    } finally {
+      loadingChatsRef.current = false;
+    }
+  }
+
+  // Infinite scroll: load a page whenever the end of the list comes into view.
+  useEffect(() => {
+    const el = sidebarEndRef.current;
+    if (!el || chatCursor === null) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((e) => e.isIntersecting)) loadMoreChats();
+    });
+    observer.observe(el);
+    return () => observer.disconnect();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [chatCursor, sidebarCollapsed]);
+
+  // Chats that came from the server list load their messages on first open.
+  // Keyed on the id only: other updates to the conversation (or to convos)
+  // must not refetch it.
+  useEffect(() => {
+    if (!activeConvo || activeConvo.messages.length > 0) return;
+    const id = activeConvo.id;
+    if (historyRequestedRef.current.has(id)) return;
+    historyRequestedRef.current.add(id);
+    fetchChatMessages(id)
+      .then((messages) => {
+        if (!messages.length) return;
+        setConvos((prev) =>
+          prev.map((c) => (c.id === id ? { ...c, messages } : c))
+        );
+        setIntroState("done");
+        setFlowStep("chat");
+      })
+      .catch((err) => console.error("Failed to load chat history", err));
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [activeConvo?.id]);
+
   function isConversationEmpty(c: Conversation) {
     if (!c.messages) return true;
     if (c.messages.length === 1 && c.messages[0].role === "bot") return true;
@@ -2083,6 +2188,9 @@ function sendMessage() {
                 </div>
               );
             })}
+            {chatCursor !== null && (
+              <div ref={sidebarEndRef} className="h-6" aria-hidden />
+            )}
           </div>
         )}
 
@@ -2455,8 +2563,37 @@ function AdminModal({
   );
 }
 
-async function fetchDashboard(adminKey: string) {
-  const res = await fetch(`${API_BASE}/analytics`, {
+// Usage chart windows; "7d" is the backend default, so it sends no params.
+const USAGE_RANGES = [
+  { key: "7d", label: "Last 7 days", days: 7, bucket: "day" },
+  { key: "48h", label: "Last 48 hours", days: 2, bucket: "hour" },
+  { key: "30d", label: "Last 30 days", days: 30, bucket: "day" },
+  { key: "semester", label: "Semester (16 weeks)", days: 112, bucket: "week" },
+] as const;
+type UsageRangeKey = (typeof USAGE_RANGES)[number]["key"];
+
+function isoDate(d: Date) {
+  const pad = (n: number) => String(n).padStart(2, "0");
+  return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())}`;
+}
+
+async function fetchDashboard(
+  adminKey: string,
+  refresh = false,
+  range: UsageRangeKey = "7d"
+) {
+  const params = new URLSearchParams();
+  if (refresh) params.set("refresh", "true");
+  if (range !== "7d") {
+    const r = USAGE_RANGES.find((x) => x.key === range)!;
+    const end = new Date();
+    const start = new Date(end.getTime() - r.days * 24 * 60 * 60 * 1000);
+    params.set("start", isoDate(start));
+    params.set("end", isoDate(end));
+    params.set("bucket", r.bucket);
+  }
+  const qs = params.toString() ? `?${params.toString()}` : "";
+  const res = await fetch(`${API_BASE}/analytics${qs}`, {
     headers: {
       "X-Admin-Key": adminKey,
       "X-Device-Id": DEVICE_ID,
@@ -2877,13 +3014,15 @@ export function AdminDashboard({
   const [loading, setLoading] = useState(true);
   const [d, setD] = useState<any | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const [refreshing, setRefreshing] = useState(false);
+  const [usageRange, setUsageRange] = useState<UsageRangeKey>("7d");
   type DayUsage = { date: string; count: number };
 
 
   useEffect(() => {
     (async () => {
       try {
-        const json = await fetchDashboard(adminKey);
+        const json = await fetchDashboard(adminKey, false, usageRange);
         console.log("analytics raw:", json);
         setD(json);
       } catch (err: any) {
@@ -2893,7 +3032,20 @@ export function AdminDashboard({
         setLoading(false);
       }
     })();
-  }, [adminKey]);
+  }, [adminKey, usageRange]);
+
+  // Force the backend to recompute instead of serving its cached copy.
+  const handleRefresh = async () => {
+    setRefreshing(true);
+    try {
+      const json = await fetchDashboard(adminKey, true, usageRange);
+      setD(json);
+    } catch (err: any) {
+      console.error("Failed to refresh analytics", err);
+    } finally {
+      setRefreshing(false);
+    }
+  };
 
   if (loading) {
     return (
@@ -3045,6 +3197,26 @@ export function AdminDashboard({
               Analytics &amp; Insights
             </p>
           </div>
+
+          <div className="ml-auto flex items-center gap-3">
+            {d.generatedAt && (
+              <span className={`text-[11px] ${THEME.textSub}`}>
+                Updated {new Date(d.generatedAt * 1000).toLocaleTimeString()}
+                {d.stale ? " · refreshing…" : ""}
+              </span>
+            )}
+            <button
+              onClick={handleRefresh}
+              disabled={refreshing}
+              title="Recompute analytics now"
+              className="p-2 rounded-full border border-[#F3C58C] bg-[#FFEFD9] hover:bg-white transition disabled:opacity-50"
+            >
+              <RefreshCw
+                size={18}
+                className={`${THEME.textSub} ${refreshing ? "animate-spin" : ""}`}
+              />
+            </button>
+          </div>
         </div>
       </header>
 
@@ -3158,11 +3330,24 @@ export function AdminDashboard({
           </div>
         </div>
 
-        {/* Usage (last 7 days) – VERTICAL BARS */}
+        {/* Usage (selected window) – VERTICAL BARS */}
           <div className="rounded-2xl border border-[#F3C58C] bg-[#FFF6EA] p-4">
-          <h2 className={`text-sm font-semibold ${THEME.textMain} mb-1`}>
-            Usage (last 7 days)
-          </h2>
+          <div className="flex items-center justify-between mb-1">
+            <h2 className={`text-sm font-semibold ${THEME.textMain}`}>
+              Usage ({USAGE_RANGES.find((r) => r.key === usageRange)?.label.toLowerCase()})
+            </h2>
+            <select
+              value={usageRange}
+              onChange={(e) => setUsageRange(e.target.value as UsageRangeKey)}
+              className="text-xs rounded-full border border-[#F3C58C] bg-[#FFEFD9] px-2 py-1"
+            >
+              {USAGE_RANGES.map((r) => (
+                <option key={r.key} value={r.key}>
+                  {r.label}
+                </option>
+              ))}
+            </select>
+          </div>
 
           <div className="flex gap-1 items-end h-40 mt-2">
             {usageData.length === 0 ? (
@@ -3196,7 +3381,9 @@ export function AdminDashboard({
 
                     {/* Date label under the bar */}
                     <span className="text-[10px] text-[#A06A32] mt-1">
-                      {row.date.slice(5)}
+                      {d.bucket === "hour"
+                        ? row.date.slice(11, 16)
+                        : row.date.slice(5, 10)}
                     </span>
                   </div>
                 );